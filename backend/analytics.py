@@ -0,0 +1,280 @@
+"""
+Журнал запросов /rewrite и агрегаты для ежедневного отчёта.
+
+record() только кладёт событие в очередь; фоновый поток пачками дописывает
+компактный JSONL-журнал и инкрементально обновляет часовые/дневные агрегаты
+в SQLite (счётчики + гистограммы задержек). Отчёт за день читает только
+агрегаты, без сканирования журнала.
+
+CLI:
+  python analytics.py report [--day 2026-10-19] [--hourly] [--db analytics.db]
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Границы корзин задержек, мс (последняя — +Inf)
+LATENCY_BOUNDS = (
+    10,
+    25,
+    50,
+    100,
+    200,
+    300,
+    500,
+    750,
+    1000,
+    1500,
+    2000,
+    3000,
+    4000,
+    5000,
+    7500,
+    10000,
+    15000,
+    20000,
+    30000,
+    60000,
+)
+STAGES = ("total", "wb_fetch", "gen", "repair", "desc")
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS rollup_counts (
+        period TEXT, bucket TEXT, model TEXT, plan TEXT, error TEXT,
+        n INTEGER, src_len_sum INTEGER, cache_hits INTEGER,
+        PRIMARY KEY (period, bucket, model, plan, error))""",
+    """CREATE TABLE IF NOT EXISTS rollup_latency (
+        period TEXT, bucket TEXT, stage TEXT, le INTEGER, n INTEGER,
+        PRIMARY KEY (period, bucket, stage, le))""",
+)
+
+
+def _le_index(ms: float) -> int:
+    for i, b in enumerate(LATENCY_BOUNDS):
+        if ms <= b:
+            return i
+    return len(LATENCY_BOUNDS)
+
+
+def _buckets(ts: float) -> tuple[str, str]:
+    dt = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H"), dt.strftime("%Y-%m-%d")
+
+
+def open_db(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute("PRAGMA synchronous=NORMAL;")
+    for ddl in SCHEMA:
+        con.execute(ddl)
+    con.commit()
+    return con
+
+
+def apply_batch(con: sqlite3.Connection, events: list[dict]):
+    """Складывает пачку событий в агрегаты одной транзакцией."""
+    counts: dict[tuple, list] = {}
+    lat: dict[tuple, int] = {}
+    for ev in events:
+        hour, day = _buckets(ev.get("ts") or time.time())
+        for period, bucket in (("h", hour), ("d", day)):
+            k = (
+                period,
+                bucket,
+                ev.get("model") or "",
+                ev.get("plan") or "",
+                ev.get("error") or "",
+            )
+            c = counts.setdefault(k, [0, 0, 0])
+            c[0] += 1
+            c[1] += int(ev.get("src_len") or 0)
+            c[2] += int(ev.get("cache_hits") or 0)
+            for stage, ms in (ev.get("ms") or {}).items():
+                lk = (period, bucket, stage, _le_index(ms))
+                lat[lk] = lat.get(lk, 0) + 1
+    with con:
+        con.executemany(
+            "INSERT INTO rollup_counts VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT DO UPDATE SET n = n + excluded.n, "
+            "src_len_sum = src_len_sum + excluded.src_len_sum, "
+            "cache_hits = cache_hits + excluded.cache_hits",
+            [(*k, *v) for k, v in counts.items()],
+        )
+        con.executemany(
+            "INSERT INTO rollup_latency VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT DO UPDATE SET n = n + excluded.n",
+            [(*k, v) for k, v in lat.items()],
+        )
+
+
+class Recorder:
+    """Неблокирующая запись: очередь + фоновый поток-писатель."""
+
+    def __init__(self, db_path: str, log_path: str, maxsize: int = 10000):
+        self.db_path = db_path
+        self.log_path = log_path
+        self.dropped = 0
+        self.written = 0
+        self._q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def record(self, ev: dict):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+        try:
+            self._q.put_nowait(ev)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Дожидается записи всего, что уже в очереди (для тестов/остановки)."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        con = open_db(self.db_path)
+        while True:
+            items = [self._q.get()]
+            while len(items) < 500:
+                try:
+                    items.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            events = [x for x in items if isinstance(x, dict)]
+            try:
+                if events:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        for ev in events:
+                            f.write(json.dumps(ev, ensure_ascii=False) + "\n")
+                    apply_batch(con, events)
+                    self.written += len(events)
+            except Exception as e:
+                logging.warning("analytics write failed: %s", e)
+            for x in items:
+                if isinstance(x, threading.Event):
+                    x.set()
+
+
+# ── отчёт ──
+def _percentile(hist: dict[int, int], q: float) -> float | None:
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = q * total
+    acc = 0
+    for i in sorted(hist):
+        n = hist[i]
+        if acc + n >= rank:
+            lo = LATENCY_BOUNDS[i - 1] if i > 0 else 0
+            if i >= len(LATENCY_BOUNDS):
+                return float(lo)
+            hi = LATENCY_BOUNDS[i]
+            return lo + (hi - lo) * (rank - acc) / n
+        acc += n
+    return float(LATENCY_BOUNDS[-1])
+
+
+def report(con: sqlite3.Connection, bucket: str, period: str = "d") -> dict:
+    rows = con.execute(
+        "SELECT model, plan, error, n, src_len_sum, cache_hits FROM rollup_counts "
+        "WHERE period=? AND bucket=?",
+        (period, bucket),
+    ).fetchall()
+    out = {
+        "bucket": bucket,
+        "requests": sum(r[3] for r in rows),
+        "errors": {},
+        "models": {},
+        "plans": {},
+        "cache_hits": sum(r[5] for r in rows),
+        "latency_ms": {},
+    }
+    src = sum(r[4] for r in rows)
+    out["avg_src_len"] = round(src / out["requests"]) if out["requests"] else 0
+    for model, plan, error, n, _src, _hits in rows:
+        if error:
+            out["errors"][error] = out["errors"].get(error, 0) + n
+        if model:
+            out["models"][model] = out["models"].get(model, 0) + n
+        out["plans"][plan or "?"] = out["plans"].get(plan or "?", 0) + n
+    hists: dict[str, dict[int, int]] = {}
+    for stage, le, n in con.execute(
+        "SELECT stage, le, n FROM rollup_latency WHERE period=? AND bucket=?",
+        (period, bucket),
+    ):
+        hists.setdefault(stage, {})[le] = n
+    for stage, h in hists.items():
+        out["latency_ms"][stage] = {
+            "n": sum(h.values()),
+            **{f"p{q}": _percentile(h, q / 100) for q in (50, 95, 99)},
+        }
+    return out
+
+
+def _fmt(v) -> str:
+    return "-" if v is None else f"{v:.0f}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="WB6 request analytics")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("report", help="дневной отчёт p50/p95/p99 и ошибки")
+    rp.add_argument("--day", default=datetime.datetime.utcnow().strftime("%Y-%m-%d"))
+    rp.add_argument("--hourly", action="store_true", help="разбивка по часам")
+    rp.add_argument(
+        "--db",
+        default=os.getenv(
+            "ANALYTICS_DB",
+            os.path.join(os.getenv("DATA_DIR", "/data").rstrip("/"), "analytics.db"),
+        ),
+    )
+    args = ap.parse_args(argv)
+    con = open_db(args.db)
+    rep = report(con, args.day, "d")
+    print(
+        f"WB6 {rep['bucket']}: {rep['requests']} requests, "
+        f"cache hits {rep['cache_hits']}, avg source {rep['avg_src_len']} chars"
+    )
+    print(f"{'stage':<10}{'n':>7}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for stage in STAGES:
+        st = rep["latency_ms"].get(stage)
+        if st:
+            print(
+                f"{stage:<10}{st['n']:>7}{_fmt(st['p50']):>8}"
+                f"{_fmt(st['p95']):>8}{_fmt(st['p99']):>8}"
+            )
+    if rep["errors"]:
+        print("errors:")
+        for code, n in sorted(rep["errors"].items(), key=lambda kv: -kv[1]):
+            share = 100 * n / rep["requests"]
+            print(f"  {code:<24}{n:>6}  {share:5.1f}%")
+    if rep["models"]:
+        print("models: " + ", ".join(f"{m}={n}" for m, n in rep["models"].items()))
+    if args.hourly:
+        for h in range(24):
+            hr = report(con, f"{args.day}T{h:02d}", "h")
+            if hr["requests"]:
+                tot = hr["latency_ms"].get("total", {})
+                print(
+                    f"  {h:02d}:00 {hr['requests']:>6} req  "
+                    f"p95 {_fmt(tot.get('p95'))} ms  errors {sum(hr['errors'].values())}"
+                )
+    return rep
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Бюджет входа: сколько текста карточки отправлять модели.
+
+Длинные описания WB (таблицы характеристик, SEO-повторы, «подписывайтесь на
+магазин») раздувают входные токены и задержку. fit() убирает повторы и
+шаблонные фразы, затем обрезает текст до бюджета модели: первая строка
+(название) и строки-характеристики («Состав: …», числа с единицами) идут
+первыми, остальное — пока есть место, в исходном порядке.
+
+Токены считаются приближённо (без tiktoken): слово кириллицей ≈ 1 токен на
+3 символа, латиницей — на 4, знак препинания — 1 токен.
+"""
+
+import math
+import re
+
+DEFAULT_BUDGET = 2500  # токенов
+
+_WORD = re.compile(r"[A-Za-z]+|[0-9]+|[^\W\d_]+|[^\w\s]", re.U)
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+_SPACES = re.compile(r"\s+")
+
+# Строки, которые не несут фактов о товаре
+_BOILERPLATE = re.compile(
+    r"(уважаем\w* покупател|добавляйте? .{0,20}(в )?(избранное|корзину)"
+    r"|подпис\w+ на (наш )?(магазин|бренд)|желаем (вам )?приятных покупок"
+    r"|(оттен|цвет)\w* (товара )?(на фото )?может (незначительно )?отлича"
+    r"|оставьте (свой )?отзыв|спасибо за (покупку|выбор|заказ)"
+    r"|смотрите (также|другие)|в нашем магазине вы найдете"
+    r"|ставьте (лайк|❤)|артикул[: ]+\d{5,})",
+    re.I,
+)
+# Характеристики: «Ключ: значение» или число с единицей измерения
+_FACT = re.compile(
+    r"^[^:]{2,40}:\s*\S|\d+(?:[.,]\d+)?\s?(?:мл|л|г|кг|мм|см|м|шт|%|мг|вт|мач)\b",
+    re.I,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    n = 0
+    for w in _WORD.findall(text or ""):
+        if w.isascii():
+            n += math.ceil(len(w) / 4) if w.isalnum() else 1
+        else:
+            n += math.ceil(len(w) / 3) if w.isalnum() else 1
+    return n
+
+
+def _key(s: str) -> str:
+    return _SPACES.sub(" ", s).strip(" .,;!-—").casefold()
+
+
+def dedup(text: str) -> tuple[str, int]:
+    """
+    Убирает повторы строк и предложений по всему тексту, а пункты списка через
+    запятую — только внутри своего списка: «масло ши» в составе и в комплекте —
+    разные факты.
+    """
+    seen: set[str] = set()
+    removed = 0
+    out = []
+    for line in (text or "").splitlines():
+        parts = []
+        for sent in _SENTENCE_END.split(line):
+            k = _key(sent)
+            if k and k in seen:
+                removed += 1
+                continue
+            seen.add(k)
+            items = sent.split(",")
+            if len(items) > 3:  # SEO-список: «паста, паста для зубов, паста, …»
+                uniq, in_list = [], set()
+                for it in items:
+                    k = _key(it)
+                    if k and k in in_list:
+                        removed += 1
+                        continue
+                    in_list.add(k)
+                    uniq.append(it)
+                sent = ",".join(uniq).strip(" ,")
+            if sent:
+                parts.append(sent)
+        if parts or not line.strip():
+            out.append(" ".join(parts))
+    return "\n".join(out), removed
+
+
+def strip_boilerplate(text: str) -> tuple[str, int]:
+    kept, removed = [], 0
+    for line in (text or "").splitlines():
+        if _BOILERPLATE.search(line):
+            removed += 1
+        else:
+            kept.append(line)
+    return "\n".join(kept), removed
+
+
+def clip(text: str, budget: int) -> str:
+    """Обрезка до budget токенов по границе слова."""
+    if estimate_tokens(text) <= budget:
+        return text
+    n = 0
+    for m in _WORD.finditer(text):
+        n += estimate_tokens(m.group(0))
+        if n > budget:
+            return text[: m.start()].rstrip()
+    return text
+
+
+def trim(text: str, budget: int) -> str:
+    lines = [ln for ln in (text or "").splitlines() if ln.strip()]
+    if not lines:
+        return ""
+    cost = [estimate_tokens(ln) + 1 for ln in lines]  # +1 — перевод строки
+    if sum(cost) <= budget:
+        return "\n".join(lines)
+    keep: dict[int, str] = {}
+    left = budget
+    # название, затем характеристики, затем остальное — каждое в своём порядке
+    order = [0] + [i for i in range(1, len(lines)) if _FACT.search(lines[i])]
+    order += [i for i in range(1, len(lines)) if i not in set(order)]
+    for i in order:
+        if left <= 1:
+            break
+        if cost[i] <= left:
+            keep[i] = lines[i]
+            left -= cost[i]
+        elif i == 0 or left > 20:
+            keep[i] = clip(lines[i], left - 1)
+            left = 0
+    return "\n".join(keep[i] for i in sorted(keep) if keep[i])
+
+
+def parse_budgets(spec: str) -> dict[str, int]:
+    """'gpt-5:4000,gpt-4o-mini:2000' -> {префикс модели: бюджет}."""
+    out = {}
+    for part in (spec or "").split(","):
+        name, _, val = part.partition(":")
+        if name.strip() and val.strip().isdigit():
+            out[name.strip()] = int(val)
+    return out
+
+
+def budget_for(model: str, budgets: dict[str, int], default: int = DEFAULT_BUDGET):
+    best = ""
+    for prefix in budgets:
+        if (model or "").startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return budgets[best] if best else default
+
+
+def fit(text: str, budget: int) -> tuple[str, dict]:
+    """Текст для модели и отчёт: исходный/отправленный размер, что убрано."""
+    orig_tokens = estimate_tokens(text)
+    cleaned, boiler = strip_boilerplate(text)
+    cleaned, dups = dedup(cleaned)
+    sent = trim(cleaned, budget)
+    sent_tokens = estimate_tokens(sent)
+    return sent, {
+        "orig_chars": len(text or ""),
+        "sent_chars": len(sent),
+        "orig_tokens_est": orig_tokens,
+        "sent_tokens_est": sent_tokens,
+        "budget_tokens": budget,
+        "boilerplate_removed": boiler,
+        "dups_removed": dups,
+        "trimmed": sent_tokens < estimate_tokens(cleaned),
+    }
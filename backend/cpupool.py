@@ -0,0 +1,95 @@
+"""
+Пул для CPU-тяжёлых этапов: нормализация длинных описаний и разбор больших
+ответов модели.
+
+Маленькие входы выполняются на месте: передача в пул (а для процессов — ещё и
+сериализация) стоит дороже самой работы. В пул уходит только то, что не
+меньше порога. Процессный пул стартует через spawn, поэтому ему можно
+отдавать лишь функции из лёгких модулей (textnorm, jsonscan), а не из main.
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+import threading
+
+KINDS = ("thread", "process", "off")
+
+_CFG = {"kind": "thread", "workers": 2, "threshold": 50_000}
+_POOL: concurrent.futures.Executor | None = None
+_LOCK = threading.Lock()
+STATS = {"inline": 0, "pooled": 0, "pending": 0}
+
+
+def configure(kind: str = "thread", workers: int = 2, threshold: int = 50_000):
+    """Задаёт тип пула (thread|process|off), размер и порог в символах."""
+    if kind not in KINDS:
+        raise ValueError(f"pool kind must be one of {KINDS}, got {kind!r}")
+    shutdown()
+    _CFG.update(kind=kind, workers=max(0, workers), threshold=threshold)
+
+
+def settings() -> dict:
+    return dict(_CFG)
+
+
+def _executor() -> concurrent.futures.Executor:
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            if _CFG["kind"] == "process":
+                _POOL = concurrent.futures.ProcessPoolExecutor(
+                    _CFG["workers"], mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _POOL = concurrent.futures.ThreadPoolExecutor(
+                    _CFG["workers"], thread_name_prefix="wb6-cpu"
+                )
+        return _POOL
+
+
+def _inline(size: int) -> bool:
+    if _CFG["kind"] == "off" or _CFG["workers"] <= 0 or size < _CFG["threshold"]:
+        with _LOCK:
+            STATS["inline"] += 1
+        return True
+    return False
+
+
+def _done(_fut):
+    with _LOCK:
+        STATS["pending"] -= 1
+
+
+def _submit(fn, args) -> concurrent.futures.Future:
+    fut = _executor().submit(fn, *args)
+    with _LOCK:
+        STATS["pooled"] += 1
+        STATS["pending"] += 1
+    fut.add_done_callback(_done)
+    return fut
+
+
+def call(fn, *args, size: int):
+    """
+    Синхронный вызов: большие входы считаются в пуле, поток ждёт результат.
+    Только для скриптов и рабочих потоков — из event loop зовите run().
+    """
+    if _inline(size):
+        return fn(*args)
+    return _submit(fn, args).result()
+
+
+async def run(fn, *args, size: int):
+    """То же для корутин: event loop не блокируется, пока пул считает."""
+    if _inline(size):
+        return fn(*args)
+    return await asyncio.wrap_future(_submit(fn, args))
+
+
+def shutdown():
+    global _POOL
+    with _LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+"""
+Быстрые JSON-ответы и сжатие.
+
+FastJSONResponse кодирует через orjson, если он установлен (иначе — stdlib с
+теми же настройками, что у Starlette: ensure_ascii=False, без пробелов).
+CompressMiddleware сжимает целые (не потоковые) ответы от порога: brotli,
+если установлен пакет brotli и клиент его принимает, иначе gzip.
+"""
+
+import gzip
+import json
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - зависит от окружения
+    brotli = None
+
+# Сжимаем только текстовые форматы: картинки и архивы уже сжаты
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # int > 64 бит, нестроковые ключи — пусть решает stdlib
+    return json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _pick_encoding(accept: str) -> str | None:
+    accepted = {
+        p.split(";")[0].strip().lower()
+        for p in accept.split(",")
+        if not p.strip().endswith(";q=0")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class CompressMiddleware:
+    """ASGI-middleware: сжимает ответ целиком, если он не меньше min_size."""
+
+    def __init__(self, app, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.min_size <= 0:
+            await self.app(scope, receive, send)
+            return
+        encoding = _pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def wrapped(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message  # ждём тело, чтобы знать размер
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            ctype = headers.get("content-type", "")
+            if (
+                message.get("more_body")
+                or len(body) < self.min_size
+                or "content-encoding" in headers
+                or not ctype.startswith(_COMPRESSIBLE)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, wrapped)
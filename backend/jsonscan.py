@@ -0,0 +1,111 @@
+"""
+Поиск JSON по нашей схеме {title, bullets[6], keywords[20]} в ответе модели.
+
+Модуль без зависимостей: его функции можно отдавать в процессный пул
+(cpupool), дочерний процесс импортирует только его, а не main.
+"""
+
+import json
+import re
+
+_DECODER = json.JSONDecoder()
+# Начало непустого объекта: «{», пробелы, «"». Внутри строки JSON кавычка
+# всегда экранирована, поэтому такая пара не встречается в строковых значениях,
+# а проза в скобках ({title, bullets}) отсекается без raw_decode.
+_OBJ_START = re.compile(r'\{\s*"')
+
+
+def extract_json(s: str):
+    """
+    Первый объект по схеме среди JSON-объектов в тексте (с прозой, ```json,
+    черновиком перед итоговым ответом). Если по схеме нет — первый
+    разобранный объект, как раньше; если ни одного — None.
+
+    Один проход слева направо: raw_decode на каждом кандидате; удачный объект
+    перескакивается целиком, после неудачного (обрыв, мусор) ищем следующий.
+    """
+    if not isinstance(s, str) or "{" not in s:
+        return None
+    first = None
+    pos = 0
+    while True:
+        m = _OBJ_START.search(s, pos)
+        if m is None:
+            return first
+        try:
+            obj, pos = _DECODER.raw_decode(s, m.start())
+        except (ValueError, RecursionError):  # глубокая вложенность — тоже мусор
+            pos = m.start() + 1
+            continue
+        found = find_schema_dict(obj)
+        if found:
+            return found
+        if first is None:
+            first = obj
+
+
+def schema_ok(d):
+    if not isinstance(d, dict):
+        return False
+    if not all(k in d for k in ("title", "bullets", "keywords")):
+        return False
+    if not isinstance(d.get("bullets"), list) or len(d["bullets"]) != 6:
+        return False
+    if not isinstance(d.get("keywords"), list) or len(d["keywords"]) != 20:
+        return False
+    return True
+
+
+def find_schema_dict(obj, _depth=0):
+    """Рекурсивно находит первый dict по нашей схеме во вложенных структурах."""
+    if _depth > 6:
+        return None
+    try:
+        if hasattr(obj, "model_dump"):
+            obj = obj.model_dump()
+    except Exception:
+        pass
+    if isinstance(obj, dict):
+        if schema_ok(obj):
+            return obj
+        for v in obj.values():
+            x = find_schema_dict(v, _depth + 1)
+            if x:
+                return x
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            x = find_schema_dict(v, _depth + 1)
+            if x:
+                return x
+    return None
+
+
+def find_schema_dicts(obj, _depth=0) -> list:
+    """Все dict по схеме во вложенных структурах (варианты карточки)."""
+    if _depth > 6:
+        return []
+    if isinstance(obj, dict):
+        if schema_ok(obj):
+            return [obj]
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        return [x for v in obj for x in find_schema_dicts(v, _depth + 1)]
+    return []
+
+
+def extract_all(s: str) -> list:
+    """Все объекты по схеме из текста — тем же проходом, что extract_json."""
+    if not isinstance(s, str) or "{" not in s:
+        return []
+    out = []
+    pos = 0
+    while True:
+        m = _OBJ_START.search(s, pos)
+        if m is None:
+            return out
+        try:
+            obj, pos = _DECODER.raw_decode(s, m.start())
+        except (ValueError, RecursionError):  # глубокая вложенность — тоже мусор
+            pos = m.start() + 1
+            continue
+        out.extend(find_schema_dicts(obj))
@@ -0,0 +1,181 @@
+"""
+Пост-обработка ключевых фраз из ответа модели.
+
+Схема требует ровно 20 ключей, а модель нередко возвращает почти-дубли
+(регистр, ё/е, другой порядок слов или падеж), стоп-слова из PROMPT
+(«купить», «скидка», …) или меньше 20 фраз. fix_keywords() нормализует
+фразы, убирает стоп-слова и дубли, сохраняя порядок модели (она ранжирует
+от частотных к нишевым), и добирает недостающее n-граммами исходного текста
+карточки — без повторного вызова модели.
+
+Нормализованная форма (нижний регистр, ё/е, без пунктуации) нужна только
+для ключа дедупликации и проверки стоп-слов; в ответ идёт фраза модели как
+есть — регистр и знаки вроде «iPhone», «SPF 50+», «C++» несут смысл.
+"""
+
+import functools
+import re
+from collections import Counter
+
+COUNT = 20
+MAX_LEN = 60  # символов во фразе
+
+# Запрещённые в PROMPT слова и их частые написания
+STOP_WORDS = frozenset(
+    "купить куплю покупка скидка скидки скидкой акция распродажа "
+    "wildberries вайлдберриз вайлдбериз валдберис wb вб "
+    "дешево дёшево дешевый дешёвый недорого недорогой".split()
+)
+# Служебные слова: не начинают и не заканчивают n-грамму при добивке
+_FUNCTION = frozenset(
+    "и в во на для с со по от до из у к ко о об при без не это как что "
+    "или а но же ли бы то так все всё вы мы он она они его ее её их наш "
+    "ваш под над за про через также очень еще ещё уже только шт".split()
+)
+# Предлоги, допустимые внутри n-граммы: «паста для зубов», «крем от морщин»
+_LINKS = frozenset("для от с со из без".split())
+# Глагол в 3-м лице («сохраняет», «подходит») — это описание, а не запрос
+_VERB = re.compile(r"\w{3,}(?:ет|ют|ит|ят|ат)(?:ся)?$")
+# Одиночное прилагательное («мягкий», «нержавеющая») — не ключ
+_ADJ = re.compile(r"\w{3,}(?:ий|ый|ая|яя|ое|ее|ые|ие|ых|их)$")
+# «c++» и «c#» — отдельные слова, а не «c» (иначе «C# книга» ~ «C++ книга»)
+_WORD = re.compile(r"[0-9a-zа-яё]+(?:[-'][0-9a-zа-яё]+)*(?:\+\+|#)?")
+# Обрамление фразы, которое срезаем: кавычки, хэштег, точки и восклицания
+_EDGE = " \"'«»„“”#*.,;:!?"
+# Грубый стемминг для ключа дедупликации («пасту» ~ «паста»): самое длинное
+# окончание из списка, основа — не короче трёх букв
+_STEM = re.compile(
+    r"^(\w{3,}?)(?:ами|ями|ого|его|ому|ему|ыми|ими|ая|яя|ую|юю|ой|ей|ый|ий|ое"
+    r"|ее|ые|ие|ых|их|ом|ем|ам|ям|ах|ях|ов|ев|а|я|у|ю|ы|и|е|о|ь)$"
+)
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall((text or "").lower())
+
+
+@functools.lru_cache(maxsize=8192)
+def _stem(word: str) -> str:
+    word = word.replace("ё", "е")
+    m = _STEM.match(word)
+    return m.group(1) if m else word
+
+
+def dedup_key(phrase: str) -> tuple:
+    """
+    Ключ фразы без учёта регистра, ё/е, порядка слов, окончаний и служебных
+    слов: «пылесос для дома» ~ «дом пылесос».
+    """
+    return tuple(sorted(_stem(w) for w in _words(phrase) if w not in _FUNCTION))
+
+
+def _only(token: str, vocab: frozenset) -> bool:
+    """Все слова токена — из vocab (токен без слов, «+» или «—», — нет)."""
+    ws = _words(token)
+    return bool(ws) and all(w in vocab for w in ws)
+
+
+def clean(phrase) -> str:
+    """
+    Фраза модели без стоп-слов, служебных слов по краям, лишних пробелов и
+    обрамляющих кавычек/знаков; регистр и «+» сохраняются. "" — выбросить.
+    """
+    if not isinstance(phrase, str):
+        return ""
+    tokens = [t for t in phrase.split() if not _only(t, STOP_WORDS)]
+    while tokens and _only(tokens[0], _FUNCTION):
+        tokens.pop(0)
+    while tokens and _only(tokens[-1], _FUNCTION):
+        tokens.pop()
+    out = " ".join(tokens).strip(_EDGE)
+    if not _words(out) or len(out) > MAX_LEN:
+        return ""
+    return out
+
+
+def source_ngrams(text: str) -> list[str]:
+    """
+    Кандидаты для добивки: 2- и 3-граммы исходного текста. Сначала те, что
+    пересекаются с первой строкой (название товара), внутри — по убыванию
+    частоты, затем средней частоты их слов (ядро карточки «зубная паста»
+    выше случайных соседств), затем кто раньше встретился; после n-грамм —
+    значимые одиночные слова.
+    """
+    freq: Counter = Counter(_words(text))
+    title = {_stem(w) for w in _words((text or "").split("\n", 1)[0])}
+    counts: Counter = Counter()
+    first: dict[str, int] = {}
+    for line in (text or "").splitlines():
+        # n-граммы не пересекают предложения и перечисления
+        for chunk in re.split(r"[.,!?;:()\[\]«»\"]+", line):
+            words = _words(chunk)
+            for n in (2, 3):
+                for i in range(len(words) - n + 1):
+                    gram = words[i : i + n]
+                    if gram[0] in _FUNCTION or gram[-1] in _FUNCTION:
+                        continue
+                    if any(w in _FUNCTION and w not in _LINKS for w in gram):
+                        continue
+                    if any(
+                        w in STOP_WORDS or w.isdigit() or _VERB.match(w) for w in gram
+                    ):
+                        continue
+                    g = " ".join(gram)
+                    counts[g] += 1
+                    first.setdefault(g, len(first))
+
+    def rank(g):
+        ws = g.split()
+        in_title = any(_stem(w) in title for w in ws)
+        return (
+            not in_title,
+            -counts[g],
+            -sum(freq[w] for w in ws) / len(ws),
+            first[g],
+        )
+
+    grams = sorted(counts, key=rank)
+    singles = [
+        w
+        for w in freq
+        if len(w) >= 4
+        and not w.isdigit()
+        and w not in STOP_WORDS
+        and w not in _FUNCTION
+        and not _VERB.match(w)
+        and not _ADJ.match(w)
+    ]
+    grams += sorted(singles, key=lambda w: -freq[w])  # sorted устойчив
+    return grams
+
+
+def fix_keywords(keywords, source: str = "", count: int = COUNT) -> tuple[list, dict]:
+    """
+    Ровно count ключей (если хватает материала) и отчёт:
+    {"dropped": выброшено стоп/пустых, "dups": дублей, "filled": добито}.
+    """
+    out, seen = [], set()
+    report = {"dropped": 0, "dups": 0, "filled": 0}
+    for kw in keywords or []:
+        phrase = clean(kw)
+        if not phrase:
+            report["dropped"] += 1
+            continue
+        key = dedup_key(phrase)
+        if key in seen:
+            report["dups"] += 1
+            continue
+        seen.add(key)
+        out.append(phrase)
+    del out[count:]
+    if len(out) < count:
+        for phrase in source_ngrams(source):
+            key = dedup_key(phrase)
+            if key in seen:
+                continue
+            seen.add(key)
+            out.append(phrase)
+            report["filled"] += 1
+            if len(out) == count:
+                break
+    return out, report
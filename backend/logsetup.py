@@ -0,0 +1,118 @@
+"""
+Неблокирующее логирование: QueueHandler в корневом логгере, а запись в
+stderr делает фоновый QueueListener. Повторы одного и того же предупреждения
+(например, сбой OpenAI на каждом запросе) пишутся раз в интервал со счётчиком.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+_LISTENER: logging.handlers.QueueListener | None = None
+_HANDLER: logging.Handler | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        d = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            d["exc"] = record.exc_text
+        if getattr(record, "repeated", 0):
+            d["repeated"] = record.repeated
+        return json.dumps(d, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Пропускает первое из одинаковых сообщений (текст с аргументами и тип
+    исключения) за interval секунд, повторы отбрасывает; число отброшенных
+    дописывается к следующему пропущенному. Другая ошибка через тот же шаблон
+    («rewrite() failed: %s») — уже не повтор.
+    """
+
+    def __init__(self, interval: float, min_level: int = logging.WARNING):
+        super().__init__()
+        self.interval = interval
+        self.min_level = min_level
+        self._seen: dict[tuple, list] = {}  # key -> [начало окна, отброшено]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.interval <= 0 or record.levelno < self.min_level:
+            return True
+        exc = record.exc_info[0] if record.exc_info else None
+        key = (record.name, record.levelno, record.getMessage(), exc)
+        now = time.monotonic()
+        with self._lock:
+            st = self._seen.get(key)
+            if st is not None and now - st[0] < self.interval:
+                st[1] += 1
+                return False
+            suppressed = st[1] if st else 0
+            self._seen[key] = [now, 0]
+            if len(self._seen) > 1000:
+                for k in [
+                    k for k, v in self._seen.items() if now - v[0] >= self.interval
+                ]:
+                    del self._seen[k]
+        if suppressed:
+            record.repeated = suppressed
+            record.msg = f"{record.msg} [+{suppressed} повторов за {self.interval:g}s]"
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение и traceback форматируем здесь, а не в потоке-писателе:
+        # args и exc_info могут ссылаться на объекты, живущие только в запросе.
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def configure(level: str = "INFO", fmt: str = "text", rate_interval: float = 60.0):
+    """Подключает очередь к корневому логгеру (повторный вызов — переподключает)."""
+    global _LISTENER, _HANDLER
+    root = logging.getLogger()
+    stop()
+    out = logging.StreamHandler()
+    out.setFormatter(
+        JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    _HANDLER = _QueueHandler(q)
+    _HANDLER.addFilter(RateLimitFilter(rate_interval))
+    root.addHandler(_HANDLER)
+    root.setLevel(level)
+    _LISTENER = logging.handlers.QueueListener(q, out, respect_handler_level=True)
+    _LISTENER.start()
+
+
+def stop():
+    """Дописывает очередь и отключает обработчик."""
+    global _LISTENER, _HANDLER
+    if _HANDLER is not None:
+        logging.getLogger().removeHandler(_HANDLER)
+        _HANDLER = None
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
+
+atexit.register(stop)
@@ -1,35 +1,72 @@
+import asyncio
+import concurrent.futures
+import contextlib
 import datetime
+import functools
 import hashlib
-import html
+import importlib.util
 import json
 import logging
+import math
 import os
+import random
 import re
 import secrets
 import shutil
 import sqlite3
+import sys
+import threading
 import time
-import traceback
+from collections import OrderedDict
 from urllib.parse import quote as _urlquote
 
+import analytics
+import budget
+import cpupool
+import fastresp
+import jsonscan
 import jwt
-import openai
-import requests
-from bs4 import BeautifulSoup
+import keywords
+import logsetup
+import metrics
+import profiler
+import textnorm
+import tracing
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
-# --- базовое логирование настраиваемо через ENV ---
-logging.basicConfig(
+
+def _lazy_module(name: str):
+    """
+    Модуль, который загрузится при первом обращении к атрибуту
+    (importlib.util.LazyLoader): импорт main не платит за него заранее.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+requests = _lazy_module("requests")
+
+# --- логирование через очередь (запись в stderr — фоновый поток) ---
+# LOG_FORMAT=text|json; повторы предупреждений — не чаще раза в LOG_RATE_LIMIT_S
+logsetup.configure(
     level=os.getenv("LOG_LEVEL", "INFO").upper(),
-    format="%(asctime)s %(levelname)s %(message)s",
+    fmt=os.getenv("LOG_FORMAT", "text").lower(),
+    rate_interval=float(os.getenv("LOG_RATE_LIMIT_S", "60")),
 )
 
 
 def safe_json(payload: dict, status: int = 200) -> JSONResponse:
-    return JSONResponse(
+    return fastresp.FastJSONResponse(
         content=payload,
         status_code=status,
         media_type="application/json",
@@ -49,7 +86,36 @@ if not OPENAI_KEY:
     raise ValueError(
         "❌ OPENAI_API_KEY не установлен. Укажите его в Railway/GitHub Secrets."
     )
-client = openai.OpenAI(api_key=OPENAI_KEY)
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+OPENAI_KEEPALIVE_S = float(os.getenv("OPENAI_KEEPALIVE_S", "120"))
+# Когда соединение к цели (openai / хост WB) последний раз использовалось
+_LAST_USE: dict[str, float] = {}
+
+
+def get_client():
+    """OpenAI-клиент создаётся при первом обращении: import openai — около секунды."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                import httpx
+                import openai
+
+                _CLIENT = openai.OpenAI(
+                    api_key=OPENAI_KEY,
+                    # соединения живут в пуле дольше интервала пинга (_keep_warm)
+                    http_client=openai.DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=100,
+                            max_keepalive_connections=20,
+                            keepalive_expiry=OPENAI_KEEPALIVE_S,
+                        )
+                    ),
+                )
+    _LAST_USE["openai"] = time.monotonic()
+    return _CLIENT
+
 
 # Настройки JSON-режима и лимитов вывода
 OPENAI_JSON_MODE = os.getenv("OPENAI_JSON_MODE", "schema").lower()  # off|object|schema
@@ -70,10 +136,29 @@ DESC_FALLBACKS = os.getenv("OPENAI_DESC_FALLBACK_MODELS", "gpt-4o,gpt-4o-mini").
     ","
 )
 EXPOSE_MODEL_ERRORS = os.getenv("EXPOSE_MODEL_ERRORS", "0") == "1"
+# Бюджет входа (оценка токенов) для текста карточки: общий и по префиксам
+# моделей, например INPUT_BUDGETS="gpt-5:4000,gpt-4o-mini:2000"
+INPUT_BUDGET_TOKENS = int(os.getenv("INPUT_BUDGET_TOKENS", str(budget.DEFAULT_BUDGET)))
+INPUT_BUDGETS = budget.parse_budgets(os.getenv("INPUT_BUDGETS", ""))
+# variants=N: до MAX_VARIANTS карточек за один вызов модели. Первая стоит
+# кредит, каждая следующая — VARIANT_EXTRA_COST (0 — все варианты за один
+# кредит, 1 — кредит за каждый); итог округляется вверх.
+MAX_VARIANTS = int(os.getenv("MAX_VARIANTS", "5"))
+# Локальная чистка keywords (дубли, стоп-слова, добивка до 20 из текста)
+KEYWORDS_FIX = os.getenv("KEYWORDS_FIX", "1") == "1"
+VARIANT_EXTRA_COST = float(os.getenv("VARIANT_EXTRA_COST", "0.5"))
 OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "1"))
 WB_DEBUG = os.getenv("WB_DEBUG", "0") == "1"
 WB_TIMEOUT = float(os.getenv("WB_TIMEOUT", "6.0"))
 WB_UA = os.getenv("WB_UA", "Mozilla/5.0")
+# Путь к JSONL-файлу для выгрузки span-ов /rewrite (пусто — не писать)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+# Профилирование /rewrite: доля запросов (0 — выключено) и админ-токен для
+# принудительного профиля (заголовки X-Profile: 1 + X-Admin-Token)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # ✅ Robokassa Pass1/Pass2 (используются для подписи форм и callback'ов)
 PASS1 = os.getenv("ROBOKASSA_PASS1")
@@ -116,74 +201,366 @@ _LEGACY_DB = os.path.join(os.path.dirname(__file__), "tokens.db")
 
 # Новый путь (персистентный)
 DB_PATH = os.getenv("TOKENS_DB", os.path.join(DATA_DIR, "tokens.db"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
 
-# Если новый файл ещё не создан, а старый существует — перенесём, чтобы не потерять счётчик
-if not os.path.exists(DB_PATH) and os.path.exists(_LEGACY_DB):
-    try:
-        shutil.copy2(_LEGACY_DB, DB_PATH)
-    except Exception:
-        pass
+# Журнал запросов и агрегаты для ежедневного отчёта (python analytics.py report)
+ANALYTICS = os.getenv("ANALYTICS", "1") == "1"
+RECORDER = analytics.Recorder(
+    os.getenv("ANALYTICS_DB", os.path.join(DATA_DIR, "analytics.db")),
+    os.getenv("ANALYTICS_LOG", os.path.join(DATA_DIR, "requests.log")),
+)
+
+# Сколько живёт невостребованный платёжный токен (сек)
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", str(3 * 24 * 3600)))
+
+
+def _open_db() -> sqlite3.Connection:
+    """tokens.db: перенос со старого пути, PRAGMA, схема и миграции."""
+    # Если новый файл ещё не создан, а старый существует — перенесём, чтобы не потерять счётчик
+    if not os.path.exists(DB_PATH) and os.path.exists(_LEGACY_DB):
+        try:
+            shutil.copy2(_LEGACY_DB, DB_PATH)
+        except Exception:
+            pass
+
+    # Открываем SQLite с таймаутом и включаем WAL для устойчивости к конкуренции
+    con = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL;")
+    con.execute("PRAGMA synchronous=NORMAL;")
+    con.execute("PRAGMA busy_timeout=5000;")  # мс
+    # Освобождённые страницы возвращаем файлу по incremental_vacuum (см. sweeper)
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        try:
+            con.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            con.execute("VACUUM")  # переключение режима у существующей БД
+        except sqlite3.OperationalError as e:
+            logging.warning("auto_vacuum switch skipped: %s", e)
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS tokens (inv TEXT PRIMARY KEY, token TEXT, expires_at INTEGER)"
+    )
+    con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    # Миграция старой схемы tokens(inv, token) без срока жизни
+    if "expires_at" not in {r[1] for r in con.execute("PRAGMA table_info(tokens)")}:
+        con.execute("ALTER TABLE tokens ADD COLUMN expires_at INTEGER")
+        con.execute(
+            "UPDATE tokens SET expires_at=? WHERE expires_at IS NULL",
+            (int(time.time()) + TOKEN_TTL,),
+        )
+    con.execute("CREATE INDEX IF NOT EXISTS tokens_expires ON tokens(expires_at)")
+    con.commit()
+    return con
+
+
+class _LazyDB:
+    """
+    sqlite3.Connection, открываемое при первом обращении: импорт main не ждёт
+    миграции и DDL. Lifespan открывает его в фоне сразу после старта.
+    """
+
+    def __init__(self, opener):
+        self._opener = opener
+        self._con: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self._con is None:
+            with self._lock:
+                if self._con is None:
+                    self._con = self._opener()
+        return self._con
+
+    def __getattr__(self, name):
+        return getattr(self.connect(), name)
+
+    def __enter__(self):
+        return self.connect().__enter__()
+
+    def __exit__(self, *exc):
+        return self.connect().__exit__(*exc)
+
+
+DB = _LazyDB(_open_db)
+
+
+# ── метрики (/metrics) ──
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# Снимок старше этого — от прошлого запуска с тем же PID. Порог с запасом:
+# синхронные вызовы модели (gen + repair + desc) держат event loop воркера,
+# и его flush() может опоздать на несколько OPENAI_TIMEOUT.
+METRICS_MAX_AGE = float(
+    os.getenv(
+        "METRICS_MAX_AGE",
+        str(max(12 * METRICS_FLUSH_INTERVAL, 4 * OPENAI_TIMEOUT)),
+    )
+)
+metrics.configure(
+    os.getenv("METRICS_DIR", os.path.join(DATA_DIR, "metrics")),
+    max_age=METRICS_MAX_AGE,
+)
+metrics.histogram("wb6_wb_fetch_ms", "WB card fetch time, ms")
+metrics.histogram(
+    "wb6_wb_probes",
+    "HTTP probes per WB card fetch",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 20, 25),
+)
+metrics.histogram(
+    "wb6_html_norm_ms",
+    "Description HTML normalization time, ms",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250),
+)
+metrics.histogram("wb6_gen_ms", "Generation time per model, ms")
+metrics.histogram("wb6_repair_ms", "Repair pass time, ms")
+metrics.histogram("wb6_desc_ms", "Description generation time, ms")
+metrics.histogram("wb6_request_ms", "Total request time, ms")
+metrics.counter("wb6_errors_total", "Error responses by code")
+metrics.counter("wb6_cache_total", "Cache lookups by cache and result")
+metrics.counter("wb6_fallbacks_total", "Fallbacks taken by kind")
+metrics.counter("wb6_llm_input_tokens_total", "LLM prompt tokens by call and model")
+metrics.counter(
+    "wb6_llm_cached_tokens_total", "LLM prompt tokens served from provider cache"
+)
+metrics.counter(
+    "wb6_keywords_fixed_total", "Keywords dropped/deduped/filled by post-processing"
+)
+metrics.histogram("wb6_llm_ms", "LLM call time by call and cache (hit|miss), ms")
+metrics.gauge("wb6_cpu_pool_workers", "CPU pool size")
+metrics.gauge("wb6_cpu_pool_queue_depth", "CPU pool tasks submitted and not finished")
+metrics.counter("wb6_cpu_tasks_total", "CPU-heavy calls by mode (inline|pool)")
+
+# CPU-тяжёлые этапы (нормализация, разбор JSON) для входов от порога — в пуле
+cpupool.configure(
+    kind=os.getenv("CPU_POOL", "thread").lower(),  # thread|process|off
+    workers=int(os.getenv("CPU_POOL_WORKERS", "2")),
+    threshold=int(os.getenv("CPU_POOL_THRESHOLD", "20000")),  # символов
+)
+
+
+@metrics.register_collector
+def _cpu_pool_metrics():
+    cfg = cpupool.settings()
+    workers = 0 if cfg["kind"] == "off" else cfg["workers"]
+    return [
+        ("wb6_cpu_pool_workers", {"kind": cfg["kind"]}, workers),
+        ("wb6_cpu_pool_queue_depth", {}, cpupool.STATS["pending"]),
+        ("wb6_cpu_tasks_total", {"mode": "inline"}, cpupool.STATS["inline"]),
+        ("wb6_cpu_tasks_total", {"mode": "pool"}, cpupool.STATS["pooled"]),
+    ]
 
-# Открываем SQLite с таймаутом и включаем WAL для устойчивости к конкуренции
-DB = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=30)
-DB.execute("PRAGMA journal_mode=WAL;")
-DB.execute("PRAGMA synchronous=NORMAL;")
-DB.execute("PRAGMA busy_timeout=5000;")  # мс
-DB.execute("CREATE TABLE IF NOT EXISTS tokens (inv TEXT PRIMARY KEY, token TEXT)")
-DB.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
-DB.commit()
+
+async def _metrics_flush_loop():
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            metrics.flush()
+        except Exception as e:
+            logging.warning("metrics flush failed: %s", e)
 
 
 def store_token(inv: str, token: str):
     with DB:
         DB.execute(
-            "INSERT OR REPLACE INTO tokens(inv, token) VALUES(?, ?)", (str(inv), token)
+            "INSERT OR REPLACE INTO tokens(inv, token, expires_at) VALUES(?, ?, ?)",
+            (str(inv), token, int(time.time()) + TOKEN_TTL),
         )
 
 
 def fetch_token(inv: str) -> str | None:
-    cur = DB.execute("SELECT token FROM tokens WHERE inv=?", (str(inv),))
-    row = cur.fetchone()
-    if row:
-        with DB:
-            DB.execute("DELETE FROM tokens WHERE inv=?", (str(inv),))
-        return row[0]
-    return None
+    # Одна атомарная операция: забрать и удалить (SQLite >= 3.35)
+    with DB:
+        row = DB.execute(
+            "DELETE FROM tokens WHERE inv=? RETURNING token, expires_at", (str(inv),)
+        ).fetchone()
+    if not row or (row[1] is not None and row[1] < time.time()):
+        return None
+    return row[0]
 
 
-def next_inv_id() -> int:
+# ── фоновая очистка просроченных токенов ──
+SWEEP_INTERVAL = float(os.getenv("TOKENS_SWEEP_INTERVAL", "600"))  # сек
+SWEEP_BATCH = int(os.getenv("TOKENS_SWEEP_BATCH", "200"))
+SWEEP_VACUUM_EVERY = int(os.getenv("TOKENS_VACUUM_EVERY", "6"))  # каждые N проходов
+SWEEP_STATS = {"runs": 0, "last_at": None, "last_deleted": 0, "last_ms": 0}
+
+
+async def sweep_tokens(now: float | None = None) -> int:
     """
-    Атомарно увеличивает счётчик last_inv и возвращает новое значение.
-    Хранится в таблице meta (key='last_inv'), тип value — TEXT, но пишем числа.
-    Стартовое значение берётся из ENV INV_START (дефолт 3000).
+    Удаляет просроченные токены небольшими пачками, отдавая управление
+    event loop между пачками, чтобы не задерживать запросы.
+    Каждые SWEEP_VACUUM_EVERY проходов — incremental_vacuum и checkpoint WAL.
     """
-    INV_START = int(os.getenv("INV_START", "3000"))
-    with DB:
-        # Инициализация (однократно): если ключа нет — создаём со стартом (INV_START-1), чтобы после инкремента получить INV_START
+    t0 = time.monotonic()
+    cutoff = int(now if now is not None else time.time())
+    deleted = 0
+    while True:
+        with DB:
+            cur = DB.execute(
+                "DELETE FROM tokens WHERE rowid IN "
+                "(SELECT rowid FROM tokens WHERE expires_at < ? LIMIT ?)",
+                (cutoff, SWEEP_BATCH),
+            )
+        deleted += cur.rowcount
+        if cur.rowcount < SWEEP_BATCH:
+            break
+        await asyncio.sleep(0)
+    SWEEP_STATS["runs"] += 1
+    if SWEEP_VACUUM_EVERY > 0 and SWEEP_STATS["runs"] % SWEEP_VACUUM_EVERY == 0:
+        DB.execute("PRAGMA incremental_vacuum(500)").fetchall()
+        DB.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    SWEEP_STATS.update(
+        last_at=int(time.time()),
+        last_deleted=deleted,
+        last_ms=int((time.monotonic() - t0) * 1000),
+    )
+    return deleted
+
+
+async def _sweeper_loop():
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            await sweep_tokens()
+        except Exception as e:
+            logging.warning("tokens sweep failed: %s", e)
+
+
+def tokens_db_stats() -> dict:
+    page_size = DB.execute("PRAGMA page_size").fetchone()[0]
+    pages = DB.execute("PRAGMA page_count").fetchone()[0]
+    free = DB.execute("PRAGMA freelist_count").fetchone()[0]
+    rows = DB.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+    expired = DB.execute(
+        "SELECT COUNT(*) FROM tokens WHERE expires_at < ?", (int(time.time()),)
+    ).fetchone()[0]
+    wal = DB_PATH + "-wal"
+    return {
+        "rows": rows,
+        "expired": expired,
+        "db_bytes": page_size * pages,
+        "free_bytes": page_size * free,
+        "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0,
+        "sweep": dict(SWEEP_STATS),
+    }
+
+
+# ── ожидание токена (long-poll /paytoken/wait) ──
+# Внутри процесса ожидающий запрос «паркуется» на asyncio.Event по inv и
+# просыпается сразу из create_account. Если ResultURL пришёл в другой воркер,
+# изменение видно через PRAGMA data_version общей БД (дёшево, без чтения таблиц).
+TOKEN_WAIT_MAX = float(os.getenv("PAYTOKEN_WAIT_MAX", "25"))
+TOKEN_WAIT_POLL = float(os.getenv("PAYTOKEN_WAIT_POLL", "1.0"))
+_TOKEN_WAITERS: dict[str, set[asyncio.Event]] = {}
+
+
+def _db_data_version() -> int:
+    return DB.execute("PRAGMA data_version").fetchone()[0]
+
+
+def _notify_token(inv: str):
+    for ev in _TOKEN_WAITERS.get(str(inv), ()):
+        ev.set()
+
+
+def take_token(inv: str) -> str | None:
+    """Забирает токен из БД (или in-memory копии) и удаляет обе записи."""
+    tok = fetch_token(inv)
+    mem = TOKENS.pop(str(inv), None)
+    return tok or mem
+
+
+async def wait_token(inv: str, timeout: float) -> str | None:
+    """Ждёт токен по inv не дольше timeout секунд; None — если не дождались."""
+    inv = str(inv)
+    tok = take_token(inv)
+    if tok or timeout <= 0:
+        return tok
+    ev = asyncio.Event()
+    _TOKEN_WAITERS.setdefault(inv, set()).add(ev)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    seen = _db_data_version()
+    try:
+        while True:
+            left = deadline - loop.time()
+            if left <= 0:
+                return None
+            try:
+                await asyncio.wait_for(ev.wait(), min(left, TOKEN_WAIT_POLL))
+            except asyncio.TimeoutError:
+                ver = _db_data_version()
+                if ver == seen:
+                    continue
+                seen = ver
+            ev.clear()
+            tok = take_token(inv)
+            if tok:
+                return tok
+    finally:
+        waiters = _TOKEN_WAITERS.get(inv)
+        if waiters is not None:
+            waiters.discard(ev)
+            if not waiters:
+                _TOKEN_WAITERS.pop(inv, None)
+
+
+# ── выдача номеров счетов ──
+# Каждый воркер резервирует в БД блок из INV_BLOCK номеров одной транзакцией
+# и раздаёт их из памяти. meta.last_inv — верхняя граница уже выданных блоков,
+# поэтому неиспользованный остаток блока после рестарта не переиспользуется.
+INV_MAX = 2_147_483_647  # 32-битный int
+INV_BLOCK = max(1, int(os.getenv("INV_BLOCK", "20")))
+_INV_LOCK = threading.Lock()
+_INV_RANGE = [1, 0]  # [следующий, последний] номер в текущем блоке
+
+
+def _reserve_inv_block(size: int) -> tuple[int, int]:
+    """Резервирует диапазон [lo, hi] номеров. Стартовое значение — ENV INV_START."""
+    inv_start = int(os.getenv("INV_START", "3000"))
+    DB.execute("BEGIN IMMEDIATE")  # сразу берём write-lock: read-modify-write
+    try:
         DB.execute(
             "INSERT OR IGNORE INTO meta(key, value) VALUES('last_inv', ?)",
-            (str(INV_START - 1),),
+            (str(inv_start - 1),),
         )
-        # Атомарный инкремент
-        DB.execute(
-            "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key='last_inv'"
+        last = int(
+            DB.execute("SELECT value FROM meta WHERE key='last_inv'").fetchone()[0]
         )
-        cur = DB.execute("SELECT value FROM meta WHERE key='last_inv'")
-        row = cur.fetchone()
-        nxt = int(row[0]) if row else INV_START
-        # Ограничим верхнюю границу 32-битным int (Robokassa нормально живёт с бОльшими, но оставим поведение)
-        if nxt > 2_147_483_647:
-            nxt = INV_START
-            DB.execute("UPDATE meta SET value = ? WHERE key='last_inv'", (str(nxt),))
+        # Упёрлись в 32-битную границу — начинаем сначала
+        if last >= INV_MAX:
+            last = inv_start - 1
+        lo, hi = last + 1, min(last + size, INV_MAX)
+        DB.execute("UPDATE meta SET value = ? WHERE key='last_inv'", (str(hi),))
+        DB.commit()
+    except Exception:
+        DB.rollback()
+        raise
+    return lo, hi
+
+
+def next_inv_id() -> int:
+    """Возвращает следующий уникальный номер счёта (из зарезервированного блока)."""
+    with _INV_LOCK:
+        if _INV_RANGE[0] > _INV_RANGE[1]:
+            _INV_RANGE[:] = _reserve_inv_block(INV_BLOCK)
+        nxt = _INV_RANGE[0]
+        _INV_RANGE[0] += 1
     return nxt
 
 
 PRICES = {"1": "1", "15": "199", "60": "499", "200": "999"}
 
 
+# Раскладка сообщений под кэш префиксов у провайдера (OpenAI кэширует
+# совпадающее начало запроса от 1024 токенов): один статичный system на все
+# задания, затем текст карточки, и только в конце — само задание с
+# изменяемой частью (инструкции описания, черновик для починки). Так system
+# общий для всех запросов, а system + карточка — для всех вызовов одного
+# /rewrite. Попадания в кэш видны в wb6_llm_cached_tokens_total.
 PROMPT = """
 Ты — опытный SEO-копирайтер маркетплейса Wildberries.
-Тебе дают исходный текст карточки товара.
+Первым сообщением тебе дают исходный текст карточки товара, последним —
+задание: КАРТОЧКА, ОПИСАНИЕ или ПОЧИНКА. Выполняй только его.
+
+━━━ КАРТОЧКА ━━━
 
 🔹 ЗАДАЧА  
 Сгенерируй:
@@ -208,9 +585,162 @@ PROMPT = """
 }
 
 Валидация: не более 100 символов заголовок; ровно 6 буллитов; ровно 20 ключей.
+
+━━━ ОПИСАНИЕ ━━━
+
+Ты редактор маркетплейса. Перепиши связное ОПИСАНИЕ товара по инструкциям из
+задания. Верни ТОЛЬКО текст описания, без пояснений и без JSON.
+
+━━━ ПОЧИНКА ━━━
+
+Задание содержит черновик ответа. Верни строго валидный JSON по схеме
+{title, bullets[6], keywords[20]} без комментариев и пояснений; чего нет в
+черновике — возьми из текста карточки по правилам раздела КАРТОЧКА.
 """
 
-app = FastAPI()
+TASKS = {
+    "card": "Задание: КАРТОЧКА. Верни JSON.",
+    "desc": "Задание: ОПИСАНИЕ. Инструкции: {extra}",
+    "repair": "Задание: ПОЧИНКА. Черновик ответа:\n{extra}",
+    "variants": (
+        "Задание: КАРТОЧКА, {extra} разных вариантов. Верни JSON-объект "
+        '{{"variants": [...]}} из {extra} карточек по схеме; заголовки не повторяй.'
+    ),
+}
+
+
+def _llm_messages(task: str, card: str, extra: str = "") -> list[dict]:
+    return [
+        {"role": "system", "content": PROMPT},
+        {"role": "user", "content": card},
+        {"role": "user", "content": TASKS[task].format(extra=extra)},
+    ]
+
+
+# Что отложено при импорте, догружаем в фоне после старта: /health отвечает
+# сразу, а первый /rewrite обычно уже не ждёт импорта openai и открытия БД.
+# Затем прогрев: TLS-соединения к OpenAI и basket-хостам WB кладутся в пулы
+# и поддерживаются пингами, пока простаивают. Готовность — в /healthz.
+STARTUP: dict = {"preload_ms": None, "warm_ms": None, "warm": {}, "ready": False}
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
+WARM_WB_HOSTS = [
+    h.strip()
+    for h in os.getenv(
+        "WARM_WB_HOSTS",
+        ",".join([f"basket-{i:02d}.wb.ru" for i in range(1, 13)] + ["card.wb.ru"]),
+    ).split(",")
+    if h.strip()
+]
+WARM_PING_INTERVAL = float(os.getenv("WARM_PING_INTERVAL", "45"))  # сек, 0 — без
+WARM_TIMEOUT = float(os.getenv("WARM_TIMEOUT", "5"))
+metrics.gauge("wb6_warmup_ms", "Startup connection warm-up time, ms")
+
+
+def _preload():
+    t0 = time.perf_counter()
+    for name, fn in (
+        ("db", DB.connect),
+        ("openai", get_client),
+        ("requests", lambda: requests.Session),
+    ):
+        try:
+            fn()
+        except Exception as e:
+            logging.warning("preload %s failed: %s", name, e)
+    STARTUP["preload_ms"] = round((time.perf_counter() - t0) * 1000)
+    logging.info("preload done in %d ms", STARTUP["preload_ms"])
+
+
+def _warm_openai():
+    try:
+        get_client().with_options(max_retries=0, timeout=WARM_TIMEOUT).models.retrieve(
+            MODEL
+        )
+    except Exception as e:
+        # 401/404 тоже годятся: TLS уже установлен, соединение лежит в пуле
+        if getattr(e, "status_code", None) is None:
+            raise
+
+
+def _warm_wb(host: str):
+    _wb_session().head(f"https://{host}/", timeout=WARM_TIMEOUT, allow_redirects=False)
+    _LAST_USE[host] = time.monotonic()
+
+
+def _warm_one(fn) -> dict:
+    t0 = time.perf_counter()
+    res: dict = {"ok": True}
+    try:
+        fn()
+    except Exception as e:
+        res = {"ok": False, "error": type(e).__name__}
+    res["ms"] = round((time.perf_counter() - t0) * 1000)
+    return res
+
+
+def _warm_up(only_idle: bool = False) -> dict:
+    """Параллельно открывает соединения; only_idle — только простаивающие цели."""
+    targets = {"openai": _warm_openai}
+    targets.update({h: functools.partial(_warm_wb, h) for h in WARM_WB_HOSTS})
+    if only_idle:
+        now = time.monotonic()
+        targets = {
+            k: fn
+            for k, fn in targets.items()
+            if now - _LAST_USE.get(k, 0) >= WARM_PING_INTERVAL
+        }
+    if not targets:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(min(8, len(targets))) as ex:
+        futs = {k: ex.submit(_warm_one, fn) for k, fn in targets.items()}
+    return {k: f.result() for k, f in futs.items()}
+
+
+async def _startup():
+    await asyncio.to_thread(_preload)
+    if WARM_UP:
+        t0 = time.perf_counter()
+        STARTUP["warm"] = await asyncio.to_thread(_warm_up)
+        STARTUP["warm_ms"] = round((time.perf_counter() - t0) * 1000)
+        metrics.set_value("wb6_warmup_ms", STARTUP["warm_ms"])
+        ok = sum(1 for r in STARTUP["warm"].values() if r["ok"])
+        logging.info(
+            "warm-up done in %d ms (%d/%d targets)",
+            STARTUP["warm_ms"],
+            ok,
+            len(STARTUP["warm"]),
+        )
+    STARTUP["ready"] = True
+    if WARM_UP and WARM_PING_INTERVAL > 0:
+        await _keep_warm()
+
+
+async def _keep_warm():
+    while True:
+        await asyncio.sleep(WARM_PING_INTERVAL)
+        try:
+            await asyncio.to_thread(_warm_up, True)
+        except Exception as e:
+            logging.warning("keep-alive ping failed: %s", e)
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(app):
+    tasks = [
+        asyncio.create_task(_startup()),
+        asyncio.create_task(_sweeper_loop()),
+        asyncio.create_task(_metrics_flush_loop()),
+    ]
+    try:
+        yield
+    finally:
+        for t in tasks:
+            t.cancel()
+        cpupool.shutdown()
+        metrics.remove_own()
+
+
+app = FastAPI(lifespan=_lifespan, default_response_class=fastresp.FastJSONResponse)
 
 # ── CORS ──────────────────────────────────────
 origins = [
@@ -229,6 +759,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/brotli для ответов от COMPRESS_MIN_BYTES (0 — не сжимать)
+app.add_middleware(
+    fastresp.CompressMiddleware,
+    min_size=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+)
 
 
 @app.options("/rewrite", include_in_schema=False)  # pre-flight
@@ -249,15 +784,70 @@ def issue(email: str, quota: int):
     )
 
 
-def verify(tok: str):
+# LRU-кэш проверенных JWT: ключ — sha256 всего токена (с подписью), поэтому
+# изменённый токен всегда идёт на полную проверку. exp сверяется при каждом hit.
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "1024"))
+_JWT_CACHE: "OrderedDict[str, dict]" = OrderedDict()
+_JWT_CACHE_LOCK = threading.Lock()
+JWT_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+
+@metrics.register_collector
+def _jwt_cache_metrics():
+    return [
+        ("wb6_cache_total", {"cache": "jwt", "result": "hit"}, JWT_CACHE_STATS["hits"]),
+        (
+            "wb6_cache_total",
+            {"cache": "jwt", "result": "miss"},
+            JWT_CACHE_STATS["misses"],
+        ),
+    ]
+
+
+def _verify_uncached(tok: str):
     try:
         return jwt.decode(tok, SECRET, algorithms=["HS256"])
     except:
         return None
 
 
+def verify(tok: str):
+    if JWT_CACHE_SIZE <= 0 or not tok:
+        return _verify_uncached(tok)
+    key = hashlib.sha256(tok.encode()).hexdigest()
+    with _JWT_CACHE_LOCK:
+        claims = _JWT_CACHE.get(key)
+        if claims is not None:
+            exp = claims.get("exp")
+            if exp is not None and exp <= time.time():
+                del _JWT_CACHE[key]
+                JWT_CACHE_STATS["expired"] += 1
+                return None
+            _JWT_CACHE.move_to_end(key)
+            JWT_CACHE_STATS["hits"] += 1
+            tracing.annotate(cache="hit")
+            return dict(claims)  # вызывающий код меняет quota
+        JWT_CACHE_STATS["misses"] += 1
+    claims = _verify_uncached(tok)
+    if claims is None:
+        return None
+    with _JWT_CACHE_LOCK:
+        _JWT_CACHE[key] = dict(claims)
+        _JWT_CACHE.move_to_end(key)
+        while len(_JWT_CACHE) > JWT_CACHE_SIZE:
+            _JWT_CACHE.popitem(last=False)
+            JWT_CACHE_STATS["evictions"] += 1
+    return claims
+
+
+def _mask_email(addr: str) -> str:
+    name, _, domain = (addr or "").partition("@")
+    return f"{name[:1]}***@{domain}" if domain else "***"
+
+
 def send_email(to: str, login: str, password: str):
-    logging.info(f"Email to {to}: login={login} password={password}")
+    # Логин и пароль в лог не пишем
+    logging.info("Email with credentials to %s", _mask_email(to))
 
 
 def create_account(email: str, quota: int, inv: str):
@@ -268,6 +858,7 @@ def create_account(email: str, quota: int, inv: str):
     token = issue(email, quota)
     TOKENS[inv] = token
     store_token(inv, token)
+    _notify_token(inv)
     send_email(email, login, password)
     return token
 
@@ -389,10 +980,7 @@ def _wb_card_fetch_old(url: str, keep_html: bool = False) -> tuple[str, dict]:
             trace.append({"url": u, "error": str(e)})
 
     # Нормализация
-    cleaned = re.sub(r"</?(p|li|br|ul|ol)[^>]*>", "\n", desc_html or "", flags=re.I)
-    text = BeautifulSoup(cleaned, "html.parser").get_text("\n", strip=True)
-    text = re.sub(r"\s+\n", "\n", text)
-    text = re.sub(r"[ \t]{2,}", " ", html.unescape(text)).strip()
+    text = textnorm.html_to_text(desc_html or "")
 
     # Если безуспешно — вернём исходный url как раньше (но meta приложим)
     if len(text) < 60:
@@ -404,13 +992,43 @@ def _wb_card_fetch_old(url: str, keep_html: bool = False) -> tuple[str, dict]:
     return final, meta
 
 
-def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
-    """Новая обёртка: вернуть очищенный текст и диагностику."""
+_WB_SESSION = None
+_WB_SESSION_LOCK = threading.Lock()
+
+
+def _wb_session():
+    """Общая сессия к WB: TLS-соединения к basket-хостам переиспользуются."""
+    global _WB_SESSION
+    if _WB_SESSION is None:
+        with _WB_SESSION_LOCK:
+            if _WB_SESSION is None:
+                s = requests.Session()
+                # 25 хостов (basket/static-basket/card): держим пул на каждый
+                s.mount(
+                    "https://",
+                    requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=8),
+                )
+                _WB_SESSION = s
+    return _WB_SESSION
+
+
+async def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
+    """
+    Новая обёртка: вернуть очищенный текст и диагностику.
+    Запросы к WB идут в потоках, нормализация HTML — через cpupool.run:
+    event loop не ждёт ни сеть, ни разбор длинного описания.
+    """
+    with tracing.span("wb_fetch"):
+        return await _wb_card_fetch(url, debug)
+
+
+async def _wb_card_fetch(url: str, debug: bool) -> tuple[str, dict]:
     m = re.search(r"/catalog/(\d+)/", url)
     if not m:
         return "", {"nm": None, "hit": None, "trace": [], "picked_len": 0}
     nm = int(m.group(1))
     vol, part = nm // 100000, nm // 1000
+    t0 = time.perf_counter()
 
     def _pick_name(d: dict) -> str:
         for k in ("imt_name", "name", "object"):
@@ -426,7 +1044,7 @@ def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
         "descriptionShort",
     )
 
-    s = requests.Session()
+    s = _wb_session()
     s.headers.update(
         {"User-Agent": WB_UA or "Mozilla/5.0", "Accept": "application/json"}
     )
@@ -435,17 +1053,15 @@ def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
     hit: dict | None = None
     name, final_text = "", ""
 
-    def _norm(html_text: str) -> str:
-        cleaned = re.sub(r"</?(p|li|br|ul|ol)[^>]*>", "\n", html_text or "", flags=re.I)
-        txt = BeautifulSoup(cleaned, "html.parser").get_text("\n", strip=True)
-        txt = re.sub(r"\s+\n", "\n", txt)
-        txt = re.sub(r"[ \t]{2,}", " ", html.unescape(txt)).strip()
-        return txt
-
-    def _probe(u: str, card_mode: bool = False) -> bool:
+    async def _probe(u: str, card_mode: bool = False) -> bool:
         nonlocal name, final_text, hit
         try:
-            r = s.get(u, timeout=WB_TIMEOUT, allow_redirects=True)
+            host = u.split("/")[2]
+            with tracing.span("probe", host=host):
+                r = await asyncio.to_thread(
+                    s.get, u, timeout=WB_TIMEOUT, allow_redirects=True
+                )
+            _LAST_USE[host] = time.monotonic()
             ctype = r.headers.get("Content-Type", "")
             ok_json = getattr(r, "ok", True) and ("application/json" in ctype)
             length = int(r.headers.get("Content-Length") or 0) or len(
@@ -486,7 +1102,10 @@ def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
                         break
             if not html_desc:
                 return False
-            text = _norm(html_desc)
+            with metrics.timer("wb6_html_norm_ms"), tracing.span("norm"):
+                text = await cpupool.run(
+                    textnorm.html_to_text, html_desc, size=len(html_desc)
+                )
             if len(text) < 60:
                 return False
             hit = {k: rec[k] for k in ("url", "status", "ctype", "len")}
@@ -501,13 +1120,13 @@ def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
         f"https://static-basket-{{i:02d}}.wb.ru/vol{vol}/part{part}/{nm}/info/ru/card.json",
     ):
         for i in range(1, 13):
-            if _probe(tpl.format(i=i)):
+            if await _probe(tpl.format(i=i)):
                 break
         if final_text:
             break
 
     if not final_text:
-        _probe(
+        await _probe(
             f"https://card.wb.ru/cards/detail?appType=1&curr=rub&nm={nm}",
             card_mode=True,
         )
@@ -518,68 +1137,20 @@ def wb_card_fetch(url: str, debug: bool = False) -> tuple[str, dict]:
         "trace": trace if debug else trace[:3],
         "picked_len": len(final_text),
     }
+    metrics.observe("wb6_wb_fetch_ms", (time.perf_counter() - t0) * 1000)
+    metrics.observe("wb6_wb_probes", len(trace))
     return final_text if final_text else "", meta
 
 
 def wb_card_text(url: str) -> str:
-    final, _ = wb_card_fetch(url, debug=True)
+    """Синхронная обёртка для скриптов и тестов (не из event loop)."""
+    final, _ = asyncio.run(wb_card_fetch(url, debug=True))
     return final
 
 
 # ============================
 # 🔎 Вспомогательные утилиты
 # ============================
-_JSON_OBJ = re.compile(r"\{.*\}", re.S)
-
-
-def _extract_json(s: str):
-    if not isinstance(s, str) or "{" not in s:
-        return None
-    m = _JSON_OBJ.search(s)
-    if not m:
-        return None
-    try:
-        return json.loads(m.group(0))
-    except Exception:
-        return None
-
-
-def _schema_ok(d):
-    if not isinstance(d, dict):
-        return False
-    if not all(k in d for k in ("title", "bullets", "keywords")):
-        return False
-    if not isinstance(d.get("bullets"), list) or len(d["bullets"]) != 6:
-        return False
-    if not isinstance(d.get("keywords"), list) or len(d["keywords"]) != 20:
-        return False
-    return True
-
-
-def _find_schema_dict(obj, _depth=0):
-    """Рекурсивно находит первый dict по нашей схеме во вложенных структурах."""
-    if _depth > 6:
-        return None
-    try:
-        if hasattr(obj, "model_dump"):
-            obj = obj.model_dump()
-    except Exception:
-        pass
-    if isinstance(obj, dict):
-        if _schema_ok(obj):
-            return obj
-        for v in obj.values():
-            x = _find_schema_dict(v, _depth + 1)
-            if x:
-                return x
-    elif isinstance(obj, (list, tuple)):
-        for v in obj:
-            x = _find_schema_dict(v, _depth + 1)
-            if x:
-                return x
-    return None
-
-
 def _uses_max_completion_tokens(model_name: str) -> bool:
     """
     Эвристика: модели reasoning-поколения (gpt-5, gpt-4.1, o-серия)
@@ -649,11 +1220,8 @@ def _json_response_format(model: str, want: str = OPENAI_JSON_MODE):
     return {"type": "json_object"}
 
 
-def _msg_to_data_and_raw(msg):
-    """
-    Возвращает (data_dict_or_None, raw_text).
-    Предпочитает структурированный ответ (message.parsed), затем content parts, затем глубокий поиск JSON.
-    """
+def _msg_parsed_and_raw(msg):
+    """(dict по схеме из message.parsed или None, сырой текст ответа)."""
     # 1) structured output (parsed)
     parsed = getattr(msg, "parsed", None)
     if parsed is not None:
@@ -668,11 +1236,11 @@ def _msg_to_data_and_raw(msg):
                 d = json.loads(getattr(parsed, "json", lambda: str(parsed))())
         except Exception:
             d = None
-        if isinstance(d, dict) and _schema_ok(d):
-            return d, json.dumps(d, ensure_ascii=False)
-        found = _find_schema_dict(parsed)
+        if isinstance(d, dict) and jsonscan.schema_ok(d):
+            return d, ""
+        found = jsonscan.find_schema_dict(parsed)
         if found:
-            return found, json.dumps(found, ensure_ascii=False)
+            return found, ""
 
     # 2) content как строка или список частей
     content = getattr(msg, "content", None)
@@ -703,15 +1271,32 @@ def _msg_to_data_and_raw(msg):
     else:
         raw = (str(content) if content is not None else "") or ""
 
-    d = _extract_json(raw) or None
-    if _schema_ok(d or {}):
+    return None, raw
+
+
+def _data_from_msg(msg, raw: str, d):
+    if jsonscan.schema_ok(d or {}):
         return d, raw
-    found = _find_schema_dict(msg)
+    found = jsonscan.find_schema_dict(msg)
     if found:
         return found, json.dumps(found, ensure_ascii=False)
     return d, raw
 
 
+async def _amsg_to_data_and_raw(msg):
+    """
+    Возвращает (data_dict_or_None, raw_text).
+    Предпочитает структурированный ответ (message.parsed), затем content parts, затем глубокий поиск JSON.
+    Длинный ответ разбирается в пуле (cpupool.run), event loop не ждёт.
+    """
+    with tracing.span("extract"):
+        found, raw = _msg_parsed_and_raw(msg)
+        if found:
+            return found, json.dumps(found, ensure_ascii=False)
+        d = await cpupool.run(jsonscan.extract_json, raw, size=len(raw)) or None
+        return _data_from_msg(msg, raw, d)
+
+
 def _shape_digest(obj, maxlen: int = 200):
     """
     Короткий дайджест структуры для логов (когда включён EXPOSE_MODEL_ERRORS).
@@ -734,7 +1319,10 @@ def _is_json_mode_unsupported(err: Exception) -> bool:
 
 
 # --- утилита: безопасный вызов OpenAI ---
-def _openai_chat(messages, model, max_tokens=OPENAI_MAX_TOKENS, json_mode: bool = True):
+@tracing.traced("openai_chat")
+def _openai_chat(
+    messages, model, max_tokens=OPENAI_MAX_TOKENS, json_mode: bool = True, n: int = 1
+):
     """
     Универсальный вызов chat.completions:
      - если есть .with_options(timeout=...), используем его;
@@ -742,10 +1330,13 @@ def _openai_chat(messages, model, max_tokens=OPENAI_MAX_TOKENS, json_mode: bool
      - если и это не поддерживается (старый SDK) — вызываем без тайм-аута.
     По возможности просим строгий JSON (json_schema|json_object).
     """
+    client = get_client()
     kwargs = dict(
         model=model,
         messages=messages,
     )
+    if n > 1:
+        kwargs["n"] = n  # несколько вариантов за один вызов
     # Температура: для reasoning-моделей НЕ передаём параметр (используется дефолт=1)
     if not _omit_temperature(model):
         kwargs["temperature"] = OPENAI_TEMPERATURE
@@ -762,7 +1353,8 @@ def _openai_chat(messages, model, max_tokens=OPENAI_MAX_TOKENS, json_mode: bool
     if rf and rf.get("type") == "json_schema":
         try:
             # parse() обычно не принимает timeout напрямую; пробуем без with_options
-            return client.chat.completions.parse(**kwargs)
+            with tracing.span("parse"):
+                return client.chat.completions.parse(**kwargs)
         except Exception:
             # продолжим обычным путём ниже
             pass
@@ -774,6 +1366,7 @@ def _openai_chat(messages, model, max_tokens=OPENAI_MAX_TOKENS, json_mode: bool
         except Exception as e:
             # если json_schema не поддержан — фолбэк на json_object
             if rf and rf.get("type") == "json_schema":
+                metrics.inc("wb6_fallbacks_total", kind="json_object")
                 try:
                     kwargs_fallback = dict(kwargs)
                     kwargs_fallback["response_format"] = {"type": "json_object"}
@@ -791,18 +1384,26 @@ def _openai_chat(messages, model, max_tokens=OPENAI_MAX_TOKENS, json_mode: bool
         except Exception as e:
             # фолбэк с json_object, если json_schema не поддержан
             if rf and rf.get("type") == "json_schema":
+                metrics.inc("wb6_fallbacks_total", kind="json_object")
                 kwargs_fb = dict(kwargs)
                 kwargs_fb["response_format"] = {"type": "json_object"}
                 return client.chat.completions.create(**kwargs_fb)
             raise
 
 
-def _openai_responses(*, messages, model, json_mode: bool):
+@tracing.traced("openai_responses")
+def _openai_responses(*, messages, model, json_mode: bool, json_format: str = ""):
     """
     Новый путь: Responses API — используем для gpt-5.
     input — это список messages со структурой роли/контента.
+    json_format — schema|object|off вместо OPENAI_JSON_MODE для этого вызова.
     """
-    rf = _json_response_format(model, OPENAI_JSON_MODE) if json_mode else None
+    client = get_client()
+    rf = (
+        _json_response_format(model, json_format or OPENAI_JSON_MODE)
+        if json_mode
+        else None
+    )
     opts = getattr(client.responses, "with_options", None)
     kwargs = {"model": model, "input": messages}
     if rf:
@@ -848,7 +1449,7 @@ def _openai_responses(*, messages, model, json_mode: bool):
 
 def _msg_from_response(resp):
     """
-    Унифицируем извлечение 'сообщения' из Responses API под интерфейс _msg_to_data_and_raw.
+    Унифицируем извлечение 'сообщения' из Responses API под интерфейс _amsg_to_data_and_raw.
     Возвращаем объект-пустышку с полем .content = output_text (если он есть),
     а также склеиваем все json/text части.
     """
@@ -891,6 +1492,28 @@ def _msg_from_response(resp):
     return _M(raw or "")
 
 
+def _record_usage(resp, call: str, ms: int) -> int:
+    """
+    Токены промпта и попадания в кэш префиксов из usage ответа: chat.completions
+    (prompt_tokens_details) и Responses API (input_tokens_details).
+    Возвращает число закэшированных токенов.
+    """
+    usage = getattr(resp, "usage", None)
+    model = getattr(resp, "model", None) or "unknown"
+    prompt = getattr(usage, "prompt_tokens", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    if prompt is None:
+        prompt = getattr(usage, "input_tokens", None)
+        details = getattr(usage, "input_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    cached = cached if isinstance(cached, int) else 0
+    if isinstance(prompt, int):
+        metrics.inc("wb6_llm_input_tokens_total", prompt, call=call, model=model)
+        metrics.inc("wb6_llm_cached_tokens_total", cached, call=call, model=model)
+    metrics.observe("wb6_llm_ms", ms, call=call, cache="hit" if cached else "miss")
+    return cached
+
+
 def _extract_text_from_responses(res) -> str:
     """
     Универсально достаёт plain-текст из OpenAI Responses API (gpt-5).
@@ -917,11 +1540,11 @@ def _extract_text_from_responses(res) -> str:
     return ""
 
 
+@tracing.traced("desc")
 def generate_description_text(
     client,
     model: str,
-    system: str,
-    user: str,
+    messages: list[dict],
     timeout_s: int,
     max_out_hint: int,
     fallbacks: list[str],
@@ -946,14 +1569,11 @@ def generate_description_text(
     try:
         if model.startswith("gpt-5"):
             diag["desc_model_flow"].append({"model": model})
+            ct0 = time.time()
             res = client.responses.create(
-                model=model,
-                input=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-                timeout=timeout_s,
+                model=model, input=messages, timeout=timeout_s
             )
+            _record_usage(res, "desc", int((time.time() - ct0) * 1000))
             text = _extract_text_from_responses(res)
             if text:
                 return _ok(text, model)
@@ -964,15 +1584,14 @@ def generate_description_text(
     for fb in fallbacks or []:
         try:
             diag["desc_model_flow"].append({"model": fb})
+            ct0 = time.time()
             cc = client.chat.completions.create(
                 model=fb.strip(),
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
+                messages=messages,
                 # без temperature — на некоторых моделях ограничение; или успользуй env OPENAI_TEMPERATURE, если уже есть
                 timeout=timeout_s,
             )
+            _record_usage(cc, "desc", int((time.time() - ct0) * 1000))
             text = (cc.choices[0].message.content or "").strip()
             if text:
                 return _ok(text, fb.strip())
@@ -987,7 +1606,7 @@ def generate_description_text(
 @app.get("/wbtest")
 async def wbtest(nm: int = 18488530):
     url = f"https://www.wildberries.ru/catalog/{int(nm)}/detail.aspx"
-    _txt, meta = wb_card_fetch(url, debug=True)
+    _txt, meta = await wb_card_fetch(url, debug=True)
     hits = [meta["hit"]] if meta.get("hit") else []
     return {"nm": meta.get("nm", nm), "hits": hits, "results": meta.get("trace", [])}
 
@@ -997,6 +1616,7 @@ class Req(BaseModel):
     supplierId: int
     prompt: str
     rewriteDescription: bool = False
+    variants: int = 1
     stylePrimary: str | None = None
     styleSecondary: str | None = None
     styleCustom: str | None = None
@@ -1067,60 +1687,263 @@ def _min_meta(meta: dict | None) -> dict | None:
     return out
 
 
+def _input_budget(model: str) -> int:
+    return budget.budget_for(model, INPUT_BUDGETS, INPUT_BUDGET_TOKENS)
+
+
+def _variants_charge(k: int) -> int:
+    return 1 + math.ceil(max(k - 1, 0) * VARIANT_EXTRA_COST - 1e-9)
+
+
+def _variants_allowed(asked: int, quota: int) -> int:
+    """Сколько вариантов просить у модели: не больше лимита и оплаченного."""
+    n = max(1, min(asked or 1, MAX_VARIANTS))
+    while n > 1 and _variants_charge(n) > quota:
+        n -= 1
+    return n
+
+
+async def _collect_variants(msgs, limit: int) -> list[dict]:
+    """Карточки по схеме из всех choices (n) или из массива variants."""
+    out, seen = [], set()
+    for msg in msgs:
+        found, raw = _msg_parsed_and_raw(msg)
+        if found:
+            items = [found]
+        else:
+            items = await cpupool.run(jsonscan.extract_all, raw, size=len(raw))
+        for d in items:
+            key = str(d.get("title", "")).strip().casefold()
+            if key not in seen:
+                seen.add(key)
+                out.append(d)
+    return out[:limit]
+
+
+def _fix_card(d, source: str):
+    """Ключи карточки через keywords.fix_keywords; (карточка, отчёт или None)."""
+    if not KEYWORDS_FIX or not isinstance(d, dict):
+        return d, None
+    if not isinstance(d.get("keywords"), list):
+        return d, None
+    kws, report = keywords.fix_keywords(d["keywords"], source)
+    if len(kws) < keywords.COUNT and jsonscan.schema_ok(d):
+        return d, None  # добить не из чего — валидный ответ не портим
+    for kind, n in report.items():
+        if n:
+            metrics.inc("wb6_keywords_fixed_total", n, kind=kind)
+    return dict(d, keywords=kws), report
+
+
+def _is_debug(request: Request) -> bool:
+    return (
+        WB_DEBUG
+        or request.query_params.get("debug") == "1"
+        or request.headers.get("X-Debug") == "1"
+    )
+
+
+# Профили ответа /rewrite: minimal — только то, что рисует index.html;
+# standard — плюс диагностика (model_flow, timings, wb_meta, source_preview…);
+# debug — плюс trace, wb_meta_trace и отчёт о размере полей.
+RESPONSE_PROFILES = ("minimal", "standard", "debug")
+RESPONSE_PROFILE = os.getenv("RESPONSE_PROFILE", "minimal").lower()
+MINIMAL_FIELDS = (
+    "error",
+    "message",
+    "token",
+    "title",
+    "bullets",
+    "keywords",
+    "variants",
+    "description",
+    "model_used",
+    "desc_model_used",
+    "desc_error",
+)
+
+
+def _response_profile(request: Request) -> str:
+    # X-Profile занят профилировщиком (X-Profile: 1), поэтому отдельный заголовок
+    p = (
+        request.query_params.get("profile")
+        or request.headers.get("X-Response-Profile")
+        or ""
+    ).lower()
+    if p in RESPONSE_PROFILES:
+        return p
+    return "debug" if _is_debug(request) else RESPONSE_PROFILE
+
+
+def _apply_profile(payload: dict, profile: str) -> dict:
+    if profile == "minimal":
+        out = {k: payload[k] for k in MINIMAL_FIELDS if k in payload}
+        t = (payload.get("desc_diag") or {}).get("desc_timing_ms")
+        if t is not None:
+            out["desc_diag"] = {"desc_timing_ms": t}  # index.html показывает время
+        return out
+    if profile == "debug":
+        sizes = {k: len(fastresp.dumps(v)) for k, v in payload.items()}
+        payload["size_report"] = {
+            "total": len(fastresp.dumps(payload)),
+            "minimal": len(fastresp.dumps(_apply_profile(payload, "minimal"))),
+            "fields": dict(sorted(sizes.items(), key=lambda kv: -kv[1])),
+        }
+    return payload
+
+
+def _is_admin(request: Request) -> bool:
+    got = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(got, ADMIN_TOKEN)
+
+
+def _want_profile(request: Request) -> bool:
+    if request.headers.get("X-Profile") == "1" and _is_admin(request):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
 @app.post("/rewrite")
 async def rewrite(r: Req, request: Request):
+    sampler = None
+    if _want_profile(request):
+        sampler = profiler.Sampler(PROFILE_INTERVAL_MS / 1000).start()
+    with metrics.timer("wb6_request_ms", endpoint="rewrite"), tracing.trace(
+        "rewrite"
+    ) as root:
+        try:
+            payload, status = await _rewrite(r, request)
+        finally:
+            if sampler is not None:
+                sampler.stop()
+                try:
+                    name = profiler.save(
+                        sampler, PROFILE_DIR, secrets.token_hex(3), PROFILE_KEEP
+                    )
+                    logging.info("profile saved: %s", name)
+                except Exception as e:
+                    logging.warning("profile save failed: %s", e)
+        profile = _response_profile(request)
+        if profile == "debug":
+            # дерево span-ов — только в debug-ответе
+            payload["trace"] = root.to_dict()
+        # словарь кодируется один раз — уже урезанный под профиль
+        resp = safe_json(_apply_profile(payload, profile), status=status)
+    resp.headers["Server-Timing"] = tracing.server_timing(root)
+    origin = request.headers.get("origin")
+    if origin in origins:
+        resp.headers["Timing-Allow-Origin"] = origin
+    if TRACE_EXPORT:
+        try:
+            tracing.export_jsonl(root, TRACE_EXPORT)
+        except Exception as e:
+            logging.warning("trace export failed: %s", e)
+    if ANALYTICS:
+        # событие — из словаря _rewrite, тело ответа не разбираем
+        RECORDER.record(_analytics_event(root, payload, status))
+    return resp
+
+
+def _analytics_event(root, payload: dict, status: int) -> dict:
+    """Компактная запись для журнала: модель, этапы, длина источника, код ошибки."""
+    ms = {"total": round(root.dur_ms)}
+    cache_hits = 0
+    for sp in root.children:
+        if sp.name in analytics.STAGES:
+            ms[sp.name] = ms.get(sp.name, 0) + round(sp.dur_ms)
+        if sp.attrs.get("cache") == "hit":
+            cache_hits += 1
+    error = payload.get("error") or ""
+    if error and not re.fullmatch(r"[A-Z_]+", str(error)):
+        error = "MODEL_ERROR"  # текст исключения модели — не код
+    return {
+        "ts": round(time.time(), 3),
+        "model": payload.get("model_used") or "",
+        "plan": root.attrs.get("plan", ""),
+        "ms": ms,
+        "src_len": payload.get("source_len") or 0,
+        "error": error or ("HTTP_%d" % status if status >= 400 else ""),
+        "cache_hits": cache_hits,
+    }
+
+
+async def _rewrite(r: Req, request: Request) -> tuple[dict, int]:
+    """Тело /rewrite: (payload, HTTP-статус); профиль и кодирование — в rewrite()."""
     try:
-        debug_flag = (
-            WB_DEBUG
-            or request.query_params.get("debug") == "1"
-            or request.headers.get("X-Debug") == "1"
-        )
-        info = verify(request.headers.get("Authorization", "").replace("Bearer ", ""))
+        # wb_meta_trace и полный trace WB — ровно тогда, когда ответ debug
+        debug_flag = _response_profile(request) == "debug"
+        with tracing.span("auth"):
+            info = verify(
+                request.headers.get("Authorization", "").replace("Bearer ", "")
+            )
         if not info:
             info = {"sub": "anon", "quota": 3}  # 3 free
+        tracing.annotate(plan="anon" if info.get("sub") == "anon" else "account")
         wb_meta: dict | None = None
         wb_meta_min: dict | None = None
         source_len = None
         source_preview = ""
         if info["quota"] <= 0:
-            return safe_json({"error": "NO_CREDITS", "wb_meta": wb_meta_min})
+            metrics.inc("wb6_errors_total", code="NO_CREDITS")
+            return {"error": "NO_CREDITS", "wb_meta": wb_meta_min}, 200
+        n_var = _variants_allowed(r.variants, info["quota"])
         prompt = r.prompt.strip()
         if prompt.startswith("http") and "wildberries.ru" in prompt:
-            fetched_text, meta = wb_card_fetch(prompt, debug=debug_flag)
+            fetched_text, meta = await wb_card_fetch(prompt, debug=debug_flag)
             wb_meta = meta
             wb_meta_min = _min_meta(meta)
             if fetched_text and len(fetched_text) >= 60:
                 source_len = len(fetched_text)
                 source_preview = fetched_text[:400]
                 prompt = fetched_text
+        with tracing.span("budget"):
+            prompt, input_report = budget.fit(prompt, _input_budget(MODEL))
+        input_size = {
+            "input_tokens_est": input_report["orig_tokens_est"],
+            "sent_tokens_est": input_report["sent_tokens_est"],
+        }
+        if wb_meta_min is not None:
+            wb_meta_min["input_budget"] = input_report
         try:
             t0 = time.monotonic()
-            if MODEL.startswith("gpt-5"):
-                comp = _openai_responses(
-                    messages=[
-                        {"role": "system", "content": PROMPT},
-                        {"role": "user", "content": prompt},
-                    ],
-                    model=MODEL,
-                    json_mode=True,
-                )
-                used_model = getattr(comp, "model", MODEL)
-                model_flow = [{"model": used_model, "mode": "json"}]
-                msg = _msg_from_response(comp)
-            else:
-                comp = _openai_chat(
-                    messages=[
-                        {"role": "system", "content": PROMPT},
-                        {"role": "user", "content": prompt},
-                    ],
-                    model=MODEL,
-                    max_tokens=OPENAI_MAX_TOKENS,
-                    json_mode=True,
-                )
-                used_model = getattr(comp, "model", MODEL)
-                model_flow = [{"model": used_model, "mode": "json"}]
-                msg = comp.choices[0].message
+            with tracing.span("gen", model=MODEL):
+                if MODEL.startswith("gpt-5"):
+                    # У Responses API нет n: просим массив variants в одном
+                    # ответе; строгая схема на одну карточку тут не подходит,
+                    # поэтому вместо неё — обычный json_object
+                    comp = _openai_responses(
+                        messages=(
+                            _llm_messages("card", prompt)
+                            if n_var == 1
+                            else _llm_messages("variants", prompt, str(n_var))
+                        ),
+                        model=MODEL,
+                        json_mode=True,
+                        **(
+                            {"json_format": "object"}
+                            if n_var > 1 and OPENAI_JSON_MODE == "schema"
+                            else {}
+                        ),
+                    )
+                    used_model = getattr(comp, "model", MODEL)
+                    model_flow = [{"model": used_model, "mode": "json"}]
+                    msg = _msg_from_response(comp)
+                    msgs = [msg]
+                else:
+                    comp = _openai_chat(
+                        messages=_llm_messages("card", prompt),
+                        model=MODEL,
+                        max_tokens=OPENAI_MAX_TOKENS,
+                        json_mode=True,
+                        **({"n": n_var} if n_var > 1 else {}),
+                    )
+                    used_model = getattr(comp, "model", MODEL)
+                    model_flow = [{"model": used_model, "mode": "json"}]
+                    msg = comp.choices[0].message
+                    msgs = [c.message for c in comp.choices]
+            _record_usage(comp, "gen", int((time.monotonic() - t0) * 1000))
         except Exception as e:
+            metrics.inc("wb6_errors_total", code="MODEL_ERROR")
             resp = {"error": str(e)}
             if source_len is not None:
                 resp["source_len"] = source_len
@@ -1128,9 +1951,14 @@ async def rewrite(r: Req, request: Request):
             resp["wb_meta"] = wb_meta_min
             if debug_flag and wb_meta:
                 resp["wb_meta_trace"] = wb_meta.get("trace")
-            return safe_json(resp)
-        data, raw = _msg_to_data_and_raw(msg)
+            return resp, 200
+        data, raw = await _amsg_to_data_and_raw(msg)
+        variants = await _collect_variants(msgs, n_var) if n_var > 1 else []
+        if variants:
+            data = variants[0]
+            model_flow[0]["variants"] = len(variants)
         gen_ms = int((time.monotonic() - t0) * 1000)
+        metrics.observe("wb6_gen_ms", gen_ms, model=used_model)
 
         repair_attempted = False
         repair_used = False
@@ -1138,41 +1966,42 @@ async def rewrite(r: Req, request: Request):
         if not data:
             # "Чинящий" проход на фолбэке — только если есть, что чинить
             repair_attempted = True
-            repair_input = (raw or prompt or "").strip()
-            if len(repair_input) >= 30:
+            fb_budget = _input_budget(MODEL_FALLBACK)
+            draft = budget.clip((raw or "").strip(), fb_budget)
+            repair_msgs = _llm_messages(
+                "repair", budget.clip(prompt, fb_budget), draft or "(пусто)"
+            )
+            if len(draft or prompt.strip()) >= 30:
                 rt0 = time.monotonic()
+                metrics.inc("wb6_fallbacks_total", kind="repair")
                 try:
-                    if MODEL_FALLBACK.startswith("gpt-5"):
-                        repair_resp = _openai_responses(
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": "Верни строго валидный JSON по схеме {title, bullets[6], keywords[20]} без комментариев и пояснений.",
-                                },
-                                {"role": "user", "content": repair_input[:8000]},
-                            ],
-                            model=MODEL_FALLBACK,
-                            json_mode=True,
-                        )
-                        d2, _raw2 = _msg_to_data_and_raw(
-                            _msg_from_response(repair_resp)
-                        )
-                        used_model = getattr(repair_resp, "model", used_model)
-                    else:
-                        repair = _openai_chat(
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": "Верни строго валидный JSON по схеме {title, bullets[6], keywords[20]} без комментариев и пояснений.",
-                                },
-                                {"role": "user", "content": repair_input[:8000]},
-                            ],
-                            model=MODEL_FALLBACK,
-                            max_tokens=OPENAI_MAX_TOKENS,
-                            json_mode=True,
-                        )
-                        d2, _raw2 = _msg_to_data_and_raw(repair.choices[0].message)
-                        used_model = getattr(repair, "model", used_model)
+                    with tracing.span("repair", model=MODEL_FALLBACK):
+                        if MODEL_FALLBACK.startswith("gpt-5"):
+                            repair_resp = _openai_responses(
+                                messages=repair_msgs,
+                                model=MODEL_FALLBACK,
+                                json_mode=True,
+                            )
+                            d2, _raw2 = await _amsg_to_data_and_raw(
+                                _msg_from_response(repair_resp)
+                            )
+                            repair_comp = repair_resp
+                            used_model = getattr(repair_resp, "model", used_model)
+                        else:
+                            repair = _openai_chat(
+                                messages=repair_msgs,
+                                model=MODEL_FALLBACK,
+                                max_tokens=OPENAI_MAX_TOKENS,
+                                json_mode=True,
+                            )
+                            d2, _raw2 = await _amsg_to_data_and_raw(
+                                repair.choices[0].message
+                            )
+                            repair_comp = repair
+                            used_model = getattr(repair, "model", used_model)
+                    _record_usage(
+                        repair_comp, "repair", int((time.monotonic() - rt0) * 1000)
+                    )
                     if d2:
                         data = d2
                         model_flow.append({"model": used_model, "mode": "repair"})
@@ -1180,11 +2009,13 @@ async def rewrite(r: Req, request: Request):
                 except Exception as e3:
                     logging.warning("Repair pass failed: %s", e3)
                 repair_ms = int((time.monotonic() - rt0) * 1000)
+                metrics.observe("wb6_repair_ms", repair_ms)
             else:
+                metrics.inc("wb6_errors_total", code="BAD_JSON_EMPTY")
                 resp = {
                     "error": "BAD_JSON_EMPTY",
                     "model_flow": model_flow,
-                    "timings": {"gen_ms": gen_ms, "repair_ms": 0},
+                    "timings": {"gen_ms": gen_ms, "repair_ms": 0, **input_size},
                 }
                 if source_len is not None:
                     resp["source_len"] = source_len
@@ -1194,15 +2025,21 @@ async def rewrite(r: Req, request: Request):
                     resp["wb_meta_trace"] = wb_meta.get("trace")
                 if EXPOSE_MODEL_ERRORS:
                     resp["model_used"] = used_model
-                return safe_json(resp)
+                return resp, 200
+
+        data, kw_report = _fix_card(data, prompt)
+        variants = [_fix_card(v, prompt)[0] for v in variants]
+        if variants:
+            variants[0] = data
 
         # Валидация и финальный ответ
-        if not data or not _schema_ok(data):
+        if not data or not jsonscan.schema_ok(data):
+            metrics.inc("wb6_errors_total", code="BAD_JSON")
             resp = {
                 "error": "BAD_JSON",
                 "raw": (raw or "")[:2000],
                 "model_flow": model_flow,
-                "timings": {"gen_ms": gen_ms, "repair_ms": repair_ms},
+                "timings": {"gen_ms": gen_ms, "repair_ms": repair_ms, **input_size},
                 "repair_attempted": repair_attempted,
                 "repair_used": repair_used,
             }
@@ -1214,28 +2051,31 @@ async def rewrite(r: Req, request: Request):
             resp["wb_meta"] = wb_meta_min
             if debug_flag and wb_meta:
                 resp["wb_meta_trace"] = wb_meta.get("trace")
-            return safe_json(resp)
+            return resp, 200
 
-        info["quota"] -= 1
+        info["quota"] -= _variants_charge(len(variants))
         if info["sub"] in ACCOUNTS:
             ACCOUNTS[info["sub"]]["quota"] = info["quota"]
         out = dict(data)
+        if n_var > 1:
+            out["variants"] = variants or [data]
+        if kw_report and any(kw_report.values()):
+            out["keywords_fix"] = kw_report
         desc_diag = None
         desc_text = ""
         if r.rewriteDescription:
-            source_text = prompt
             instr = _desc_instructions(r.stylePrimary, r.styleSecondary, r.styleCustom)
-            sys = "Ты редактор маркетплейса. Перепиши связное ОПИСАНИЕ товара по инструкциям. Верни ТОЛЬКО текст описания, без пояснений."
-            user = f"Инструкции: {instr}\n\nИсходный текст карточки:\n{source_text}"
             desc_text, desc_diag = generate_description_text(
-                client,
+                get_client(),
                 MODEL,
-                sys,
-                user,
+                _llm_messages("desc", prompt, instr),
                 DESC_TIMEOUT,
                 DESC_MAX_OUTPUT,
                 DESC_FALLBACKS,
             )
+            metrics.observe("wb6_desc_ms", desc_diag.get("desc_timing_ms", 0))
+            if len(desc_diag.get("desc_model_flow") or []) > 1:
+                metrics.inc("wb6_fallbacks_total", kind="desc")
             desc_text = (desc_text or "").strip()
             out["description"] = desc_text
             out["desc_len"] = len(desc_text)
@@ -1244,7 +2084,7 @@ async def rewrite(r: Req, request: Request):
             "token": jwt.encode(info, SECRET, "HS256"),
             "model_used": used_model,
             "model_flow": model_flow,
-            "timings": {"gen_ms": gen_ms, "repair_ms": repair_ms},
+            "timings": {"gen_ms": gen_ms, "repair_ms": repair_ms, **input_size},
             "repair_attempted": repair_attempted,
             "repair_used": repair_used,
             **out,
@@ -1263,15 +2103,15 @@ async def rewrite(r: Req, request: Request):
                 pass
             if not desc_text:
                 resp["desc_error"] = desc_diag.get("desc_error")
-        return safe_json(resp)
+        return resp, 200
     except Exception as e:
-        logging.error("rewrite() failed: %s", e)
-        logging.error("traceback:\n%s", traceback.format_exc())
+        metrics.inc("wb6_errors_total", code="INTERNAL_SERVER_ERROR")
+        logging.exception("rewrite() failed: %s", e)
         err = {
             "error": "INTERNAL_SERVER_ERROR",
             "message": str(e)[:500],
         }
-        return safe_json(err, status=500)
+        return err, 500
 
 
 # --- быстрая диагностика соединения с LLM (без WB) ---
@@ -1288,10 +2128,7 @@ async def gentest(
     try:
         if m.startswith("gpt-5"):
             comp = _openai_responses(
-                messages=[
-                    {"role": "system", "content": PROMPT},
-                    {"role": "user", "content": q},
-                ],
+                messages=_llm_messages("card", q),
                 model=m,
                 json_mode=bool(json),
             )
@@ -1299,10 +2136,7 @@ async def gentest(
             resp_msg = _msg_from_response(comp)
         else:
             comp = _openai_chat(
-                messages=[
-                    {"role": "system", "content": PROMPT},
-                    {"role": "user", "content": q},
-                ],
+                messages=_llm_messages("card", q),
                 model=m,
                 max_tokens=OPENAI_MAX_TOKENS,
                 json_mode=bool(json),
@@ -1312,7 +2146,7 @@ async def gentest(
     except Exception as e:
         return {"ok": False, "error": f"{type(e).__name__}: {e}"}
     msg = resp_msg
-    data, raw_text = _msg_to_data_and_raw(msg)
+    data, raw_text = await _amsg_to_data_and_raw(msg)
     gen_ms = int((time.monotonic() - t0) * 1000)
     resp = {
         "ok": True,
@@ -1346,23 +2180,76 @@ async def gentest(
     return resp
 
 
+# ── список моделей: кэш с TTL и фоновым обновлением (stale-while-revalidate) ──
+MODELS_TTL = float(os.getenv("MODELS_TTL", "600"))  # сек
+_MODELS: dict = {"names": None, "ts": 0.0, "error": None, "task": None}
+
+
+def _fetch_models() -> list[str]:
+    out = []
+    # openai>=1.45.0
+    for m in get_client().models.list():
+        name = getattr(m, "id", None) or getattr(m, "model", None) or ""
+        if name:
+            out.append(name)
+    return sorted(out)
+
+
+async def _refresh_models():
+    try:
+        names = await asyncio.to_thread(_fetch_models)
+        _MODELS.update(names=names, ts=time.monotonic(), error=None)
+    except Exception as e:
+        _MODELS["error"] = f"{type(e).__name__}: {e}"
+        logging.warning("models refresh failed: %s", e)
+    finally:
+        _MODELS["task"] = None
+
+
+def _models_refresh_task() -> asyncio.Task:
+    # Одно обновление на всех: параллельные запросы ждут ту же задачу
+    if _MODELS["task"] is None:
+        _MODELS["task"] = asyncio.create_task(_refresh_models())
+    return _MODELS["task"]
+
+
+async def get_models(refresh: bool = False) -> list[str] | None:
+    """Имена моделей аккаунта; устаревший список отдаётся сразу, обновление — в фоне."""
+    if refresh or _MODELS["names"] is None:
+        await asyncio.shield(_models_refresh_task())
+    elif time.monotonic() - _MODELS["ts"] > MODELS_TTL:
+        _models_refresh_task()
+    return _MODELS["names"]
+
+
+def model_caps(name: str) -> dict:
+    """Что модель принимает в запросе — те же эвристики, что у _openai_chat."""
+    return {
+        "id": name,
+        "api": "responses" if name.startswith("gpt-5") else "chat",
+        "max_completion_tokens": _uses_max_completion_tokens(name),
+        "temperature": not _omit_temperature(name),
+    }
+
+
 @app.get("/models")
-async def models(prefix: str = "gpt"):
+async def models(prefix: str = "gpt", refresh: int = 0, caps: int = 0):
     """
     Вернуть список доступных моделей в аккаунте (именем). Можно фильтровать по префиксу.
+    Ответ — из кэша (MODELS_TTL); refresh=1 — перечитать сейчас; caps=1 — с возможностями.
     """
-    try:
-        out = []
-        # openai>=1.45.0
-        for m in client.models.list():
-            name = getattr(m, "id", None) or getattr(m, "model", None) or ""
-            if not name:
-                continue
-            if not prefix or name.startswith(prefix):
-                out.append(name)
-        return {"ok": True, "count": len(out), "models": sorted(out)}
-    except Exception as e:
-        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    names = await get_models(refresh=bool(refresh))
+    if names is None:
+        return {"ok": False, "error": _MODELS["error"]}
+    out = [n for n in names if n.startswith(prefix)] if prefix else names
+    age = time.monotonic() - _MODELS["ts"]
+    return {
+        "ok": True,
+        "count": len(out),
+        "models": [model_caps(n) for n in out] if caps else out,
+        "age_s": round(age, 1),
+        "stale": age > MODELS_TTL,
+    }
 
 
 @app.get("/health")
@@ -1372,7 +2259,50 @@ async def health():
 
 @app.get("/healthz")
 async def healthz():
-    return {"ok": True, "model": MODEL, "fallback": MODEL_FALLBACK}
+    return {
+        "ok": True,
+        "model": MODEL,
+        "fallback": MODEL_FALLBACK,
+        "ready": STARTUP["ready"],
+        "startup": STARTUP,
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/admin/profiles", include_in_schema=False)
+async def admin_profiles(request: Request):
+    if not _is_admin(request):
+        return safe_json({"error": "FORBIDDEN"}, status=403)
+    return {"profiles": profiler.list_profiles(PROFILE_DIR)}
+
+
+@app.get("/admin/profiles/{name}", include_in_schema=False)
+async def admin_profile(name: str, request: Request):
+    if not _is_admin(request):
+        return safe_json({"error": "FORBIDDEN"}, status=403)
+    if not re.fullmatch(r"[\w.-]+\.collapsed", name):
+        return safe_json({"error": "NOT_FOUND"}, status=404)
+    path = os.path.join(PROFILE_DIR, name)
+    if not os.path.isfile(path):
+        return safe_json({"error": "NOT_FOUND"}, status=404)
+    with open(path, encoding="utf-8") as f:
+        return PlainTextResponse(f.read())
+
+
+@app.get("/diag/tokens")
+async def diag_tokens():
+    return tokens_db_stats()
+
+
+@app.get("/diag/jwt")
+async def diag_jwt():
+    return {"size": len(_JWT_CACHE), "max": JWT_CACHE_SIZE, **JWT_CACHE_STATS}
 
 
 # Robokassa ResultURL
@@ -1494,9 +2424,16 @@ async def payform(request: Request):
 
 @app.get("/paytoken")
 async def paytoken(inv: int):
-    tok = fetch_token(str(inv))
-    if not tok:
-        tok = TOKENS.pop(str(inv), None)
+    tok = take_token(str(inv))
+    if tok:
+        return {"token": tok}
+    return {"error": "NOT_READY"}
+
+
+@app.get("/paytoken/wait")
+async def paytoken_wait(inv: int, timeout: float = TOKEN_WAIT_MAX):
+    """Long-poll вариант /paytoken: отвечает, как только токен готов."""
+    tok = await wait_token(str(inv), max(0.0, min(timeout, TOKEN_WAIT_MAX)))
     if tok:
         return {"token": tok}
     return {"error": "NOT_READY"}
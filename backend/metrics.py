@@ -0,0 +1,230 @@
+"""
+Лёгкие метрики в текстовом формате Prometheus.
+
+Каждый воркер uvicorn копит счётчики и гистограммы у себя в памяти (обновления
+идут из потока event loop, без блокировок) и периодически сбрасывает снимок в
+METRICS_DIR/<pid>.json. /metrics в любом воркере складывает свои живые данные
+со снимками остальных живых воркеров. PID в контейнере после рестарта часто
+тот же, поэтому складывается только свежий снимок (не старше max_age); старый
+не удаляется — воркер с этим PID сам перезапишет его на ближайшем flush().
+Удаляются только снимки умерших PID.
+"""
+
+import bisect
+import contextlib
+import json
+import os
+import time
+
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_REGISTRY: dict[str, "_Metric"] = {}
+_COLLECTORS: list = []
+_DIR: str | None = None
+_MAX_AGE: float | None = None
+
+
+class _Metric:
+    def __init__(self, name: str, help: str, kind: str, buckets=None):
+        self.name = name
+        self.help = help
+        self.kind = kind  # counter | gauge | histogram
+        self.buckets = tuple(buckets or ())
+        # labels (tuple пар) -> число либо [bucket_0..bucket_n, +Inf, sum, count]
+        self.values: dict[tuple, object] = {}
+
+
+def _register(name, help, kind, buckets=None):
+    m = _REGISTRY.get(name)
+    if m is None:
+        m = _REGISTRY[name] = _Metric(name, help, kind, buckets)
+    return m
+
+
+def counter(name: str, help: str):
+    return _register(name, help, "counter")
+
+
+def gauge(name: str, help: str):
+    return _register(name, help, "gauge")
+
+
+def histogram(name: str, help: str, buckets=DEFAULT_BUCKETS):
+    return _register(name, help, "histogram", buckets)
+
+
+def register_collector(fn):
+    """fn() -> iterable of (name, labels_dict, value); вызывается при снимке."""
+    _COLLECTORS.append(fn)
+    return fn
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    m = _REGISTRY[name]
+    k = _key(labels)
+    m.values[k] = m.values.get(k, 0) + value
+
+
+def set_value(name: str, value: float, **labels):
+    _REGISTRY[name].values[_key(labels)] = value
+
+
+def observe(name: str, value: float, **labels):
+    m = _REGISTRY[name]
+    k = _key(labels)
+    row = m.values.get(k)
+    if row is None:
+        row = m.values[k] = [0] * (len(m.buckets) + 1) + [0.0, 0]
+    row[bisect.bisect_left(m.buckets, value)] += 1
+    row[-2] += value
+    row[-1] += 1
+
+
+@contextlib.contextmanager
+def timer(name: str, **labels):
+    """Замер длительности блока в миллисекундах."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - t0) * 1000, **labels)
+
+
+# ── снимки и объединение по воркерам ──
+def configure(directory: str | None, max_age: float | None = None):
+    """max_age — сек: снимок старше этого не складываем (прошлый запуск)."""
+    global _DIR, _MAX_AGE
+    _DIR, _MAX_AGE = directory, max_age
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def snapshot() -> dict:
+    for fn in _COLLECTORS:
+        try:
+            for name, labels, value in fn():
+                set_value(name, value, **labels)
+        except Exception:
+            pass
+    return {
+        "pid": os.getpid(),
+        "ts": time.time(),
+        "metrics": {
+            name: [[list(k), v] for k, v in m.values.items()]
+            for name, m in _REGISTRY.items()
+        },
+    }
+
+
+def flush():
+    """Атомарно записывает снимок этого воркера в METRICS_DIR."""
+    if not _DIR:
+        return
+    path = os.path.join(_DIR, f"{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def remove_own():
+    if _DIR:
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(_DIR, f"{os.getpid()}.json"))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(into: dict, snap: dict):
+    for name, rows in snap.get("metrics", {}).items():
+        m = _REGISTRY.get(name)
+        if m is None:
+            continue
+        dst = into.setdefault(name, {})
+        for labels, v in rows:
+            k = tuple(tuple(p) for p in labels)
+            if m.kind == "histogram":
+                cur = dst.get(k)
+                dst[k] = list(v) if cur is None else [a + b for a, b in zip(cur, v)]
+            else:
+                dst[k] = dst.get(k, 0) + v
+
+
+def collect() -> dict:
+    """Свои живые значения + свежие снимки других живых воркеров; мёртвые удаляем."""
+    merged: dict = {}
+    _merge(merged, snapshot())
+    if not _DIR or not os.path.isdir(_DIR):
+        return merged
+    me = os.getpid()
+    for fn in os.listdir(_DIR):
+        if not fn.endswith(".json"):
+            continue
+        try:
+            pid = int(fn[:-5])
+        except ValueError:
+            continue
+        if pid == me:
+            continue
+        path = os.path.join(_DIR, fn)
+        if not _pid_alive(pid):
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if _MAX_AGE and time.time() - snap.get("ts", 0) > _MAX_AGE:
+            continue  # PID занят, а снимок — от прошлого запуска
+        _merge(merged, snap)
+    return merged
+
+
+def _fmt_labels(k: tuple, extra: tuple = ()) -> str:
+    pairs = list(k) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for n, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _fmt_num(v) -> str:
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v)
+
+
+def render(merged: dict | None = None) -> str:
+    merged = collect() if merged is None else merged
+    out = []
+    for name, m in _REGISTRY.items():
+        out.append(f"# HELP {name} {m.help}")
+        out.append(f"# TYPE {name} {m.kind}")
+        for k, v in sorted(merged.get(name, {}).items()):
+            if m.kind != "histogram":
+                out.append(f"{name}{_fmt_labels(k)} {_fmt_num(v)}")
+                continue
+            acc = 0
+            for le, c in zip(m.buckets + ("+Inf",), v[:-2]):
+                acc += c
+                out.append(f"{name}_bucket{_fmt_labels(k, (('le', le),))} {acc}")
+            out.append(f"{name}_sum{_fmt_labels(k)} {_fmt_num(round(v[-2], 3))}")
+            out.append(f"{name}_count{_fmt_labels(k)} {v[-1]}")
+    return "\n".join(out) + "\n"
@@ -0,0 +1,94 @@
+"""
+Статистический профайлер без зависимостей.
+
+Фоновый поток раз в interval секунд снимает стек целевого потока
+(sys._current_frames) и считает одинаковые стеки. Результат сохраняется в
+«collapsed»-формате (`a;b;c N` — вход для flamegraph.pl / speedscope).
+Пока профайлер не запущен, он ничего не стоит.
+"""
+
+import os
+import sys
+import threading
+import time
+
+PROFILE_SUFFIX = ".collapsed"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class Sampler:
+    def __init__(self, interval: float = 0.005, thread_id: int | None = None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.counts: dict[str, int] = {}
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self.thread_id == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self) -> "Sampler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> dict[str, int]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self.counts
+
+
+def save(sampler: Sampler, directory: str, tag: str, keep: int = 50) -> str:
+    """Пишет профиль в directory и оставляет не больше keep последних файлов."""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{tag}{PROFILE_SUFFIX}"
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            f"# samples={sampler.samples} interval_ms={sampler.interval * 1000:g} "
+            f"elapsed_ms={sampler.elapsed * 1000:.1f}\n"
+        )
+        for stack, n in sorted(sampler.counts.items(), key=lambda kv: -kv[1]):
+            f.write(f"{stack} {n}\n")
+    old = sorted(list_profiles(directory), key=lambda p: p["mtime"])
+    for p in old[: max(0, len(old) - keep)]:
+        try:
+            os.remove(os.path.join(directory, p["name"]))
+        except OSError:
+            pass
+    return name
+
+
+def list_profiles(directory: str) -> list[dict]:
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    for fn in os.listdir(directory):
+        if not fn.endswith(PROFILE_SUFFIX):
+            continue
+        st = os.stat(os.path.join(directory, fn))
+        out.append({"name": fn, "bytes": st.st_size, "mtime": int(st.st_mtime)})
+    return sorted(out, key=lambda p: p["name"], reverse=True)
@@ -0,0 +1,135 @@
+"""
+Нормализация HTML-описаний WB в plain text без BeautifulSoup.
+
+html_to_text() даёт тот же результат, что прежняя цепочка
+  re.sub(блочные теги → "\\n") → BeautifulSoup(...).get_text("\\n", strip=True)
+  → re.sub(r"\\s+\\n") → html.unescape → re.sub(r"[ \\t]{2,}")
+но вместо построения дерева собирает текстовые участки потоковым
+токенизатором stdlib (html.parser) с теми же настройками и разбором сущностей,
+что у BeautifulSoup; описание без разметки и сущностей вообще не парсится.
+"""
+
+import html
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Теги, которые превращаются в перевод строки (как и раньше — по префиксу имени)
+_BLOCK_TAGS = re.compile(r"</?(p|li|br|ul|ol)[^>]*>", re.I)
+_WS_BEFORE_NL = re.compile(r"\s+\n")
+_MULTI_SPACE = re.compile(r"[ \t]{2,}")
+
+# Текст внутри этих элементов в get_text() не попадал
+_SKIP_TAGS = frozenset(("script", "style", "template", "rt", "rp"))
+# Пустые элементы: закрываются сразу, в стек не кладём
+_VOID_TAGS = frozenset(
+    (
+        "area", "base", "basefont", "bgsound", "br", "col", "command", "embed",
+        "frame", "hr", "image", "img", "input", "isindex", "keygen", "link",
+        "menuitem", "meta", "nextid", "param", "source", "spacer", "track", "wbr",
+    )
+)  # fmt: skip
+
+# Именованные сущности без ";" (первое имя в сортировке выигрывает — как в bs4)
+_ENTITIES: dict[str, str] = {}
+for _name, _char in sorted(html5.items()):
+    _ENTITIES.setdefault(_name.rstrip(";"), _char)
+
+
+def _charref(num: int) -> str:
+    """Числовая ссылка по правилам HTML5 (0x80–0x9F — как Windows-1252)."""
+    if num == 0 or num > 0x10FFFF or 0xD800 <= num <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= num <= 0x9F:
+        try:
+            return bytes([num]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(num)
+
+
+class _TextCollector(HTMLParser):
+    """Собирает текстовые участки между тегами; потоковый (feed по кускам)."""
+
+    def __init__(self):
+        # convert_charrefs=False — как у bs4: сущности разбираем сами
+        super().__init__(convert_charrefs=False)
+        self.runs: list[str] = []
+        self._buf: list[str] = []
+        self._stack: list[str] = []
+        self._skip = 0
+
+    def _end_run(self):
+        if self._buf:
+            if not self._skip:
+                self.runs.append("".join(self._buf))
+            self._buf = []
+
+    def _recount(self):
+        self._skip = sum(1 for t in self._stack if t in _SKIP_TAGS)
+
+    def handle_starttag(self, tag, attrs):
+        self._end_run()
+        if tag not in _VOID_TAGS:
+            self._stack.append(tag)
+            if tag in _SKIP_TAGS:
+                self._skip += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._end_run()
+
+    def handle_endtag(self, tag):
+        self._end_run()
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i] == tag:
+                del self._stack[i:]
+                self._recount()
+                break
+
+    def handle_data(self, data):
+        self._buf.append(data)
+
+    def handle_entityref(self, name):
+        self._buf.append(_ENTITIES.get(name) or "&" + name)
+
+    def handle_charref(self, name):
+        try:
+            num = int(name[1:], 16) if name[:1] in "xX" else int(name)
+        except ValueError:
+            self._buf.append(name)
+            return
+        self._buf.append(_charref(num))
+
+    def unknown_decl(self, data):
+        self._end_run()
+        if data.upper().startswith("CDATA["):
+            self.runs.append(data[6:])  # CDATA попадал в текст всегда
+
+    def handle_comment(self, data):
+        self._end_run()
+
+    def handle_decl(self, decl):
+        self._end_run()
+
+    def handle_pi(self, data):
+        self._end_run()
+
+    def close(self):
+        super().close()
+        self._end_run()
+
+
+def html_to_text(html_text: str) -> str:
+    """Очищенный текст описания: строки без пустых, без лишних пробелов."""
+    cleaned = _BLOCK_TAGS.sub("\n", html_text or "")
+    if "<" in cleaned or "&" in cleaned:
+        p = _TextCollector()
+        p.feed(cleaned)
+        p.close()
+        runs = p.runs
+    else:
+        runs = [cleaned]
+    txt = "\n".join(s for s in (r.strip() for r in runs) if s)
+    txt = _WS_BEFORE_NL.sub("\n", txt)
+    txt = _MULTI_SPACE.sub(" ", html.unescape(txt))
+    return txt.strip()
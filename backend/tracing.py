@@ -0,0 +1,129 @@
+"""
+Лёгкая трассировка запроса: дерево span-ов через contextvars.
+
+Вне trace() вызовы span()/traced() ничего не делают, так что инструментировать
+можно любые хелперы. По дереву строится заголовок Server-Timing (для devtools),
+а в debug-режиме оно отдаётся в JSON и может дописываться в JSONL-файл.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import time
+
+_CURRENT: contextvars.ContextVar["Span | None"] = contextvars.ContextVar(
+    "wb6_span", default=None
+)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.children: list[Span] = []
+
+    @property
+    def dur_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def to_dict(self, origin: float | None = None) -> dict:
+        origin = self.start if origin is None else origin
+        d = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "dur_ms": round(self.dur_ms, 2),
+        }
+        if self.attrs:
+            d["attrs"] = self.attrs
+        if self.children:
+            d["children"] = [c.to_dict(origin) for c in self.children]
+        return d
+
+
+def current() -> Span | None:
+    return _CURRENT.get()
+
+
+def annotate(**attrs):
+    """Добавляет атрибуты текущему span-у (вне trace — ничего)."""
+    sp = _CURRENT.get()
+    if sp is not None:
+        sp.attrs.update(attrs)
+
+
+@contextlib.contextmanager
+def _enter(sp: Span):
+    tok = _CURRENT.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        sp.end = time.perf_counter()
+        _CURRENT.reset(tok)
+
+
+def trace(name: str, **attrs):
+    """Корневой span запроса."""
+    return _enter(Span(name, attrs))
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    parent = _CURRENT.get()
+    if parent is None:
+        yield None
+        return
+    sp = Span(name, attrs)
+    parent.children.append(sp)
+    with _enter(sp):
+        yield sp
+
+
+def traced(name: str):
+    """Декоратор: оборачивает вызов функции в span(name)."""
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+def server_timing(root: Span, max_depth: int = 2) -> str:
+    """
+    Значение заголовка Server-Timing: total + span-ы до max_depth уровня,
+    одноимённые span-ы складываются (desc="xN" — их число).
+    """
+    agg: dict[str, list] = {}
+
+    def walk(sp: Span, prefix: str, depth: int):
+        for c in sp.children:
+            key = prefix + c.name
+            a = agg.setdefault(key, [0.0, 0])
+            a[0] += c.dur_ms
+            a[1] += 1
+            if depth < max_depth:
+                walk(c, key + ".", depth + 1)
+
+    walk(root, "", 1)
+    parts = [f"total;dur={root.dur_ms:.1f}"]
+    for key, (dur, n) in agg.items():
+        parts.append(f"{key};dur={dur:.1f}" + (f';desc="x{n}"' if n > 1 else ""))
+    return ", ".join(parts)
+
+
+def export_jsonl(root: Span, path: str):
+    rec = {"ts": round(time.time(), 3), **root.to_dict()}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
@@ -0,0 +1,93 @@
+"""
+Бенчмарк извлечения JSON из ответа модели: прежний жадный \\{.*\\} + json.loads
+против jsonscan.extract_json. Считает время и долю ответов, из которых
+получен объект по схеме (остальные ушли бы в repair-проход).
+
+  python bench/bench_extract_json.py [-n 200] [--corpus outputs.jsonl]
+
+--corpus — JSONL с полем "raw" (сырые ответы модели, например из /gentest?raw=1);
+без него используется встроенный набор типичных ответов.
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import jsonscan  # noqa: E402
+
+_JSON_OBJ = re.compile(r"\{.*\}", re.S)
+
+
+def legacy_extract_json(s: str):
+    if not isinstance(s, str) or "{" not in s:
+        return None
+    m = _JSON_OBJ.search(s)
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(0))
+    except Exception:
+        return None
+
+
+def _good(rnd: random.Random) -> str:
+    d = {
+        "title": "Зубная паста Rasyan {тайская} травяная",
+        "bullets": [f"Преимущество {i}: «натуральный» состав" for i in range(6)],
+        "keywords": [f"ключ {rnd.randint(0, 999)}" for _ in range(20)],
+    }
+    return json.dumps(d, ensure_ascii=False, indent=rnd.choice((None, 2)))
+
+
+def builtin_corpus(n: int = 400) -> list[str]:
+    rnd = random.Random(37)
+    prose = "Конечно! Вот результат по схеме {title, bullets, keywords}. " * 3
+    shapes = [
+        lambda: _good(rnd),
+        lambda: "```json\n" + _good(rnd) + "\n```",
+        lambda: prose + _good(rnd),
+        lambda: _good(rnd) + "\n\nПримечание: поля {title} и {bullets} заполнены.",
+        lambda: 'Черновик: {"title": "x"}\nИтог:\n' + _good(rnd),
+        lambda: prose * 20 + _good(rnd) + " {конец}" + prose * 20,
+        lambda: '{"result": ' + _good(rnd) + "}",
+        lambda: _good(rnd)[:-40],  # обрыв по max_tokens
+    ]
+    return [rnd.choice(shapes)() for _ in range(n)]
+
+
+def run(fn, docs: list[str], n: int) -> tuple[float, int]:
+    ok = sum(1 for d in docs if jsonscan.schema_ok(fn(d)))
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for d in docs:
+            fn(d)
+    return (time.perf_counter() - t0) / (n * len(docs)) * 1e6, ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200, help="проходов по корпусу")
+    ap.add_argument("--corpus", help="JSONL с полем raw")
+    args = ap.parse_args(argv)
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            docs = [json.loads(line)["raw"] for line in f if line.strip()]
+    else:
+        docs = builtin_corpus()
+    print(f"outputs={len(docs)} passes={args.n}")
+    for label, fn in (
+        ("legacy", legacy_extract_json),
+        ("jsonscan", jsonscan.extract_json),
+    ):
+        us, ok = run(fn, docs, args.n)
+        print(f"{label:<9} {us:8.1f} us/output  schema ok {ok}/{len(docs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Микро-бенчмарк нормализации описаний: прежняя цепочка с BeautifulSoup против
+textnorm.html_to_text. Заодно проверяет, что результаты совпадают.
+
+  python bench/bench_html_norm.py [-n 2000]
+"""
+
+import argparse
+import html
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from textnorm import html_to_text  # noqa: E402
+
+GOLDEN = os.path.join(ROOT, "tests", "golden", "html_norm")
+
+
+def bs4_norm(html_text: str) -> str:
+    cleaned = re.sub(r"</?(p|li|br|ul|ol)[^>]*>", "\n", html_text or "", flags=re.I)
+    txt = BeautifulSoup(cleaned, "html.parser").get_text("\n", strip=True)
+    txt = re.sub(r"\s+\n", "\n", txt)
+    return re.sub(r"[ \t]{2,}", " ", html.unescape(txt)).strip()
+
+
+def corpus() -> list[str]:
+    docs = []
+    for fn in sorted(os.listdir(GOLDEN)):
+        if fn.endswith(".html"):
+            with open(os.path.join(GOLDEN, fn), encoding="utf-8") as f:
+                docs.append(f.read())
+    # Типичная карточка WB: ~2 КБ описания в абзацах и списках
+    card = (
+        "<p>Зубная паста Rasyan&nbsp;&mdash; натуральная тайская паста.</p>"
+        "<ul>"
+        + "".join(f"<li>Пункт {i}: свойство &laquo;{i}&raquo;</li>" for i in range(20))
+        + "</ul>"
+        + "<p>Способ применения: нанести на щётку.</p>" * 10
+    )
+    docs.append(card)
+    return docs
+
+
+def bench(fn, docs: list[str], n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for d in docs:
+            fn(d)
+    return (time.perf_counter() - t0) / (n * len(docs)) * 1e6
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000, help="проходов по корпусу")
+    args = ap.parse_args(argv)
+    docs = corpus()
+    bad = [d[:40] for d in docs if bs4_norm(d) != html_to_text(d)]
+    if bad:
+        sys.exit(f"mismatch: {bad}")
+    old = bench(bs4_norm, docs, args.n)
+    new = bench(html_to_text, docs, args.n)
+    print(f"docs={len(docs)} passes={args.n}")
+    print(f"bs4       {old:8.1f} us/doc")
+    print(f"textnorm  {new:8.1f} us/doc  x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
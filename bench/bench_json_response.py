@@ -0,0 +1,94 @@
+"""
+Бенчмарк сериализации ответа /rewrite: байты «на проводе» и время кодирования.
+
+Сравнивает json.dumps(ensure_ascii=True), прежний JSONResponse Starlette и
+fastresp.dumps (orjson, если установлен), а также размер после gzip/brotli.
+
+  python bench/bench_json_response.py [-n 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import fastresp  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+
+def sample_payloads() -> dict[str, dict]:
+    card = {
+        "title": "Зубная паста Rasyan тайская травяная с гвоздикой 25 г",
+        "bullets": [
+            f"Натуральный состав: экстракт трав и масло №{i}" for i in range(6)
+        ],
+        "keywords": [f"зубная паста тайская {i}" for i in range(20)],
+    }
+    base = {
+        "token": "eyJhbGciOiJIUzI1NiJ9." + "x" * 120,
+        "model_used": "gpt-4o-mini",
+        "model_flow": [{"model": "gpt-4o-mini", "mode": "json"}],
+        "timings": {"gen_ms": 2140, "repair_ms": 0},
+        "repair_attempted": False,
+        "repair_used": False,
+        **card,
+        "source_len": 1830,
+        "source_preview": "Зубная паста Rasyan — натуральная тайская паста. " * 8,
+        "wb_meta": {"nm_id": 18488530, "vol": 184, "part": 18488, "hit": None},
+    }
+    desc = dict(base, description="Связное описание товара на русском. " * 40)
+    desc["desc_diag"] = {"desc_model_flow": [{"model": "gpt-4o"}], "desc_len": 1400}
+    bad = {
+        "error": "BAD_JSON",
+        "raw": "Ответ модели с прозой и {скобками} " * 50,
+        **{k: base[k] for k in ("model_flow", "timings", "source_preview")},
+    }
+    trace = dict(
+        base,
+        trace={
+            "name": "rewrite",
+            "children": [
+                {"name": f"probe{i}", "dur_ms": 12.5, "attrs": {"host": "basket"}}
+                for i in range(40)
+            ],
+        },
+    )
+    return {"card": base, "card+desc": desc, "bad_json": bad, "debug+trace": trace}
+
+
+def encoders():
+    yield "ascii", lambda d: json.dumps(d).encode()
+    yield "starlette", lambda d: JSONResponse(d).body
+    yield "fastresp", fastresp.dumps
+
+
+def timeit(fn, obj, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(obj)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    args = ap.parse_args(argv)
+    print(
+        f"orjson={'yes' if fastresp.orjson else 'no'} "
+        f"brotli={'yes' if fastresp.brotli else 'no'}"
+    )
+    print(f"{'payload':<12}{'encoder':<11}{'bytes':>7}{'gzip':>7}{'br':>7}{'us':>8}")
+    for name, payload in sample_payloads().items():
+        for label, fn in encoders():
+            body = fn(payload)
+            gz = len(fastresp.compress(body, "gzip"))
+            br = len(fastresp.compress(body, "br")) if fastresp.brotli else "-"
+            us = timeit(fn, payload, args.n)
+            print(f"{name:<12}{label:<11}{len(body):>7}{gz:>7}{br:>7}{us:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Бенчмарк пост-обработки keywords: время fix_keywords на golden-наборе и на
+длинной карточке (добивка из n-грамм всего текста) плюс сводка, сколько
+ключей выброшено, склеено как дубли и добито.
+
+  python bench/bench_keywords.py [-n 2000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import keywords  # noqa: E402
+
+GOLDEN = os.path.join(ROOT, "tests", "golden", "keywords")
+
+
+def corpus() -> list[dict]:
+    cases = []
+    for fn in sorted(os.listdir(GOLDEN)):
+        if fn.endswith(".json"):
+            with open(os.path.join(GOLDEN, fn), encoding="utf-8") as f:
+                cases.append(dict(json.load(f), name=fn[:-5]))
+    # Длинная карточка WB (~6 КБ) и всего 8 ключей — худший случай добивки
+    long_src = (
+        "Зубная паста Rasyan тайская травяная с гвоздикой 25 г\n"
+        + (
+            "Натуральная тайская зубная паста отбеливает зубы и освежает дыхание. "
+            "Состав: гвоздичное масло, ментол, камфора, экстракт трав. "
+            "Травяная паста подходит для ежедневного ухода за полостью рта. "
+        )
+        * 30
+    )
+    cases.append(
+        {
+            "name": "long_card",
+            "source": long_src,
+            "keywords": ["зубная паста", "Зубная Паста", "паста тайская"] * 3
+            + ["тайская зубная паста", "купить пасту"],
+        }
+    )
+    return cases
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    args = ap.parse_args(argv)
+    print(
+        f"{'case':<18}{'src':>6}{'in':>4}{'out':>5}{'drop':>6}{'dups':>6}"
+        f"{'fill':>6}{'us':>9}"
+    )
+    for case in corpus():
+        kws, src = case["keywords"], case["source"]
+        out, rep = keywords.fix_keywords(kws, src)
+        t0 = time.perf_counter()
+        for _ in range(args.n):
+            keywords.fix_keywords(kws, src)
+        us = (time.perf_counter() - t0) / args.n * 1e6
+        print(
+            f"{case['name']:<18}{len(src):>6}{len(kws):>4}{len(out):>5}"
+            f"{rep['dropped']:>6}{rep['dups']:>6}{rep['filled']:>6}{us:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Холодный старт API: время импорта main, до первого ответа /health и до
+первого ответа /rewrite (uvicorn в отдельном процессе, чистый DATA_DIR).
+
+OpenAI подменяется локальной заглушкой (OPENAI_BASE_URL), чтобы замер не
+зависел от сети; --real оставляет настоящий API и ключ из окружения.
+
+  python bench/bench_startup.py [--runs 3] [--budget-ms 800] [--real]
+
+Код выхода 1, если медиана импорта main превышает --budget-ms.
+"""
+
+import argparse
+import http.server
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+GOOD = {"title": "Тест", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+
+class _StubOpenAI(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        body = json.dumps(
+            {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": json.dumps(GOOD, ensure_ascii=False),
+                        },
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": 1,
+                    "completion_tokens": 1,
+                    "total_tokens": 2,
+                },
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env(data_dir: str, stub_url: str | None) -> dict:
+    env = dict(os.environ, DATA_DIR=data_dir, ANALYTICS="0", LOG_LEVEL="WARNING")
+    env.setdefault("OPENAI_API_KEY", "bench")
+    if stub_url:
+        env.update(OPENAI_BASE_URL=stub_url, OPENAI_API_KEY="bench")
+        env.update(OPENAI_MODEL="gpt-4o-mini", OPENAI_JSON_MODE="object")
+    return env
+
+
+def import_ms(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import main; "
+    code += "print((time.perf_counter() - t) * 1000)"
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def _request(url: str, data: bytes | None = None):
+    req = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(req, timeout=60) as r:
+        return r.status, r.read()
+
+
+def serve_once(env: dict) -> tuple[float, float]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=BACKEND,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                _request(base + "/health")
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn exited")
+                time.sleep(0.01)
+        health = time.perf_counter() - t0
+        body = json.dumps({"supplierId": 1, "prompt": "Зубная паста"}).encode()
+        status, _ = _request(base + "/rewrite", body)
+        rewrite = time.perf_counter() - t0
+        if status != 200:
+            raise RuntimeError(f"/rewrite -> {status}")
+        return health * 1000, rewrite * 1000
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--budget-ms", type=float, default=800)
+    ap.add_argument("--real", action="store_true", help="настоящий OpenAI API")
+    args = ap.parse_args(argv)
+
+    stub = None
+    if not args.real:
+        stub = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StubOpenAI)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}/v1" if stub else None
+
+    imports, healths, rewrites = [], [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as d:
+            env = _env(d, stub_url)
+            imports.append(import_ms(env))
+        with tempfile.TemporaryDirectory() as d:
+            h, r = serve_once(_env(d, stub_url))
+            healths.append(h)
+            rewrites.append(r)
+    med = statistics.median
+    print(f"runs={args.runs} openai={'real' if args.real else 'stub'}")
+    print(f"import main          {med(imports):8.0f} ms (budget {args.budget_ms:g})")
+    print(f"first /health        {med(healths):8.0f} ms")
+    print(f"first /rewrite       {med(rewrites):8.0f} ms")
+    if med(imports) > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
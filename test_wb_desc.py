@@ -1,8 +1,11 @@
-import html
+import os
 import re
+import sys
 
 import requests
-from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "backend"))
+from textnorm import html_to_text  # noqa: E402
 
 TEST_URL = "https://www.wildberries.ru/catalog/18488530/detail.aspx"
 
@@ -23,14 +26,6 @@ def pick_name(d: dict) -> str:
     return ""
 
 
-def norm_text(html_text: str) -> str:
-    cleaned = re.sub(r"</?(p|li|br|ul|ol)[^>]*>", "\n", html_text or "", flags=re.I)
-    txt = BeautifulSoup(cleaned, "html.parser").get_text("\n", strip=True)
-    txt = re.sub(r"\s+\n", "\n", txt)
-    txt = re.sub(r"[ \t]{2,}", " ", txt)
-    return html.unescape(txt).strip()
-
-
 def get_text(url: str) -> str:
     m = re.search(r"/catalog/(\d+)/", url)
     if not m:
@@ -101,7 +96,7 @@ def get_text(url: str) -> str:
         except Exception:
             pass
 
-    text = (name or str(nm_id)) + "\n\n" + norm_text(desc_html or "")
+    text = (name or str(nm_id)) + "\n\n" + html_to_text(desc_html or "")
     return text
 
 
@@ -113,4 +108,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
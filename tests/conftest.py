@@ -0,0 +1,23 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# main пишет токены, аналитику, метрики и профили в DATA_DIR (/data по
+# умолчанию). Часть тестов импортирует main ещё при сборке (test_cors), поэтому
+# временный каталог ставим сразу, а каждому тесту ниже даём свой.
+_SESSION_DATA = tempfile.mkdtemp(prefix="wb6-tests-")
+atexit.register(shutil.rmtree, _SESSION_DATA, True)
+os.environ["DATA_DIR"] = _SESSION_DATA
+os.environ["ANALYTICS_DB"] = os.path.join(_SESSION_DATA, "analytics.db")
+os.environ["ANALYTICS_LOG"] = os.path.join(_SESSION_DATA, "requests.log")
+
+
+@pytest.fixture(autouse=True)
+def _isolated_data_dir(monkeypatch, tmp_path):
+    data = tmp_path / "data"
+    monkeypatch.setenv("DATA_DIR", str(data))
+    monkeypatch.setenv("ANALYTICS_DB", str(data / "analytics.db"))
+    monkeypatch.setenv("ANALYTICS_LOG", str(data / "requests.log"))
@@ -0,0 +1,89 @@
+import importlib
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import analytics
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_rollups_and_report(tmp_path, capsys):
+    rec = analytics.Recorder(str(tmp_path / "a.db"), str(tmp_path / "req.log"))
+    ts = time.mktime((2026, 10, 19, 12, 0, 0, 0, 0, 0)) - time.timezone
+    for i in range(100):
+        rec.record(
+            {
+                "ts": ts,
+                "model": "gpt-5",
+                "plan": "anon",
+                "ms": {"total": 100 + i * 10, "gen": 90},
+                "src_len": 1000,
+                "error": "BAD_JSON" if i % 10 == 0 else "",
+                "cache_hits": 1,
+            }
+        )
+    assert rec.flush()
+    assert rec.written == 100
+    assert len((tmp_path / "req.log").read_text(encoding="utf-8").splitlines()) == 100
+
+    con = analytics.open_db(str(tmp_path / "a.db"))
+    rep = analytics.report(con, "2026-10-19")
+    assert rep["requests"] == 100
+    assert rep["errors"] == {"BAD_JSON": 10}
+    assert rep["cache_hits"] == 100
+    assert rep["avg_src_len"] == 1000
+    total = rep["latency_ms"]["total"]
+    assert 500 <= total["p50"] <= 750
+    assert 1000 <= total["p99"] <= 1500
+    assert analytics.report(con, "2026-10-19T12", "h")["requests"] == 100
+
+    analytics.main(["report", "--day", "2026-10-19", "--db", str(tmp_path / "a.db")])
+    out = capsys.readouterr().out
+    assert "100 requests" in out
+    assert "BAD_JSON" in out
+
+
+def test_rewrite_records_event(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("ANALYTICS_DB", str(tmp_path / "a.db"))
+    monkeypatch.setenv("ANALYTICS_LOG", str(tmp_path / "req.log"))
+    m = reload_main()
+    good = {"title": "Т", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+    def fake_chat(messages, model, max_tokens=0, json_mode=True):
+        msg = SimpleNamespace(content=json.dumps(good, ensure_ascii=False))
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+
+    # событие строится из словаря _rewrite: тело кодируется один раз и
+    # обратно не разбирается
+    encoded = []
+    dumps = m.fastresp.dumps
+    monkeypatch.setattr(
+        m.fastresp, "dumps", lambda obj: encoded.append(obj) or dumps(obj)
+    )
+    from fastapi.testclient import TestClient
+
+    js = (
+        TestClient(m.app)
+        .post("/rewrite?profile=standard", json={"supplierId": 1, "prompt": "паста"})
+        .json()
+    )
+    assert encoded == [js]
+    assert m.RECORDER.flush()
+    ev = json.loads((tmp_path / "req.log").read_text(encoding="utf-8"))
+    assert ev["model"] == "gpt-4o-mini"
+    assert ev["plan"] == "anon"
+    assert ev["error"] == ""
+    assert {"total", "gen"} <= set(ev["ms"])
@@ -0,0 +1,105 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import budget  # noqa: E402
+
+CARD = "\n".join(
+    [
+        "Зубная паста Rasyan тайская",
+        "Уважаемые покупатели! Добавляйте товар в избранное.",
+        "Натуральная паста. Натуральная паста. Освежает дыхание.",
+        "паста, зубная паста, паста, тайская паста, зубная паста",
+        "Состав: гвоздичное масло, ментол",
+        "Описание преимуществ товара разными словами. " * 80,
+        "Вес: 25 г",
+        "Желаем приятных покупок!",
+    ]
+)
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_estimate_tokens():
+    assert budget.estimate_tokens("") == 0
+    assert budget.estimate_tokens("Hello, мир!") == 5
+    assert budget.estimate_tokens("а" * 30) == 10
+
+
+def test_fit_dedups_and_keeps_name_and_facts():
+    text, rep = budget.fit(CARD, 60)
+    lines = text.splitlines()
+    assert lines[0] == "Зубная паста Rasyan тайская"
+    assert "Состав: гвоздичное масло, ментол" in lines
+    assert "Вес: 25 г" in lines
+    assert lines.index("Вес: 25 г") > lines.index("Состав: гвоздичное масло, ментол")
+    assert "покупател" not in text and "приятных" not in text
+    assert text.count("Натуральная паста") == 1
+    assert "паста, зубная паста, тайская паста" in text
+    assert rep["boilerplate_removed"] == 2 and rep["dups_removed"] >= 3
+    assert rep["trimmed"] and rep["sent_tokens_est"] <= 60
+    assert rep["orig_chars"] == len(CARD) and rep["sent_chars"] == len(text)
+
+
+def test_fit_short_text_untouched():
+    text, rep = budget.fit("Зубная паста Rasyan", 100)
+    assert text == "Зубная паста Rasyan" and not rep["trimmed"]
+
+
+def test_dedup_list_items_only_within_their_list():
+    text = (
+        "Состав: вода, глицерин, масло ши, отдушка\n"
+        "В комплекте: крем, масло ши, инструкция, коробка, масло ши\n"
+        "Состав: вода, глицерин, масло ши, отдушка"
+    )
+    out, removed = budget.dedup(text)
+    assert out.splitlines() == [
+        "Состав: вода, глицерин, масло ши, отдушка",
+        "В комплекте: крем, масло ши, инструкция, коробка",
+    ]
+    assert removed == 2
+
+
+def test_budgets_by_model_prefix():
+    b = budget.parse_budgets("gpt-5:4000, gpt-5-mini:1500,bad,x:y")
+    assert b == {"gpt-5": 4000, "gpt-5-mini": 1500}
+    assert budget.budget_for("gpt-5-mini-2025", b) == 1500
+    assert budget.budget_for("gpt-5", b) == 4000
+    assert budget.budget_for("gpt-4o", b, 2000) == 2000
+    assert budget.clip("один два три четыре", 3) == "один два"
+
+
+def test_rewrite_sends_budgeted_prompt(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("INPUT_BUDGETS", "gpt-4o:80")
+    m = reload_main()
+    sent = []
+    good = {"title": "Тест", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+    def fake_chat(messages, model, max_tokens=0, json_mode=True):
+        sent.append(messages[1]["content"])
+        msg = SimpleNamespace(content=json.dumps(good, ensure_ascii=False))
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    from fastapi.testclient import TestClient
+
+    js = (
+        TestClient(m.app)
+        .post("/rewrite?profile=standard", json={"supplierId": 1, "prompt": CARD})
+        .json()
+    )
+    assert budget.estimate_tokens(sent[0]) <= 80
+    assert sent[0].startswith("Зубная паста Rasyan тайская")
+    t = js["timings"]
+    assert t["input_tokens_est"] == budget.estimate_tokens(CARD)
+    assert t["sent_tokens_est"] == budget.estimate_tokens(sent[0])
@@ -0,0 +1,117 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_small_inputs_stay_inline():
+    import threading
+
+    import cpupool
+
+    cpupool.configure("thread", workers=2, threshold=100)
+    try:
+        before = dict(cpupool.STATS)
+        assert cpupool.call(threading.get_ident, size=10) == threading.get_ident()
+        assert cpupool.STATS["inline"] == before["inline"] + 1
+        assert cpupool.call(threading.get_ident, size=100) != threading.get_ident()
+        assert cpupool.STATS["pooled"] == before["pooled"] + 1
+        assert cpupool.STATS["pending"] == 0
+    finally:
+        cpupool.shutdown()
+
+
+def test_process_pool_runs_light_modules():
+    import cpupool
+    import jsonscan
+    import textnorm
+
+    cpupool.configure("process", workers=1, threshold=0)
+    try:
+        assert cpupool.call(textnorm.html_to_text, "<p>a</p><p>b</p>", size=1) == (
+            "a\nb"
+        )
+        assert cpupool.call(jsonscan.extract_json, 'x {"a": 1} y', size=1) == {"a": 1}
+    finally:
+        cpupool.shutdown()
+
+
+def test_rewrite_uses_pool_for_big_outputs(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("CPU_POOL_THRESHOLD", "100")
+    m = reload_main()
+    good = {"title": "Т", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+    def fake_chat(messages, model, max_tokens=0, json_mode=True):
+        text = "вот ответ: " + json.dumps(good, ensure_ascii=False) + " " * 200
+        msg = SimpleNamespace(content=text)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    from fastapi.testclient import TestClient
+
+    with TestClient(m.app) as client:
+        pooled = m.cpupool.STATS["pooled"]
+        data = client.post("/rewrite", json={"supplierId": 1, "prompt": "x"}).json()
+        assert data["title"] == "Т"
+        assert m.cpupool.STATS["pooled"] == pooled + 1
+        text = client.get("/metrics").text
+    assert 'wb6_cpu_pool_workers{kind="thread"} 2' in text
+    assert "wb6_cpu_pool_queue_depth 0" in text
+    assert 'wb6_cpu_tasks_total{mode="pool"}' in text
+
+
+def test_wb_fetch_keeps_event_loop_free(monkeypatch):
+    import asyncio
+    import threading
+
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("CPU_POOL_THRESHOLD", "100")
+    m = reload_main()
+    html = "<p>" + "Длинное описание товара. " * 20 + "</p>"
+    threads = []
+
+    class Resp:
+        headers = {"Content-Type": "application/json"}
+
+        def json(self):
+            return {"imt_name": "Паста", "descriptionHtml": html}
+
+    class DummySession:
+        def __init__(self):
+            self.headers = {}
+
+        def mount(self, prefix, adapter):
+            pass
+
+        def get(self, url, timeout=10, allow_redirects=True):
+            threads.append(threading.get_ident())
+            return Resp()
+
+    monkeypatch.setattr(m.requests, "Session", lambda: DummySession())
+
+    async def fetch():
+        loop_thread = threading.get_ident()
+        text, meta = await m.wb_card_fetch(
+            "https://www.wildberries.ru/catalog/12345/detail.aspx"
+        )
+        return loop_thread, text
+
+    try:
+        pooled = m.cpupool.STATS["pooled"]
+        loop_thread, text = asyncio.run(fetch())
+        assert text.startswith("Паста\n\nДлинное описание")
+        assert threads and loop_thread not in threads
+        assert m.cpupool.STATS["pooled"] == pooled + 1
+    finally:
+        m.cpupool.shutdown()
@@ -0,0 +1,53 @@
+import gzip
+import importlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_dumps_keeps_cyrillic_and_falls_back():
+    import fastresp
+
+    assert fastresp.dumps({"t": "паста"}) == '{"t":"паста"}'.encode()
+    # orjson не умеет int > 64 бит — должен сработать stdlib
+    assert json.loads(fastresp.dumps({"n": 2**70})) == {"n": 2**70}
+
+
+def test_large_responses_are_gzipped(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("COMPRESS_MIN_BYTES", "200")
+    m = reload_main()
+
+    @m.app.get("/_big")
+    def _big(n: int = 100):
+        return {"text": "Ж" * n}
+
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    big = client.get("/_big", headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in big.headers["vary"]
+    assert big.json() == {"text": "Ж" * 100}
+    assert int(big.headers["content-length"]) < len('{"text":""}') + 200
+
+    small = client.get("/_big?n=5", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    plain = client.get("/_big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == ('{"text":"' + "Ж" * 100 + '"}').encode()
+
+
+def test_compress_roundtrip():
+    import fastresp
+
+    body = ("Ж" * 500).encode()
+    assert gzip.decompress(fastresp.compress(body, "gzip")) == body
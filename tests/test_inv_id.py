@@ -0,0 +1,95 @@
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+WORKER = """
+import json, main
+print(json.dumps([main.next_inv_id() for _ in range({n})]))
+"""
+
+
+def test_inv_ids_unique_across_workers(monkeypatch, tmp_path):
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="key",
+        TOKENS_DB=str(tmp_path / "tok.db"),
+        INV_BLOCK="7",
+        INV_START="3000",
+    )
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER.format(n=150)],
+            cwd=BACKEND,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        for _ in range(8)
+    ]
+    ids = []
+    for p in procs:
+        out, _ = p.communicate(timeout=60)
+        assert p.returncode == 0
+        ids.extend(json.loads(out))
+    assert len(ids) == 8 * 150
+    assert len(set(ids)) == len(ids)
+    assert min(ids) >= 3000
+
+
+def test_inv_ids_unique_across_threads(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("TOKENS_DB", str(tmp_path / "tok.db"))
+    monkeypatch.setenv("INV_BLOCK", "5")
+    m = reload_main()
+    ids = []
+
+    def worker():
+        got = [m.next_inv_id() for _ in range(100)]
+        ids.extend(got)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == len(ids) == 1600
+
+
+def test_inv_ids_no_reuse_after_restart(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("TOKENS_DB", str(tmp_path / "tok.db"))
+    monkeypatch.setenv("INV_BLOCK", "10")
+    monkeypatch.setenv("INV_START", "3000")
+    m = reload_main()
+    assert [m.next_inv_id() for _ in range(3)] == [3000, 3001, 3002]
+    m2 = reload_main()
+    # остаток блока 3003..3009 пропускается, а не выдаётся повторно
+    assert m2.next_inv_id() == 3010
+
+
+def test_inv_ids_wraparound(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("TOKENS_DB", str(tmp_path / "tok.db"))
+    monkeypatch.setenv("INV_BLOCK", "10")
+    monkeypatch.setenv("INV_START", "3000")
+    m = reload_main()
+    with m.DB:
+        m.DB.execute(
+            "INSERT OR REPLACE INTO meta(key, value) VALUES('last_inv', ?)",
+            (str(m.INV_MAX - 2),),
+        )
+    got = [m.next_inv_id() for _ in range(4)]
+    assert got == [m.INV_MAX - 1, m.INV_MAX, 3000, 3001]
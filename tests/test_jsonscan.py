@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import jsonscan  # noqa: E402
+
+GOOD = {
+    "title": 'Паста {тайская} "Rasyan"',
+    "bullets": ["b}"] * 6,
+    "keywords": ["{k"] * 20,
+}
+GOOD_JS = json.dumps(GOOD, ensure_ascii=False)
+
+
+def test_prose_and_fences_around_object():
+    for raw in (
+        GOOD_JS,
+        "```json\n" + GOOD_JS + "\n```",
+        "Вот ответ по схеме {title, bullets, keywords}:\n" + GOOD_JS,
+        GOOD_JS + "\nПоля {title} и {bullets} заполнены.",
+    ):
+        assert jsonscan.extract_json(raw) == GOOD
+
+
+def test_skips_draft_and_finds_nested():
+    raw = 'Черновик: {"title": "x"}\nИтог: {"result": ' + GOOD_JS + "}"
+    assert jsonscan.extract_json(raw) == GOOD
+
+
+def test_fallback_to_first_object_and_none():
+    assert jsonscan.extract_json('a {"x": 1} b {"y": 2}') == {"x": 1}
+    assert jsonscan.extract_json(GOOD_JS[:-20]) is None
+    assert jsonscan.extract_json("{нет json}") is None
+    assert jsonscan.extract_json(None) is None
+
+
+def test_long_output_is_linear():
+    raw = "{проза} " * 20000 + GOOD_JS + " {хвост}" * 20000
+    assert jsonscan.extract_json(raw) == GOOD
+
+
+def test_extract_all_variants():
+    other = dict(GOOD, title="Другой")
+    raw = json.dumps({"variants": [GOOD, {"title": "x"}, other]}, ensure_ascii=False)
+    assert jsonscan.extract_all("Варианты:\n" + raw) == [GOOD, other]
+    assert jsonscan.extract_all(GOOD_JS + "\n" + GOOD_JS) == [GOOD, GOOD]
+    assert jsonscan.extract_all("{нет}") == []
+
+
+def test_deep_nesting_is_skipped():
+    deep = '{"a":' * 2000
+    assert jsonscan.extract_json(deep) is None
+    assert jsonscan.extract_json(deep + " " + GOOD_JS) == GOOD
+    assert jsonscan.extract_all(deep + " " + GOOD_JS) == [GOOD]
@@ -0,0 +1,61 @@
+import importlib
+import os
+import sys
+import time
+
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_verify_cache_hit_and_copy(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("JWT_SECRET", "s" * 32)
+    m = reload_main()
+    tok = m.issue("a@b", 5)
+    first = m.verify(tok)
+    first["quota"] = 0  # мутация результата не должна портить кэш
+    second = m.verify(tok)
+    assert second["quota"] == 5
+    assert m.JWT_CACHE_STATS["misses"] == 1
+    assert m.JWT_CACHE_STATS["hits"] == 1
+
+
+def test_verify_cache_rejects_tampered_and_expired(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("JWT_SECRET", "s" * 32)
+    m = reload_main()
+    tok = m.issue("a@b", 5)
+    assert m.verify(tok)
+    head, body, sig = tok.split(".")
+    forged = jwt.encode({"sub": "a@b", "quota": 999}, "other" * 8, algorithm="HS256")
+    assert m.verify(f"{head}.{forged.split('.')[1]}.{sig}") is None
+    assert m.verify(tok[:-2] + ("AA" if tok[-2:] != "AA" else "BB")) is None
+
+    short = jwt.encode(
+        {"sub": "x", "quota": 1, "exp": int(time.time()) + 1}, m.SECRET, "HS256"
+    )
+    assert m.verify(short)
+    monkeypatch.setattr(m.time, "time", lambda: 2**40)
+    assert m.verify(short) is None
+    assert m.JWT_CACHE_STATS["expired"] == 1
+
+
+def test_verify_cache_eviction(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("JWT_SECRET", "s" * 32)
+    monkeypatch.setenv("JWT_CACHE_SIZE", "2")
+    m = reload_main()
+    toks = [m.issue(f"u{i}@b", i) for i in range(3)]
+    for t in toks:
+        m.verify(t)
+    assert len(m._JWT_CACHE) == 2
+    assert m.JWT_CACHE_STATS["evictions"] == 1
+    m.verify(toks[0])  # вытеснен — снова полная проверка
+    assert m.JWT_CACHE_STATS["misses"] == 4
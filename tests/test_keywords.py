@@ -0,0 +1,82 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import keywords  # noqa: E402
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden", "keywords")
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def _cases():
+    return sorted(f[:-5] for f in os.listdir(GOLDEN) if f.endswith(".json"))
+
+
+@pytest.mark.parametrize("name", _cases())
+def test_golden(name):
+    with open(os.path.join(GOLDEN, name + ".json"), encoding="utf-8") as f:
+        case = json.load(f)
+    out, _report = keywords.fix_keywords(case["keywords"], case["source"])
+    assert out == case["expected"]
+
+
+def test_normalization_and_dedup():
+    assert keywords.clean("  Купить  ЗУБНУЮ пасту!! ") == "ЗУБНУЮ пасту"
+    assert keywords.clean("скидка wildberries") == ""
+    assert keywords.clean("паста для") == "паста"
+    # фраза модели не портится: регистр, «+» и «++» на месте
+    assert keywords.clean("iPhone 15 чехол") == "iPhone 15 чехол"
+    assert keywords.clean("«крем SPF 50+»") == "крем SPF 50+"
+    assert keywords.clean("C++ книга") == "C++ книга"
+    assert keywords.dedup_key("пылесос для дома") == keywords.dedup_key("дом пылесос")
+    assert keywords.dedup_key("C# книга") != keywords.dedup_key("C++ книга")
+    assert keywords.dedup_key("Ёлочная гирлянда") == keywords.dedup_key(
+        "гирлянду елочную"
+    )
+    out, rep = keywords.fix_keywords(["a b", "B A", "купить"], "", count=5)
+    assert out == ["a b"] and rep == {"dropped": 1, "dups": 1, "filled": 0}
+
+
+def test_backfill_prefers_title_ngrams():
+    src = "Термокружка с крышкой\nОна сохраняет тепло. Удобная ручка и удобная ручка."
+    out, rep = keywords.fix_keywords(["термокружка"], src, count=3)
+    assert out == ["термокружка", "термокружка с крышкой", "удобная ручка"]
+    assert rep["filled"] == 2
+
+
+def test_rewrite_fills_short_keywords(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    m = reload_main()
+    with open(os.path.join(GOLDEN, "short_backfill.json"), encoding="utf-8") as f:
+        case = json.load(f)
+    card = {"title": "Термокружка", "bullets": ["b"] * 6, "keywords": case["keywords"]}
+
+    def fake_chat(messages, model, max_tokens=0, json_mode=True):
+        msg = SimpleNamespace(content=json.dumps(card, ensure_ascii=False))
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    from fastapi.testclient import TestClient
+
+    js = (
+        TestClient(m.app)
+        .post(
+            "/rewrite?profile=standard",
+            json={"supplierId": 1, "prompt": case["source"]},
+        )
+        .json()
+    )
+    assert js["keywords"] == case["expected"]
+    assert js["keywords_fix"]["filled"] == 8
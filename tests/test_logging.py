@@ -0,0 +1,64 @@
+import importlib
+import io
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import logsetup
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_rate_limit_filter(monkeypatch):
+    f = logsetup.RateLimitFilter(60)
+    now = [1000.0]
+    monkeypatch.setattr(logsetup.time, "monotonic", lambda: now[0])
+
+    def rec(msg="OpenAI down: %s", level=logging.WARNING, arg="boom", exc=None):
+        return logging.LogRecord("x", level, __file__, 1, msg, (arg,), exc)
+
+    assert f.filter(rec())
+    assert not any(f.filter(rec()) for _ in range(5))
+    assert f.filter(rec(level=logging.INFO))  # INFO не ограничиваем
+    assert f.filter(rec("other %s"))
+    # тот же шаблон, другая ошибка — не повтор
+    assert f.filter(rec(arg="timeout"))
+    err = (KeyError, KeyError("boom"), None)
+    assert f.filter(rec(exc=err)) and not f.filter(rec(exc=err))
+    now[0] += 61
+    r = rec()
+    assert f.filter(r)
+    assert r.repeated == 5
+    assert "+5" in r.getMessage()
+
+
+def test_queue_pipeline_json(monkeypatch):
+    logsetup.configure("INFO", fmt="json", rate_interval=60)
+    buf = io.StringIO()
+    logsetup._LISTENER.handlers[0].setStream(buf)
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        logging.getLogger("t").exception("failed: %s", "x")
+    logsetup.stop()
+    line = json.loads(buf.getvalue().splitlines()[-1])
+    assert line["msg"] == "failed: x"
+    assert line["level"] == "ERROR"
+    assert "ValueError: bad" in line["exc"]
+
+
+def test_send_email_hides_credentials(monkeypatch, caplog):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    m = reload_main()
+    caplog.set_level("INFO")
+    m.send_email("user@mail.ru", "LOGIN123", "SECRETPW")
+    assert "SECRETPW" not in caplog.text
+    assert "LOGIN123" not in caplog.text
+    assert "u***@mail.ru" in caplog.text
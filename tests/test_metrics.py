@@ -0,0 +1,107 @@
+import importlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def _value(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_endpoint_counts_errors(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("JWT_SECRET", "s" * 32)
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+    m = reload_main()
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    key = 'wb6_errors_total{code="NO_CREDITS"}'
+    before = _value(client.get("/metrics").text, key)
+    tok = m.issue("a@b", 0)
+    for _ in range(2):
+        resp = client.post(
+            "/rewrite",
+            json={"supplierId": 1, "prompt": "x"},
+            headers={"Authorization": f"Bearer {tok}"},
+        )
+        assert resp.json()["error"] == "NO_CREDITS"
+    text = client.get("/metrics").text
+    assert _value(text, key) == before + 2
+    assert "# TYPE wb6_request_ms histogram" in text
+    assert 'wb6_request_ms_bucket{endpoint="rewrite",le="+Inf"}' in text
+    assert _value(text, 'wb6_cache_total{cache="jwt",result="hit"}') >= 1
+
+
+def test_metrics_merge_across_workers(monkeypatch, tmp_path):
+    import metrics
+
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+    reload_main()
+    metrics.observe("wb6_repair_ms", 7)
+    own = metrics.collect()["wb6_repair_ms"][()]
+
+    # снимок «другого воркера» (живой pid) и «умершего» воркера
+    other = {
+        "pid": os.getppid(),
+        "ts": time.time(),
+        "metrics": {"wb6_repair_ms": [[[], [0, 1] + [0] * 12 + [7.0, 1]]]},
+    }
+    with open(tmp_path / "metrics" / f"{os.getppid()}.json", "w") as f:
+        json.dump(other, f)
+    dead = tmp_path / "metrics" / "999999999.json"
+    dead.write_text(json.dumps(other))
+
+    merged = metrics.collect()["wb6_repair_ms"][()]
+    assert merged[-1] == own[-1] + 1
+    assert merged[-2] == own[-2] + 7
+    assert not dead.exists()
+    text = metrics.render()
+    assert f"wb6_repair_ms_count {own[-1] + 1}" in text
+
+    # PID жив, но снимок старый (прошлый запуск контейнера) — не складываем,
+    # но и не удаляем: воркер с этим PID перезапишет его сам
+    stale = tmp_path / "metrics" / f"{os.getppid()}.json"
+    stale.write_text(json.dumps(dict(other, ts=time.time() - 3600)))
+    assert metrics.collect()["wb6_repair_ms"][()][-1] == own[-1]
+    assert stale.exists()
+
+
+def test_busy_worker_snapshot_still_counted(monkeypatch, tmp_path):
+    import metrics
+
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_TIMEOUT", "30")
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path / "metrics"))
+    m = reload_main()
+    assert m.METRICS_MAX_AGE >= 4 * m.OPENAI_TIMEOUT
+    own = metrics.collect().get("wb6_repair_ms", {}).get((), [0] * 16)
+    # сосед полминуты висел на вызове модели и не сбрасывал снимок
+    busy = tmp_path / "metrics" / f"{os.getppid()}.json"
+    busy.write_text(
+        json.dumps(
+            {
+                "pid": os.getppid(),
+                "ts": time.time() - 45,
+                "metrics": {"wb6_repair_ms": [[[], [0, 1] + [0] * 12 + [7.0, 1]]]},
+            }
+        )
+    )
+    from fastapi.testclient import TestClient
+
+    with TestClient(m.app):  # старт воркера чужие снимки не трогает
+        assert metrics.collect()["wb6_repair_ms"][()][-1] == own[-1] + 1
+    assert busy.exists()
@@ -0,0 +1,70 @@
+import asyncio
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_models_cached_and_revalidated(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    m = reload_main()
+    calls = []
+
+    def fake_fetch():
+        calls.append(1)
+        return ["gpt-4o", "gpt-5", "whisper-1"][: 1 + len(calls)]
+
+    monkeypatch.setattr(m, "_fetch_models", fake_fetch)
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    js = client.get("/models").json()
+    assert js["models"] == ["gpt-4o", "gpt-5"] and not js["stale"]
+    assert client.get("/models").json()["models"] == ["gpt-4o", "gpt-5"]
+    assert len(calls) == 1
+
+    # устарел: сразу отдаём старый список, обновляем в фоне
+    m._MODELS["ts"] -= m.MODELS_TTL + 1
+    js = client.get("/models?prefix=").json()
+    assert js["stale"] and js["models"] == ["gpt-4o", "gpt-5"]
+
+    js = client.get("/models?refresh=1&prefix=").json()
+    assert js["models"] == ["gpt-4o", "gpt-5", "whisper-1"]
+    assert len(calls) == 3
+
+    caps = client.get("/models?caps=1").json()["models"]
+    assert caps[1] == {
+        "id": "gpt-5",
+        "api": "responses",
+        "max_completion_tokens": True,
+        "temperature": False,
+    }
+
+
+def test_models_single_flight_and_error(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    m = reload_main()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError("no network")
+
+    monkeypatch.setattr(m, "_fetch_models", failing)
+
+    async def run():
+        return await asyncio.gather(*(m.get_models() for _ in range(5)))
+
+    assert asyncio.run(run()) == [None] * 5
+    assert len(calls) == 1
+    from fastapi.testclient import TestClient
+
+    js = TestClient(m.app).get("/models").json()
+    assert js == {"ok": False, "error": "RuntimeError: no network"}
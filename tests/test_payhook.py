@@ -113,3 +113,71 @@ def test_payhook_alt_crc(monkeypatch):
     data["SignatureValue"] = hashlib.md5(crc_str.encode()).hexdigest().upper()
     resp = client.post("/payhook", data=data)
     assert resp.json() == "OK"
+
+
+def test_paytoken_wait(monkeypatch, tmp_path):
+    import asyncio
+
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("TOKENS_DB", str(tmp_path / "tok.db"))
+    m = reload_main()
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    resp = client.get("/paytoken/wait", params={"inv": "100", "timeout": "0.2"})
+    assert resp.json()["error"] == "NOT_READY"
+
+    async def scenario():
+        waiter = asyncio.create_task(m.wait_token("101", 5))
+        await asyncio.sleep(0.05)
+        tok = m.create_account("w@wb6", 15, "101")
+        return tok, await asyncio.wait_for(waiter, 1)
+
+    tok, got = asyncio.run(scenario())
+    assert got == tok
+    assert m.fetch_token("101") is None
+    assert "101" not in m._TOKEN_WAITERS
+
+    # токен записан другим воркером (отдельное соединение к той же БД)
+    import sqlite3
+
+    monkeypatch.setattr(m, "TOKEN_WAIT_POLL", 0.05)
+
+    async def other_worker():
+        waiter = asyncio.create_task(m.wait_token("102", 5))
+        await asyncio.sleep(0.1)
+        con = sqlite3.connect(m.DB_PATH)
+        with con:
+            con.execute("INSERT INTO tokens(inv, token) VALUES('102', 'tok102')")
+        con.close()
+        return await asyncio.wait_for(waiter, 2)
+
+    assert asyncio.run(other_worker()) == "tok102"
+
+
+def test_tokens_ttl_sweep(monkeypatch, tmp_path):
+    import asyncio
+    import time
+
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("TOKENS_DB", str(tmp_path / "tok.db"))
+    monkeypatch.setenv("TOKENS_SWEEP_BATCH", "3")
+    m = reload_main()
+    for i in range(10):
+        m.store_token(f"old{i}", "t")
+    m.store_token("fresh", "t")
+    with m.DB:
+        m.DB.execute("UPDATE tokens SET expires_at=1 WHERE inv LIKE 'old%'")
+
+    assert m.fetch_token("old0") is None  # просроченный не выдаётся
+    deleted = asyncio.run(m.sweep_tokens(now=time.time()))
+    assert deleted == 9
+    assert m.SWEEP_STATS["last_deleted"] == 9
+
+    from fastapi.testclient import TestClient
+
+    js = TestClient(m.app).get("/diag/tokens").json()
+    assert js["rows"] == 1
+    assert js["expired"] == 0
+    assert js["sweep"]["runs"] == 1
+    assert js["db_bytes"] > 0
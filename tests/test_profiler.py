@@ -0,0 +1,53 @@
+import importlib
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+GOOD = {"title": "Тест", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+
+def busy_chat(messages, model, max_tokens=0, json_mode=True):
+    t_end = time.perf_counter() + 0.1
+    while time.perf_counter() < t_end:
+        pass
+    msg = SimpleNamespace(content=json.dumps(GOOD, ensure_ascii=False))
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+
+def test_forced_profile_and_admin_endpoints(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("ADMIN_TOKEN", "adm")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+    m = reload_main()
+    monkeypatch.setattr(m, "_openai_chat", busy_chat)
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    body = {"supplierId": 1, "prompt": "Зубная паста"}
+    # без админ-токена профиль не снимается
+    client.post("/rewrite", json=body, headers={"X-Profile": "1"})
+    assert client.get("/admin/profiles").status_code == 403
+    adm = {"X-Admin-Token": "adm"}
+    assert client.get("/admin/profiles", headers=adm).json()["profiles"] == []
+
+    resp = client.post("/rewrite", json=body, headers={"X-Profile": "1", **adm})
+    assert resp.json()["title"] == "Тест"
+    profiles = client.get("/admin/profiles", headers=adm).json()["profiles"]
+    assert len(profiles) == 1
+    text = client.get(f"/admin/profiles/{profiles[0]['name']}", headers=adm).text
+    assert text.startswith("# samples=")
+    assert "busy_chat" in text
+    bad = client.get("/admin/profiles/..%2Ftokens.db", headers=adm)
+    assert bad.status_code == 404
@@ -0,0 +1,125 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+GOOD = {"title": "Тест", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+
+def fake_chat(messages, model, max_tokens=0, json_mode=True):
+    msg = SimpleNamespace(content=json.dumps(GOOD, ensure_ascii=False))
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+
+def test_response_profiles(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    m = reload_main()
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+
+    # профиль применяется к словарю, тело кодируется ровно один раз
+    encoded = []
+    dumps = m.fastresp.dumps
+    monkeypatch.setattr(
+        m.fastresp, "dumps", lambda obj: encoded.append(obj) or dumps(obj)
+    )
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    body = {"supplierId": 1, "prompt": "Зубная паста"}
+
+    js = client.post("/rewrite", json=body).json()
+    assert set(js) == {"token", "title", "bullets", "keywords", "model_used"}
+    assert encoded == [js]
+
+    encoded.clear()
+    js = client.post("/rewrite?profile=standard", json=body).json()
+    assert len(encoded) == 1
+    assert js["model_flow"][0]["mode"] == "json"
+    assert {"timings", "repair_used", "wb_meta"} <= set(js)
+    assert "size_report" not in js and "trace" not in js
+
+    js = client.post(
+        "/rewrite", json=body, headers={"X-Response-Profile": "debug"}
+    ).json()
+    assert js["trace"]["name"] == "rewrite"
+    rep = js["size_report"]
+    assert rep["fields"]["keywords"] == len(
+        json.dumps(GOOD["keywords"]).replace(" ", "")
+    )
+    assert rep["minimal"] < rep["total"]
+    assert next(iter(rep["fields"])) == "trace"  # по убыванию размера
+
+
+def test_minimal_keeps_errors(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("JWT_SECRET", "s" * 32)
+    m = reload_main()
+    from fastapi.testclient import TestClient
+
+    tok = m.issue("a@b", 0)
+    js = (
+        TestClient(m.app)
+        .post(
+            "/rewrite",
+            json={"supplierId": 1, "prompt": "x"},
+            headers={"Authorization": f"Bearer {tok}"},
+        )
+        .json()
+    )
+    assert js == {"error": "NO_CREDITS"}
+
+
+def test_debug_profile_header_includes_wb_trace(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    m = reload_main()
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    desc = "<p>" + "Тайская зубная паста с травами. " * 5 + "</p>"
+
+    class Resp:
+        headers = {"Content-Type": "application/json"}
+
+        def __init__(self, data):
+            self._data = data
+
+        def json(self):
+            return self._data
+
+    class DummySession:
+        def __init__(self):
+            self.headers = {}
+
+        def mount(self, prefix, adapter):
+            pass
+
+        def get(self, url, timeout=10, allow_redirects=True):
+            # нужное описание — только на пятом basket-хосте
+            return Resp({"descriptionHtml": desc} if "basket-05" in url else {})
+
+    monkeypatch.setattr(m.requests, "Session", lambda: DummySession())
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    url = "https://www.wildberries.ru/catalog/12345/detail.aspx"
+    body = {"supplierId": 1, "prompt": url}
+
+    js = client.post(
+        "/rewrite", json=body, headers={"X-Response-Profile": "debug"}
+    ).json()
+    assert len(js["wb_meta_trace"]) == 5
+    assert js["trace"]["name"] == "rewrite"
+
+    # X-Profile — только триггер профилировщика, профиль ответа не меняет
+    js = client.post("/rewrite", json=body, headers={"X-Profile": "debug"}).json()
+    assert "wb_meta_trace" not in js and "trace" not in js
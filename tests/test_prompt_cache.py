@@ -0,0 +1,83 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+GOOD = {"title": "Тест", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+
+def _usage(prompt, cached):
+    details = SimpleNamespace(cached_tokens=cached)
+    return SimpleNamespace(prompt_tokens=prompt, prompt_tokens_details=details)
+
+
+def test_calls_share_prefix_and_record_cached_tokens(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("OPENAI_MODEL_FALLBACK", "gpt-4o-mini")
+    monkeypatch.setenv("OPENAI_DESC_FALLBACK_MODELS", "gpt-4o-mini")
+    m = reload_main()
+    calls = []
+
+    def fake_chat(messages, model, max_tokens=0, json_mode=True):
+        calls.append(messages)
+        content = "черновик без json, title и буллиты" if len(calls) == 1 else GOOD
+        msg = SimpleNamespace(content=json.dumps(content, ensure_ascii=False))
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(message=msg)],
+            usage=_usage(1500, 0 if len(calls) == 1 else 1280),
+        )
+
+    def fake_desc(**kw):
+        calls.append(kw["messages"])
+        msg = SimpleNamespace(content="Описание товара")
+        return SimpleNamespace(
+            model=kw["model"],
+            choices=[SimpleNamespace(message=msg)],
+            usage=_usage(1600, 1280),
+        )
+
+    client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=fake_desc))
+    )
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    monkeypatch.setattr(m, "get_client", lambda: client)
+    from fastapi.testclient import TestClient
+
+    body = {"supplierId": 1, "prompt": "Зубная паста Rasyan", "rewriteDescription": 1}
+    js = TestClient(m.app).post("/rewrite", json=body).json()
+    assert js["title"] == "Тест" and js["description"] == "Описание товара"
+
+    gen, repair, desc = calls
+    assert gen[:2] == repair[:2] == desc[:2]
+    assert gen[0]["content"] == m.PROMPT
+    assert gen[1]["content"] == "Зубная паста Rasyan"
+    assert "черновик без json" in repair[-1]["content"]
+    assert desc[-1]["content"].startswith("Задание: ОПИСАНИЕ")
+
+    text = m.metrics.render()
+    assert 'wb6_llm_cached_tokens_total{call="repair",model="gpt-4o-mini"} 1280' in text
+    assert 'wb6_llm_input_tokens_total{call="gen",model="gpt-4o-mini"} 1500' in text
+    assert 'wb6_llm_ms_count{cache="hit",call="desc"} 1' in text
+
+
+def test_record_usage_responses_api(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    m = reload_main()
+    usage = SimpleNamespace(
+        input_tokens=2000, input_tokens_details=SimpleNamespace(cached_tokens=1024)
+    )
+    resp = SimpleNamespace(model="gpt-5", usage=usage)
+    assert m._record_usage(resp, "gen", 10) == 1024
+    assert m._record_usage(SimpleNamespace(), "gen", 10) == 0
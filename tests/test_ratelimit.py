@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "utils"))
+
+import ratelimit  # noqa: E402
+
+
+def test_aimd_per_host():
+    lim = ratelimit.RateLimiter({"a.test": 10.0})
+    a = lim.bucket("https://a.test/x")
+    b = lim.bucket("https://b.test/y")
+    assert (a.rate, b.rate) == (10.0, ratelimit.DEFAULT_RATE)
+    for _ in range(4):
+        lim.feedback("https://a.test/x", 200)
+    assert a.rate == 12.0 and a.ok == 4
+    lim.feedback("https://a.test/x", 429)
+    lim.feedback("https://a.test/x", error=asyncio.TimeoutError())
+    assert a.rate == 3.0 and (a.throttled, a.timeouts) == (1, 1)
+    lim.feedback("https://a.test/x", 404)  # не про нагрузку
+    assert a.rate == 3.0 and b.rate == ratelimit.DEFAULT_RATE
+    for _ in range(1000):
+        lim.feedback("https://a.test/x", 200)
+    assert a.rate == 80.0  # потолок MAX_FACTOR
+
+
+def test_retry_after_pauses_host():
+    assert ratelimit.parse_retry_after("2") == 2.0
+    assert ratelimit.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert ratelimit.parse_retry_after(None) == 0.0
+    lim = ratelimit.RateLimiter({"a.test": 1000.0})
+    lim.feedback("https://a.test/", 503, retry_after="0.2")
+    t0 = time.monotonic()
+    lim.acquire_sync("https://a.test/")
+    assert time.monotonic() - t0 >= 0.19
+
+
+def test_bucket_paces_requests():
+    lim = ratelimit.RateLimiter({"a.test": 50.0})
+
+    async def burst():
+        await asyncio.gather(*(lim.acquire("https://a.test/") for _ in range(11)))
+
+    t0 = time.monotonic()
+    asyncio.run(burst())
+    took = time.monotonic() - t0
+    assert 0.15 <= took < 1.0  # 1 токен сразу, ещё 10 — по 20 мс
+    b = lim.bucket("https://a.test/")
+    assert b.requests == 11 and 30 < b.achieved() < 70
+    line = lim.summary().splitlines()[1]
+    assert line.startswith("a.test") and line.split()[1] == "11"
+
+
+def test_fetch_retries_throttled(monkeypatch):
+    # aiocfscrape в тестах не нужен (как и в test_social.py)
+    sys.modules.setdefault("aiocfscrape", types.SimpleNamespace(create_scraper=None))
+    import social_scraper as ss
+
+    class Resp:
+        def __init__(self, status):
+            self.status = status
+            self.headers = {"Retry-After": "0"} if status == 429 else {}
+
+        async def text(self):
+            return "ok" if self.status == 200 else ""
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+    class Session:
+        def __init__(self):
+            self.statuses = [429, 200]
+
+        def get(self, url, headers=None):
+            return Resp(self.statuses.pop(0))
+
+    monkeypatch.setattr(ss, "LIMITER", ratelimit.RateLimiter({"api-fns.ru": 100.0}))
+    assert asyncio.run(ss.fetch(Session(), "https://api-fns.ru/api/egr?req=1")) == "ok"
+    b = ss.LIMITER.bucket("https://api-fns.ru/")
+    assert (b.requests, b.throttled, b.ok) == (2, 1, 1)
+
+
+def test_delay_flag_is_accepted_and_ignored(capsys):
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ratelimit.add_args(ap)
+    lim = ratelimit.from_args(ap.parse_args(["--delay", "0.25", "--rate", "a.test=3"]))
+    assert lim.bucket("https://a.test/").rate == 3.0
+    assert "--delay" in capsys.readouterr().err
+    ratelimit.from_args(ap.parse_args([]))
+    assert capsys.readouterr().err == ""
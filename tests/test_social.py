@@ -54,3 +54,169 @@ def test_social_scraper(monkeypatch, tmp_path):
     assert rows[0]["inn"] == "1234567890"
     assert rows[0]["phone"] == "+79261234567"
     assert rows[0]["email"] == "test@mail.ru"
+
+
+def test_social_scraper_streams_rows(monkeypatch, tmp_path):
+    outp = tmp_path / "out.csv"
+    state = {"active": 0, "peak": 0, "seen_on_disk": 0}
+
+    async def fake_get_inn_cf(sid: str, scraper):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        if sid == "40":  # к этому моменту готовые строки уже на диске
+            state["seen_on_disk"] = len(open(outp, encoding="utf-8").readlines()) - 1
+        await ss.asyncio.sleep(0)
+        state["active"] -= 1
+        if sid == "7":
+            raise RuntimeError("boom")
+        return "" if int(sid) % 2 else "1234567890"
+
+    async def fake_query_fns(session, inn: str):
+        return "89261234567", ""
+
+    async def fake_scrape_zcb(session, inn: str):
+        return "", ""
+
+    monkeypatch.setattr(ss, "get_inn_cf", fake_get_inn_cf)
+    monkeypatch.setattr(ss, "query_fns", fake_query_fns)
+    monkeypatch.setattr(ss, "scrape_zcb", fake_scrape_zcb)
+
+    inp = tmp_path / "raw.csv"
+    with open(inp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["supplier_id", "name"])
+        w.writeheader()
+        for i in range(60):
+            w.writerow({"supplier_id": str(i), "name": f"s{i}"})
+
+    monkeypatch.setattr(sys, "argv", ["social_scraper.py", "--input", str(inp), "--output", str(outp),
+                                      "--concurrency", "4", "--fns-limit", "5", "--no-cache"])
+    ss.main()
+    rows = list(csv.DictReader(open(outp, encoding="utf-8")))
+    assert sorted(int(r["supplier_id"]) for r in rows) == list(range(60))
+    assert list(rows[0]) == ["supplier_id", "name", "inn", "phone", "email"]
+    assert state["peak"] <= 4
+    assert state["seen_on_disk"] >= 30
+    assert sum(1 for r in rows if r["phone"]) == 5  # --fns-limit
+    assert next(r for r in rows if r["supplier_id"] == "7")["inn"] == ""
+
+
+def test_social_scraper_resume(monkeypatch, tmp_path, capsys):
+    calls = {"inn": [], "fns": []}
+    flaky = {"2", "3"}
+
+    async def fake_get_inn_cf(sid: str, scraper):
+        calls["inn"].append(sid)
+        return "" if sid in flaky else "77000000" + sid.zfill(2)
+
+    async def fake_query_fns(session, inn: str):
+        calls["fns"].append(inn)
+        return "+7 926 123 45 67", ""
+
+    monkeypatch.setattr(ss, "get_inn_cf", fake_get_inn_cf)
+    monkeypatch.setattr(ss, "query_fns", fake_query_fns)
+
+    inp = tmp_path / "raw.csv"
+    with open(inp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["supplier_id"])
+        w.writeheader()
+        for i in range(5):
+            w.writerow({"supplier_id": str(i)})
+    outp = tmp_path / "out.csv"
+    argv = ["social_scraper.py", "--input", str(inp), "--output", str(outp)]
+
+    monkeypatch.setattr(sys, "argv", argv)
+    ss.main()
+    assert len(calls["inn"]) == 5 and len(calls["fns"]) == 3
+    assert (tmp_path / "out.csv.journal").exists()
+
+    calls = {"inn": [], "fns": []}
+    flaky.clear()
+    monkeypatch.setattr(sys, "argv", argv + ["--resume"])
+    ss.main()
+    assert sorted(calls["inn"]) == ["2", "3"]  # повторяются только неудачи
+    assert len(calls["fns"]) == 2
+    rows = list(csv.DictReader(open(outp, encoding="utf-8")))
+    assert len(rows) == 5 and all(r["phone"] == "+79261234567" for r in rows)
+    out = capsys.readouterr().out
+    assert "inn: skipped 3, retried 2" in out and "fns: skipped 3, retried 0" in out
+
+    calls = {"inn": [], "fns": []}
+    monkeypatch.setattr(sys, "argv", argv + ["--no-cache"])  # без --resume — с нуля
+    ss.main()
+    assert len(calls["inn"]) == 5
+
+
+
+def test_social_scraper_resume_keeps_zcb_contacts(monkeypatch, tmp_path, capsys):
+    calls = {"fns": 0, "zcb": 0}
+
+    async def fake_get_inn_cf(sid: str, scraper):
+        return "7700000001"
+
+    async def fake_query_fns(session, inn: str):
+        calls["fns"] += 1
+        return "", ""
+
+    async def fake_scrape_zcb(session, inn: str):
+        calls["zcb"] += 1
+        return "+79261234567", ""
+
+    monkeypatch.setattr(ss, "get_inn_cf", fake_get_inn_cf)
+    monkeypatch.setattr(ss, "query_fns", fake_query_fns)
+    monkeypatch.setattr(ss, "scrape_zcb", fake_scrape_zcb)
+
+    inp = tmp_path / "raw.csv"
+    with open(inp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["supplier_id"])
+        w.writeheader()
+        w.writerow({"supplier_id": "1"})
+    outp = tmp_path / "out.csv"
+    argv = ["social_scraper.py", "--input", str(inp), "--output", str(outp), "--no-cache"]
+
+    monkeypatch.setattr(sys, "argv", argv)
+    ss.main()
+    assert calls == {"fns": 1, "zcb": 1}
+
+    # ФНС пуста, ЗЧБ нашёл: с --resume ни ФНС, ни ЗЧБ не спрашиваем
+    monkeypatch.setattr(sys, "argv", argv + ["--resume"])
+    ss.main()
+    assert calls == {"fns": 1, "zcb": 1}
+    rows = list(csv.DictReader(open(outp, encoding="utf-8")))
+    assert rows[0]["phone"] == "+79261234567"
+    out = capsys.readouterr().out
+    assert "fns: skipped 0, retried 0" in out and "zcb: skipped 1, retried 0" in out
+
+
+def test_social_scraper_cache(monkeypatch, tmp_path, capsys):
+    calls = {"inn": 0, "fns": 0}
+
+    async def fake_get_inn_cf(sid: str, scraper):
+        calls["inn"] += 1
+        return "" if sid == "9" else "500100732" + sid
+
+    async def fake_query_fns(session, inn: str):
+        calls["fns"] += 1
+        return ("89261234567", "") if inn.endswith("1") else ("", "")
+
+    async def fake_scrape_zcb(session, inn: str):
+        return "", ""
+
+    monkeypatch.setattr(ss, "get_inn_cf", fake_get_inn_cf)
+    monkeypatch.setattr(ss, "query_fns", fake_query_fns)
+    monkeypatch.setattr(ss, "scrape_zcb", fake_scrape_zcb)
+
+    cache = tmp_path / "cache.sqlite"
+    for name, sids in (("a", ["1", "2", "9"]), ("b", ["2", "1", "3", "9"])):
+        inp = tmp_path / f"{name}.csv"
+        with open(inp, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=["supplier_id"])
+            w.writeheader()
+            w.writerows({"supplier_id": s} for s in sids)
+        monkeypatch.setattr(sys, "argv", ["social_scraper.py", "--input", str(inp),
+                                          "--output", str(tmp_path / f"{name}_out.csv"), "--cache", str(cache)])
+        ss.main()
+    assert calls == {"inn": 3 + 2, "fns": 2 + 1}  # во втором прогоне — только 3 и 9
+    rows = list(csv.DictReader(open(tmp_path / "b_out.csv", encoding="utf-8")))
+    assert {r["supplier_id"]: r["phone"] for r in rows}["1"] == "+79261234567"
+    out = capsys.readouterr().out.splitlines()
+    assert out[-1].endswith("inn 2/4 hit (50%)  contacts 2/3 hit (67%)  |  FNS calls saved: 2, ZCB: 0")
@@ -0,0 +1,83 @@
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def test_import_defers_heavy_work(tmp_path):
+    code = (
+        "import sys, main\n"
+        "loaded = [n for n in ('openai', 'requests') if n in sys.modules\n"
+        "          and type(sys.modules[n]).__name__ != '_LazyModule']\n"
+        "print(loaded, main._CLIENT, main.DB._con)\n"
+    )
+    env = dict(os.environ, OPENAI_API_KEY="key", DATA_DIR=str(tmp_path))
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert out.strip() == "[] None None"
+    assert not (tmp_path / "tokens.db").exists()
+
+
+def test_lifespan_preloads(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    m = reload_main()
+    from fastapi.testclient import TestClient
+
+    with TestClient(m.app) as client:
+        assert client.get("/health").json() == {"ok": True}
+        deadline = time.time() + 10
+        while m.STARTUP["preload_ms"] is None and time.time() < deadline:
+            time.sleep(0.05)
+    assert m.STARTUP["preload_ms"] is not None
+    assert m.DB._con is not None and m._CLIENT is not None
+    assert (tmp_path / "tokens.db").exists()
+
+
+def test_warm_up_and_keep_alive(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("WARM_WB_HOSTS", "basket-01.wb.ru,card.wb.ru")
+    m = reload_main()
+    warmed = []
+
+    def fake_wb(host):
+        if host == "card.wb.ru":
+            raise ConnectionError("down")
+        warmed.append(host)
+        m._LAST_USE[host] = time.monotonic()
+
+    monkeypatch.setattr(m, "_warm_wb", fake_wb)
+    monkeypatch.setattr(m, "_warm_openai", lambda: warmed.append("openai"))
+    from fastapi.testclient import TestClient
+
+    with TestClient(m.app) as client:
+        deadline = time.time() + 10
+        while not client.get("/healthz").json()["ready"] and time.time() < deadline:
+            time.sleep(0.05)
+        js = client.get("/healthz").json()
+        assert js["ready"] is True
+        warm = js["startup"]["warm"]
+        assert warm["basket-01.wb.ru"]["ok"] and warm["openai"]["ok"]
+        assert warm["card.wb.ru"]["error"] == "ConnectionError"
+        assert js["startup"]["warm_ms"] is not None
+        assert "wb6_warmup_ms" in client.get("/metrics").text
+
+    # пингуются только простаивающие цели
+    m._LAST_USE["openai"] = time.monotonic()
+    assert set(m._warm_up(only_idle=True)) == {"card.wb.ru"}
@@ -0,0 +1,49 @@
+import html
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from textnorm import html_to_text  # noqa: E402
+
+GOLDEN = os.path.join(os.path.dirname(__file__), "golden", "html_norm")
+
+
+def _cases():
+    return sorted(f[:-5] for f in os.listdir(GOLDEN) if f.endswith(".html"))
+
+
+@pytest.mark.parametrize("name", _cases())
+def test_golden(name):
+    with open(os.path.join(GOLDEN, name + ".html"), encoding="utf-8") as f:
+        src = f.read()
+    with open(os.path.join(GOLDEN, name + ".txt"), encoding="utf-8") as f:
+        expected = f.read()
+    assert html_to_text(src) == expected
+
+
+def _bs4_norm(html_text: str) -> str:
+    # Прежняя реализация из wb_card_fetch — эталон для сравнения
+    from bs4 import BeautifulSoup
+
+    cleaned = re.sub(r"</?(p|li|br|ul|ol)[^>]*>", "\n", html_text or "", flags=re.I)
+    txt = BeautifulSoup(cleaned, "html.parser").get_text("\n", strip=True)
+    txt = re.sub(r"\s+\n", "\n", txt)
+    return re.sub(r"[ \t]{2,}", " ", html.unescape(txt)).strip()
+
+
+def test_matches_bs4_on_random_markup():
+    pytest.importorskip("bs4")
+    tokens = [
+        "<p>", "</p>", "<li>", "<br/>", "<div>", "</div>", "<b>", "</b>",
+        "<script>", "</script>", "<!-- c -->", "&nbsp;", "&amp;", "&#8470;",
+        "&copy", "&foo;", " ", "  ", "\t", "\n", "текст", "word", "<", ">", "&",
+    ]  # fmt: skip
+    rnd = random.Random(35)
+    for _ in range(500):
+        doc = "".join(rnd.choice(tokens) for _ in range(rnd.randint(0, 30)))
+        assert html_to_text(doc) == _bs4_norm(doc), doc
@@ -0,0 +1,66 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+GOOD = {"title": "Тест", "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+
+def fake_chat(messages, model, max_tokens=0, json_mode=True):
+    msg = SimpleNamespace(content=json.dumps(GOOD, ensure_ascii=False))
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(message=msg)])
+
+
+def test_server_timing_and_debug_trace(monkeypatch, tmp_path):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    m = reload_main()
+    monkeypatch.setattr(m, "_openai_chat", m.tracing.traced("openai_chat")(fake_chat))
+    monkeypatch.setattr(m, "TRACE_EXPORT", str(tmp_path / "spans.jsonl"))
+    from fastapi.testclient import TestClient
+
+    client = TestClient(m.app)
+    body = {"supplierId": 1, "prompt": "Зубная паста"}
+    resp = client.post("/rewrite", json=body, headers={"Origin": "https://wb6.ru"})
+    js = resp.json()
+    assert js["title"] == "Тест"
+    assert "trace" not in js
+    timing = resp.headers["Server-Timing"]
+    assert timing.startswith("total;dur=")
+    for name in ("auth", "gen", "gen.openai_chat", "extract"):
+        assert f"{name};dur=" in timing
+    assert resp.headers["Timing-Allow-Origin"] == "https://wb6.ru"
+
+    js = client.post("/rewrite?debug=1", json=body).json()
+    tree = js["trace"]
+    assert tree["name"] == "rewrite"
+    gen = next(c for c in tree["children"] if c["name"] == "gen")
+    assert gen["attrs"]["model"] == "gpt-4o-mini"
+    assert gen["children"][0]["name"] == "openai_chat"
+
+    lines = (tmp_path / "spans.jsonl").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["name"] == "rewrite"
+
+
+def test_spans_noop_outside_trace():
+    import tracing
+
+    with tracing.span("x") as sp:
+        assert sp is None
+    with tracing.trace("root") as root:
+        for _ in range(3):
+            with tracing.span("probe"):
+                pass
+    assert "probe;dur=" in tracing.server_timing(root)
+    assert 'desc="x3"' in tracing.server_timing(root)
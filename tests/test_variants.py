@@ -0,0 +1,120 @@
+import importlib
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+def reload_main():
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    return importlib.import_module("main")
+
+
+def card(title):
+    return {"title": title, "bullets": ["b"] * 6, "keywords": ["k"] * 20}
+
+
+def _client(m):
+    from fastapi.testclient import TestClient
+
+    return TestClient(m.app)
+
+
+def test_chat_uses_n_and_charges_by_rule(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("JWT_SECRET", "s" * 32)
+    monkeypatch.setenv("VARIANT_EXTRA_COST", "0.5")
+    m = reload_main()
+    seen = {}
+
+    def fake_chat(messages, model, max_tokens=0, json_mode=True, n=1):
+        seen["n"] = n
+        bodies = [card("A"), {"title": "битый"}, card("B"), card("a")]
+        choices = [
+            SimpleNamespace(message=SimpleNamespace(content=json.dumps(b)))
+            for b in bodies[:n]
+        ]
+        return SimpleNamespace(model=model, choices=choices)
+
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    tok = m.issue("a@b", 10)
+    js = (
+        _client(m)
+        .post(
+            "/rewrite",
+            json={"supplierId": 1, "prompt": "Паста", "variants": 4},
+            headers={"Authorization": f"Bearer {tok}"},
+        )
+        .json()
+    )
+    assert seen["n"] == 4
+    assert [v["title"] for v in js["variants"]] == ["A", "B"]  # битый и дубль — мимо
+    assert js["title"] == "A"
+    assert m.verify(js["token"])["quota"] == 10 - 2  # 1 + ceil(0.5)
+
+
+def test_variants_capped_by_quota_and_limit(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("MAX_VARIANTS", "3")
+    monkeypatch.setenv("VARIANT_EXTRA_COST", "1")
+    m = reload_main()
+    assert m._variants_allowed(10, 100) == 3
+    assert m._variants_allowed(3, 2) == 2
+    assert m._variants_allowed(0, 5) == 1
+    assert m._variants_charge(3) == 3
+    monkeypatch.setattr(m, "VARIANT_EXTRA_COST", 0)
+    assert m._variants_charge(3) == 1
+
+
+def test_responses_api_asks_for_array(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-5")
+    m = reload_main()
+    sent = {}
+
+    def fake_responses(*, messages, model, json_mode, json_format=""):
+        sent["task"] = messages[-1]["content"]
+        text = json.dumps({"variants": [card("A"), card("B"), card("C")]})
+        return SimpleNamespace(model=model, output_text=text)
+
+    monkeypatch.setattr(m, "_openai_responses", fake_responses)
+    js = (
+        _client(m)
+        .post(
+            "/rewrite?profile=standard",
+            json={"supplierId": 1, "prompt": "Паста", "variants": 3},
+        )
+        .json()
+    )
+    assert "3 разных вариантов" in sent["task"]
+    assert [v["title"] for v in js["variants"]] == ["A", "B", "C"]
+    assert js["model_flow"][0]["variants"] == 3
+
+
+def test_responses_variants_fall_back_to_json_object(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_MODEL", "gpt-5")
+    monkeypatch.setenv("OPENAI_JSON_MODE", "schema")
+    m = reload_main()
+    sent = []
+
+    def create(timeout=None, **kwargs):
+        sent.append(kwargs.get("response_format"))
+        n = 2 if "variants" in kwargs["input"][-1]["content"] else 1
+        out = {"variants": [card("A"), card("B")]} if n > 1 else card("A")
+        return SimpleNamespace(model=kwargs["model"], output_text=json.dumps(out))
+
+    client = SimpleNamespace(responses=SimpleNamespace(create=create))
+    monkeypatch.setattr(m, "get_client", lambda: client)
+    body = {"supplierId": 1, "prompt": "Паста"}
+    c = _client(m)
+
+    assert c.post("/rewrite", json=dict(body, variants=2)).json()["variants"]
+    assert c.post("/rewrite", json=body).json()["title"] == "A"
+    # схема — на одну карточку; для массива вариантов — json_object, не «ничего»
+    assert sent[0] == {"type": "json_object"}
+    assert sent[1]["type"] == "json_schema"
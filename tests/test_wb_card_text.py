@@ -51,6 +51,9 @@ def test_select_correct_product(monkeypatch):
         def __init__(self):
             self.headers = {}
 
+        def mount(self, prefix, adapter):
+            pass
+
         def get(self, url, timeout=10, allow_redirects=True):
             return fake_get(url, timeout, allow_redirects)
 
@@ -93,6 +96,9 @@ def test_basket_first(monkeypatch):
         def __init__(self):
             self.headers = {}
 
+        def mount(self, prefix, adapter):
+            pass
+
         def get(self, url, timeout=10, allow_redirects=True):
             return fake_get(url, timeout, allow_redirects)
 
@@ -0,0 +1,114 @@
+"""
+contact_cache.py — общий кэш ИНН и контактов для social_scraper*.py
+▪️ supplier_id → inn          (ИНН продавца почти не меняется: TTL 90 дней)
+▪️ inn → phone, email, source (контакты: 30 дней; «ничего не нашли» — 3 дня)
+Одни и те же продавцы всплывают во многих выгрузках: из кэша не ходим ни на
+WB, ни в api-fns.ru (и не тратим --fns-limit), ни на zachestnyibiznes.ru.
+Файл: --cache, $SCRAPER_CACHE или .contacts_cache.sqlite рядом с --output.
+"""
+
+import os
+import sqlite3
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+DAY = 86400
+
+
+class ContactCache:
+    def __init__(
+        self,
+        path: str,
+        inn_ttl_days: float = 90,
+        contact_ttl_days: float = 30,
+        empty_ttl_days: float = 3,
+    ):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS inn (supplier_id TEXT PRIMARY KEY, inn TEXT, fetched_at REAL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS contacts (inn TEXT PRIMARY KEY, phone TEXT, email TEXT, "
+            "source TEXT, fetched_at REAL)"
+        )
+        self.db.commit()
+        self.inn_ttl, self.contact_ttl, self.empty_ttl = (
+            inn_ttl_days * DAY,
+            contact_ttl_days * DAY,
+            empty_ttl_days * DAY,
+        )
+        self.hits, self.misses, self.saved = Counter(), Counter(), Counter()
+
+    def get_inn(self, sid: str) -> Optional[str]:
+        r = self.db.execute(
+            "SELECT inn, fetched_at FROM inn WHERE supplier_id=?", (sid,)
+        ).fetchone()
+        if r and time.time() - r[1] < self.inn_ttl:
+            self.hits["inn"] += 1
+            return r[0]
+        self.misses["inn"] += 1
+        return None
+
+    def put_inn(self, sid: str, inn: str):
+        if inn:  # «не нашли ИНН» не кэшируем: чаще это сбой страницы
+            self.db.execute(
+                "INSERT OR REPLACE INTO inn VALUES (?,?,?)", (sid, inn, time.time())
+            )
+            self.db.commit()
+
+    def get_contacts(self, inn: str) -> Optional[Tuple[str, str, str]]:
+        """(phone, email, source) или None; source — 'fns', 'zcb' или '' (пусто)."""
+        r = self.db.execute(
+            "SELECT phone, email, source, fetched_at FROM contacts WHERE inn=?", (inn,)
+        ).fetchone()
+        if r:
+            ttl = self.contact_ttl if (r[0] or r[1]) else self.empty_ttl
+            if time.time() - r[3] < ttl:
+                self.hits["contacts"] += 1
+                self.saved[r[2] or "fns"] += 1  # пустой ответ тоже был запросом в ФНС
+                return r[0], r[1], r[2]
+        self.misses["contacts"] += 1
+        return None
+
+    def put_contacts(self, inn: str, phone: str, email: str, source: str):
+        self.db.execute(
+            "INSERT OR REPLACE INTO contacts VALUES (?,?,?,?,?)",
+            (inn, phone, email, source if (phone or email) else "", time.time()),
+        )
+        self.db.commit()
+
+    def summary(self) -> str:
+        parts = []
+        for kind in ("inn", "contacts"):
+            total = self.hits[kind] + self.misses[kind]
+            rate = 100 * self.hits[kind] / total if total else 0
+            parts.append(f"{kind} {self.hits[kind]}/{total} hit ({rate:.0f}%)")
+        return (
+            "  ".join(parts)
+            + f'  |  FNS calls saved: {self.saved["fns"]}, ZCB: {self.saved["zcb"]}'
+        )
+
+    def close(self):
+        self.db.close()
+
+
+def add_args(ap):
+    ap.add_argument("--cache", default="", help="файл кэша ИНН/контактов")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--inn-ttl-days", type=float, default=90)
+    ap.add_argument("--contact-ttl-days", type=float, default=30)
+
+
+def from_args(args) -> Optional[ContactCache]:
+    if args.no_cache:
+        return None
+    path = (
+        args.cache
+        or os.getenv("SCRAPER_CACHE")
+        or os.path.join(
+            os.path.dirname(os.path.abspath(args.output)), ".contacts_cache.sqlite"
+        )
+    )
+    return ContactCache(path, args.inn_ttl_days, args.contact_ttl_days)
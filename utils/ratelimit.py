@@ -0,0 +1,183 @@
+"""
+ratelimit.py — AIMD-лимитер запросов по хостам для social_scraper*.py
+▪️ у каждого хоста свой token bucket: WB, api-fns.ru и zachestnyibiznes.ru
+  терпят разную нагрузку, общий семафор и фиксированный sleep не годятся
+▪️ успешный ответ — скорость растёт на шаг (additive increase), 429/5xx и
+  тайм-аут — падает вдвое (multiplicative decrease), Retry-After ставит хост
+  на паузу: скорость сходится к реальному лимиту каждого хоста
+▪️ summary() — сколько запросов, отказов и какая скорость получилась
+Асинхронные скраперы зовут acquire(), синхронный (selenium) — acquire_sync().
+Старый --delay (фиксированная пауза) принимается, но ни на что не влияет.
+"""
+
+import argparse
+import asyncio
+import email.utils
+import sys
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+# Начальная скорость, запросов/с; потолок — MAX_FACTOR от неё
+DEFAULT_RATES = {
+    "www.wildberries.ru": 5.0,
+    "api-fns.ru": 2.0,
+    "zachestnyibiznes.ru": 1.0,
+}
+DEFAULT_RATE = 2.0
+MAX_FACTOR = 8
+MIN_RATE = 0.05
+THROTTLE = {429, 500, 502, 503, 504}
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).hostname or url
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After: секунды или HTTP-дата → секунды ожидания (0 — нет)."""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except Exception:
+        return 0.0
+
+
+class HostBucket:
+    def __init__(self, rate: float):
+        self.rate = self.base = rate
+        self.max_rate = rate * MAX_FACTOR
+        self.step = max(MIN_RATE, rate * 0.05)
+        self.tokens, self.last = 1.0, time.monotonic()
+        self.paused_until = 0.0
+        self.requests = self.ok = self.throttled = self.timeouts = 0
+        self.first = self.latest = None
+
+    def _wait(self) -> float:
+        """Взять токен (0) или сколько ждать до следующего."""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        burst = max(1.0, self.rate)
+        self.tokens = min(burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.requests += 1
+            self.first = self.first or now
+            self.latest = now
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def feedback(
+        self,
+        status: Optional[int] = None,
+        error: Optional[BaseException] = None,
+        retry_after=None,
+    ):
+        # requests.Timeout, aiohttp.ServerTimeoutError, TimeoutError у playwright
+        timeout = error is not None and (
+            isinstance(error, (asyncio.TimeoutError, TimeoutError))
+            or "Timeout" in type(error).__name__
+        )
+        if status in THROTTLE or timeout:
+            self.throttled += status in THROTTLE
+            self.timeouts += timeout
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            pause = parse_retry_after(retry_after)
+            if pause:
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+        elif status is not None and status < 400:
+            self.ok += 1
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+    def achieved(self) -> float:
+        if not self.first or self.requests < 2 or self.latest == self.first:
+            return 0.0
+        return (self.requests - 1) / (self.latest - self.first)
+
+
+class RateLimiter:
+    def __init__(
+        self, rates: Optional[Dict[str, float]] = None, default: float = DEFAULT_RATE
+    ):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.default = default
+        self.buckets: Dict[str, HostBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> HostBucket:
+        host = host_of(url)
+        b = self.buckets.get(host)
+        if b is None:
+            b = self.buckets[host] = HostBucket(self.rates.get(host, self.default))
+        return b
+
+    async def acquire(self, url: str):
+        b = self.bucket(url)
+        while (wait := b._wait()) > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, url: str):
+        b = self.bucket(url)
+        while True:
+            with self.lock:
+                wait = b._wait()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def feedback(self, url: str, status=None, error=None, retry_after=None):
+        with self.lock:
+            self.bucket(url).feedback(status, error, retry_after)
+
+    def summary(self) -> str:
+        lines = [
+            f'{"host":<24}{"req":>6}{"ok":>6}{"429/5xx":>9}{"t/o":>5}{"start":>7}{"now":>7}{"got r/s":>9}'
+        ]
+        for host, b in sorted(self.buckets.items()):
+            lines.append(
+                f"{host:<24}{b.requests:>6}{b.ok:>6}{b.throttled:>9}{b.timeouts:>5}"
+                f"{b.base:>7.2f}{b.rate:>7.2f}{b.achieved():>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+def parse_rates(items) -> Dict[str, float]:
+    """['api-fns.ru=1.5', …] → {'api-fns.ru': 1.5}"""
+    out = {}
+    for it in items or []:
+        host, _, val = it.partition("=")
+        out[host.strip()] = float(val)
+    return out
+
+
+def add_args(ap):
+    ap.add_argument(
+        "--rate",
+        action="append",
+        default=[],
+        metavar="HOST=RPS",
+        help="начальная скорость для хоста, запросов/с (можно несколько)",
+    )
+    ap.add_argument("--default-rate", type=float, default=DEFAULT_RATE)
+    # устарел: старые командные строки не должны падать на argparse
+    ap.add_argument("--delay", type=float, default=None, help=argparse.SUPPRESS)
+
+
+def from_args(args) -> RateLimiter:
+    if getattr(args, "delay", None) is not None:
+        print(
+            "⚠️ --delay устарел и игнорируется: темп задают --rate/--default-rate",
+            file=sys.stderr,
+        )
+    return RateLimiter(parse_rates(args.rate), args.default_rate)
@@ -5,16 +5,20 @@ social_scraper.py  —  WB contacts v4
 ▪️ API-ФНС / zachestnyibiznes.ru → phone/e-mail
 Usage:
   python social_scraper.py --input raw.csv --output socials.csv \
-         --delay 0.25 --concurrency 30 --fns-limit 500
+         --concurrency 30 --fns-limit 500 [--rate api-fns.ru=2] [--resume]
 """
 from __future__ import annotations
-import re, csv, json, argparse, asyncio, sys, pathlib, random
-from typing import Dict, List, Tuple
+import re, csv, json, argparse, asyncio, sys, pathlib, sqlite3, time
+from collections import Counter
+from typing import Dict, Tuple
 
 import aiohttp, async_timeout, aiocfscrape
 from bs4 import BeautifulSoup
 from tqdm.asyncio import tqdm
 
+import contact_cache, ratelimit
+from contact_cache import ContactCache
+
 # ─── REGEX ───────────────────────────────────────────────────────────────────
 INN_RE   = re.compile(r'ИНН[:\s]*?(\d{10,12})')
 PHONE_RE = re.compile(r'(?:\+7|8)\s*\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}')
@@ -34,22 +38,36 @@ def norm_phone(raw:str)->str:
         return f'+7{digits}'
     return ''
 
+# Темп задаёт лимитер по хостам (ratelimit.py), а не sleep после запроса
+LIMITER = ratelimit.RateLimiter()
+
 async def fetch(session:aiohttp.ClientSession, url:str, timeout:int=15)->str:
-    try:
-        async with async_timeout.timeout(timeout):
-            async with session.get(url, headers=HEADERS) as r:
-                return await r.text()
-    except Exception:
-        return ''
+    for attempt in range(2):   # после 429/5xx — ещё раз, уже в сниженном темпе
+        await LIMITER.acquire(url)
+        try:
+            async with async_timeout.timeout(timeout):
+                async with session.get(url, headers=HEADERS) as r:
+                    LIMITER.feedback(url, r.status, retry_after=r.headers.get('Retry-After'))
+                    if r.status in ratelimit.THROTTLE and attempt == 0:
+                        continue
+                    return await r.text()
+        except Exception as e:
+            LIMITER.feedback(url, error=e)
+            return ''
+    return ''
 
 # ─── CORE ────────────────────────────────────────────────────────────────────
 async def get_inn_cf(sid:str, scraper)->str:
     url = f'https://www.wildberries.ru/seller/{sid}'
+    await LIMITER.acquire(url)
     try:
-        html = await (await scraper.get(url, headers=HEADERS, timeout=15)).text()
+        r = await scraper.get(url, headers=HEADERS, timeout=15)
+        LIMITER.feedback(url, getattr(r, 'status', None), retry_after=getattr(r, 'headers', {}).get('Retry-After'))
+        html = await r.text()
         m = INN_RE.search(html)
         return m.group(1) if m else ''
-    except Exception:
+    except Exception as e:
+        LIMITER.feedback(url, error=e)
         return ''
 
 async def query_fns(session, inn:str)->Tuple[str,str]:
@@ -76,47 +94,172 @@ async def scrape_zcb(session, inn:str)->Tuple[str,str]:
     return (norm_phone(PHONE_RE.search(t).group(0)) if PHONE_RE.search(t) else '',
             EMAIL_RE.search(t).group(0) if EMAIL_RE.search(t) else '')
 
-async def process(row:Dict[str,str], session, scraper, sem, args, state)->Dict[str,str]:
-    async with sem:
-        sid = row['supplier_id']
-        inn  = await get_inn_cf(sid, scraper)
-        phone = email = ''
-        if inn and not args.skip_fns and state['fns'] < args.fns_limit:
-            p,e = await query_fns(session, inn)
-            phone = norm_phone(p)
-            email = e
-            state['fns'] += 1
-            await asyncio.sleep(0.25 + random.random()*0.25)   # ФНС не любит «заливку»
-        if inn and not phone and not email:
+# ─── JOURNAL ─────────────────────────────────────────────────────────────────
+class Journal:
+    """
+    Журнал этапов по supplier_id (SQLite рядом с выходом): inn, fns, zcb.
+    Этап считается сделанным, если дал данные; пустой результат записывается
+    как неудача и с --resume повторяется, сделанные этапы берутся из журнала.
+    Сделанный zcb закрывает строку целиком: пустой fns перед ним не повторяем.
+    Без --resume журнал очищается — прогон с нуля.
+    """
+    STAGES = ('inn', 'fns', 'zcb')
+
+    def __init__(self, path:str, resume:bool=False):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS stages (supplier_id TEXT, stage TEXT, '
+                        'ok INTEGER, value TEXT, ts REAL, PRIMARY KEY (supplier_id, stage))')
+        if not resume:
+            self.db.execute('DELETE FROM stages')
+        self.db.commit()
+        self.skipped, self.retried = Counter(), Counter()
+
+    def done(self, sid:str, stage:str):
+        """Результат сделанного этапа или None (нет записи / была неудача)."""
+        r = self.db.execute('SELECT ok, value FROM stages WHERE supplier_id=? AND stage=?',
+                            (sid, stage)).fetchone()
+        if r and r[0]:
+            self.skipped[stage] += 1
+            return json.loads(r[1])
+        if r:
+            self.retried[stage] += 1
+        return None
+
+    def has(self, sid:str, stage:str)->bool:
+        """Этап сделан (без учёта в skipped/retried)."""
+        return bool(self.db.execute('SELECT ok FROM stages WHERE supplier_id=? AND stage=? AND ok',
+                                    (sid, stage)).fetchone())
+
+    def record(self, sid:str, stage:str, value):
+        ok = bool(value if isinstance(value, str) else any(value))
+        self.db.execute('INSERT OR REPLACE INTO stages VALUES (?,?,?,?,?)',
+                        (sid, stage, int(ok), json.dumps(value, ensure_ascii=False), time.time()))
+        self.db.commit()
+
+    def summary(self)->str:
+        return '  '.join(f'{st}: skipped {self.skipped[st]}, retried {self.retried[st]}'
+                         for st in self.STAGES)
+
+    def close(self):
+        self.db.close()
+
+async def lookup_inn(sid:str, scraper, cache:ContactCache|None)->str:
+    inn = cache.get_inn(sid) if cache else None
+    if inn is None:
+        inn = await get_inn_cf(sid, scraper)
+        if cache: cache.put_inn(sid, inn)
+    return inn
+
+async def process(row:Dict[str,str], session, scraper, args, state,
+                  journal:Journal|None=None, cache:ContactCache|None=None)->Dict[str,str]:
+    sid = row['supplier_id']
+    inn = journal.done(sid, 'inn') if journal else None
+    if inn is None:
+        inn = await lookup_inn(sid, scraper, cache)
+        if journal: journal.record(sid, 'inn', inn)
+    phone = email = ''
+    # ФНС ответила пусто, но ЗЧБ контакты нашёл — строка готова, в ФНС не идём
+    zcb = journal.done(sid, 'zcb') if journal and inn and journal.has(sid, 'zcb') else None
+    fns = journal.done(sid, 'fns') if journal and inn and not zcb else None
+    hit = cache.get_contacts(inn) if cache and inn and not fns and not zcb else None
+    if fns:
+        phone, email = fns
+    elif zcb:
+        phone, email = zcb
+    elif hit:
+        phone, email, _src = hit
+    elif inn and not args.skip_fns and state['fns'] < args.fns_limit:
+        state['fns'] += 1   # резервируем до запроса: воркеры идут параллельно
+        p,e = await query_fns(session, inn)
+        phone = norm_phone(p)
+        email = e
+        if journal: journal.record(sid, 'fns', [phone, email])
+        if cache and (phone or email): cache.put_contacts(inn, phone, email, 'fns')
+        fns = True   # спросили ФНС: пустой итог можно кэшировать
+    if inn and not phone and not email and not hit:
+        zcb = journal.done(sid, 'zcb') if journal else None
+        if zcb:
+            phone, email = zcb
+        else:
             phone, email = await scrape_zcb(session, inn)
-        row.update({'inn':inn,'phone':phone,'email':email})
-        await asyncio.sleep(args.delay)
-        return row
+            if journal: journal.record(sid, 'zcb', [phone, email])
+            if cache and (phone or email or fns): cache.put_contacts(inn, phone, email, 'zcb')
+    row.update({'inn':inn,'phone':phone,'email':email})
+    return row
 
-async def run(args):
-    rows = list(csv.DictReader(open(args.input, newline='', encoding='utf-8')))
-    sem = asyncio.Semaphore(args.concurrency)
-    state = {'fns':0}
+# ─── PIPELINE ────────────────────────────────────────────────────────────────
+# Продюсер читает CSV построчно в ограниченную очередь, фиксированное число
+# воркеров её разбирает, каждая готовая строка сразу пишется в выход (flush):
+# память не растёт с размером входа, а падение на 9000-й строке оставляет
+# на диске всё, что уже собрано. Порядок строк — порядок завершения.
+OUT_FIELDS = ['inn','phone','email']
+
+async def produce(reader, queue:asyncio.Queue, workers:int):
+    for row in reader:
+        await queue.put(row)
+    for _ in range(workers):
+        await queue.put(None)
 
-    async with aiohttp.ClientSession() as session, await aiocfscrape.create_scraper() as scraper:
-        tasks = [process(r, session, scraper, sem, args, state) for r in rows]
-        done  = await tqdm.gather(*tasks, ncols=80, desc='Scraping')
+async def consume(queue:asyncio.Queue, session, scraper, args, state, sink, journal=None, cache=None):
+    while (row := await queue.get()) is not None:
+        try:
+            row = await process(row, session, scraper, args, state, journal, cache)
+        except Exception as e:
+            print(f'⚠️ {row.get("supplier_id")}: {e}', file=sys.stderr)
+            state['errors'] += 1
+        sink(row)
 
+async def run(args):
+    global LIMITER
+    LIMITER = ratelimit.from_args(args)
     out = args.output
     pathlib.Path(out).parent.mkdir(exist_ok=True, parents=True)
-    with open(out,'w',newline='',encoding='utf-8') as f:
-        w = csv.DictWriter(f, fieldnames=done[0].keys())
-        w.writeheader(); w.writerows(done)
-    print(f'✔️ saved → {out}  |  FNS req: {state["fns"]}')
+    state = {'fns':0, 'rows':0, 'errors':0}
+    workers = max(1, args.concurrency)
+    journal = Journal(args.journal or out + '.journal', resume=args.resume)
+    cache = contact_cache.from_args(args)
+    with open(args.input, newline='', encoding='utf-8') as fin, \
+         open(out, 'w', newline='', encoding='utf-8') as fout:
+        reader = csv.DictReader(fin)
+        fields = list(reader.fieldnames or ['supplier_id'])
+        fields += [k for k in OUT_FIELDS if k not in fields]
+        w = csv.DictWriter(fout, fieldnames=fields, extrasaction='ignore')
+        w.writeheader(); fout.flush()
+        bar = tqdm(ncols=80, desc='Scraping', unit='row')
+
+        def sink(row):
+            w.writerow(row); fout.flush()
+            state['rows'] += 1; bar.update(1)
+
+        queue = asyncio.Queue(maxsize=workers*2)
+        async with aiohttp.ClientSession() as session, await aiocfscrape.create_scraper() as scraper:
+            await asyncio.gather(
+                produce(reader, queue, workers),
+                *(consume(queue, session, scraper, args, state, sink, journal, cache) for _ in range(workers)))
+        bar.close()
+    journal.close()
+    print(f'✔️ saved → {out}  |  rows: {state["rows"]}  |  FNS req: {state["fns"]}'
+          + (f'  |  errors: {state["errors"]}' if state['errors'] else ''))
+    if args.resume:
+        print(f'↩️ resume  |  {journal.summary()}')
+    if cache:
+        print(f'🗄️ cache  |  {cache.summary()}')
+        cache.close()
+    if LIMITER.buckets:
+        print(LIMITER.summary())
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--input', default='raw.csv')
     ap.add_argument('--output', default='socials.csv')
-    ap.add_argument('--delay', type=float, default=0.1)
     ap.add_argument('--concurrency', type=int, default=30)
     ap.add_argument('--fns-limit', type=int, default=600)
     ap.add_argument('--skip-fns', action='store_true')
+    ap.add_argument('--resume', action='store_true', help='пропустить этапы, сделанные в прошлом прогоне')
+    ap.add_argument('--journal', default='', help='файл журнала (по умолчанию <output>.journal)')
+    contact_cache.add_args(ap)
+    ratelimit.add_args(ap)
     args = ap.parse_args()
     try: asyncio.run(run(args))
     except KeyboardInterrupt: sys.exit('⏹️ interrupted')
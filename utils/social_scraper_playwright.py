@@ -4,13 +4,15 @@ social_scraper.py — WB contacts v5
 ▪️ Playwright + headless Chromium → достаём ИНН со страницы продавца
 ▪️ API-ФНС / zachestnyibiznes.ru → phone, email
 """
-import re, csv, json, asyncio, argparse, pathlib, sys, random
+import re, csv, json, asyncio, argparse, pathlib, sys
 from typing import Dict, Tuple
 from tqdm.asyncio import tqdm
 import aiohttp, async_timeout
 from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright
 
+import contact_cache, ratelimit
+
 INN_RE   = re.compile(r'ИНН[:\s]*?(\d{10,12})')
 PHONE_RE = re.compile(r'(?:\+7|8)[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}')
 EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
@@ -23,12 +25,22 @@ def norm_phone(raw:str)->str:
     if len(digits)==10: return f'+7{digits}'
     return ''
 
+# Темп задаёт лимитер по хостам (ratelimit.py), а не sleep после запроса
+LIMITER = ratelimit.RateLimiter()
+
 async def fetch(session, url:str, timeout=15)->str:
-    try:
-        async with async_timeout.timeout(timeout):
-            async with session.get(url, headers=HEADERS) as r:
-                return await r.text()
-    except: return ''
+    for attempt in range(2):   # после 429/5xx — ещё раз, уже в сниженном темпе
+        await LIMITER.acquire(url)
+        try:
+            async with async_timeout.timeout(timeout):
+                async with session.get(url, headers=HEADERS) as r:
+                    LIMITER.feedback(url, r.status, retry_after=r.headers.get('Retry-After'))
+                    if r.status in ratelimit.THROTTLE and attempt == 0: continue
+                    return await r.text()
+        except Exception as e:
+            LIMITER.feedback(url, error=e)
+            return ''
+    return ''
 
 async def get_inn_playwright(page, sid: str) -> str:
     url = f'https://www.wildberries.ru/seller/{sid}'
@@ -43,7 +55,9 @@ async def get_inn_playwright(page, sid: str) -> str:
             """Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"""
         )
 
-        await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+        await LIMITER.acquire(url)
+        resp = await page.goto(url, timeout=30000, wait_until="domcontentloaded")
+        if resp: LIMITER.feedback(url, resp.status, retry_after=resp.headers.get('retry-after'))
 
         # Небольшой «человеческий» скролл
         await page.mouse.wheel(0, 500)
@@ -59,6 +73,7 @@ async def get_inn_playwright(page, sid: str) -> str:
             print(f"🔴 ИНН не найден")
         return m.group(1) if m else ''
     except Exception as e:
+        LIMITER.feedback(url, error=e)
         print(f"❌ Ошибка Playwright: {e}")
         return ''
 
@@ -86,33 +101,44 @@ async def scrape_zcb(session, inn:str)->Tuple[str,str]:
     return (norm_phone(PHONE_RE.search(t).group(0)) if PHONE_RE.search(t) else '',
             EMAIL_RE.search(t).group(0) if EMAIL_RE.search(t) else '')
 
-async def process(row:Dict[str,str], page, session, sem, args, state)->Dict[str,str]:
+async def process(row:Dict[str,str], page, session, sem, args, state, cache=None)->Dict[str,str]:
     async with sem:
         sid = row['supplier_id']
-        inn = await get_inn_playwright(page, sid)
+        inn = cache.get_inn(sid) if cache else None
+        if inn is None:
+            inn = await get_inn_playwright(page, sid)
+            if cache: cache.put_inn(sid, inn)
         phone = email = ''
-        if inn and not args.skip_fns and state['fns'] < args.fns_limit:
+        hit = cache.get_contacts(inn) if cache and inn else None
+        asked_fns = False
+        if hit:
+            phone, email, _src = hit
+        elif inn and not args.skip_fns and state['fns'] < args.fns_limit:
             p,e = await query_fns(session, inn)
             phone = norm_phone(p)
             email = e
             state['fns'] += 1
-            await asyncio.sleep(0.2 + random.random()*0.2)
-        if inn and not phone and not email:
+            asked_fns = True
+            if cache and (phone or email): cache.put_contacts(inn, phone, email, 'fns')
+        if inn and not phone and not email and not hit:
             phone, email = await scrape_zcb(session, inn)
+            if cache and (phone or email or asked_fns): cache.put_contacts(inn, phone, email, 'zcb')
         row.update({'inn':inn, 'phone':phone, 'email':email})
-        await asyncio.sleep(args.delay)
         return row
 
 async def run(args):
     rows = list(csv.DictReader(open(args.input, newline='', encoding='utf-8')))
     sem = asyncio.Semaphore(args.concurrency)
+    global LIMITER
+    LIMITER = ratelimit.from_args(args)
     state = {'fns':0}
+    cache = contact_cache.from_args(args)
 
     async with aiohttp.ClientSession() as session:
         async with async_playwright() as pw:
             browser = await pw.chromium.launch(headless=True)
             page = await browser.new_page()
-            tasks = [process(r, page, session, sem, args, state) for r in rows]
+            tasks = [process(r, page, session, sem, args, state, cache) for r in rows]
             done = await tqdm.gather(*tasks, ncols=80, desc='Scraping')
             await browser.close()
 
@@ -125,15 +151,20 @@ async def run(args):
         w = csv.DictWriter(f, fieldnames=done[0].keys())
         w.writeheader(); w.writerows(done)
     print(f'✔️ saved → {out}  |  FNS req: {state["fns"]}')
+    if cache:
+        print(f'🗄️ cache  |  {cache.summary()}')
+        cache.close()
+    print(LIMITER.summary())
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--input', default='raw.csv')
     ap.add_argument('--output', default='socials.csv')
-    ap.add_argument('--delay', type=float, default=0.1)
     ap.add_argument('--concurrency', type=int, default=20)
     ap.add_argument('--fns-limit', type=int, default=600)
     ap.add_argument('--skip-fns', action='store_true')
+    contact_cache.add_args(ap)
+    ratelimit.add_args(ap)
     args = ap.parse_args()
     try: asyncio.run(run(args))
     except KeyboardInterrupt: sys.exit('⏹️ interrupted')
@@ -4,7 +4,7 @@ social_scraper_uc_selenium_final_full.py — Финальная версия
 ▪ Извлекает ИНН с Wildberries через Selenium
 ▪ Получает phone/email через API ФНС и zachestnyibiznes.ru
 """
-import csv, time, argparse, pathlib, re, sys, random, json
+import csv, argparse, pathlib, re, sys, json
 from typing import Dict, Tuple
 from bs4 import BeautifulSoup
 import requests
@@ -13,11 +13,29 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import undetected_chromedriver as uc
 
+import contact_cache, ratelimit
+
 INN_RE   = re.compile(r'ИНН[:\s]*?(\d{10,12})')
 PHONE_RE = re.compile(r'(?:\+7|8)[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}')
 EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
 HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) Safari/537.36"}
 
+# Темп задаёт лимитер по хостам (ratelimit.py), а не sleep после запроса
+LIMITER = ratelimit.RateLimiter()
+
+def get(url:str, timeout:int):
+    """requests.get через лимитер; после 429/5xx — ещё раз в сниженном темпе."""
+    for attempt in range(2):
+        LIMITER.acquire_sync(url)
+        try:
+            r = requests.get(url, headers=HEADERS, timeout=timeout)
+        except Exception as e:
+            LIMITER.feedback(url, error=e)
+            raise
+        LIMITER.feedback(url, r.status_code, retry_after=r.headers.get('Retry-After'))
+        if r.status_code not in ratelimit.THROTTLE or attempt:
+            return r
+
 def norm_phone(raw:str)->str:
     digits = re.sub(r'\D', '', raw)
     if len(digits)==11 and digits.startswith('8'): digits = '7'+digits[1:]
@@ -35,6 +53,7 @@ def get_inn(sid: str, chrome_path: str = None) -> str:
 
     try:
         url = f"https://www.wildberries.ru/seller/{sid}"
+        LIMITER.acquire_sync(url)   # статус ответа из selenium не узнать — только темп
         driver.get(url)
 
         print("🕒 Ожидаем исчезновения лоадера .spinner...")
@@ -77,7 +96,7 @@ def get_inn(sid: str, chrome_path: str = None) -> str:
 def query_fns(inn:str)->Tuple[str,str]:
     url = f'https://api-fns.ru/api/egr?req={inn}&key=free'
     try:
-        r = requests.get(url, headers=HEADERS, timeout=20)
+        r = get(url, timeout=20)
         j = r.json().get('items',[{}])[0]
         phone = ''
         for blk in j.get('СвКонтактДл', []):
@@ -90,7 +109,7 @@ def query_fns(inn:str)->Tuple[str,str]:
 def scrape_zcb(inn:str)->Tuple[str,str]:
     url = f'https://zachestnyibiznes.ru/company/{"ip" if len(inn)==12 else "ul"}/{inn}'
     try:
-        r = requests.get(url, headers=HEADERS, timeout=15)
+        r = get(url, timeout=15)
         soup = BeautifulSoup(r.text, 'html.parser')
         block = soup.find(class_='contacts')
         if not block: return '', ''
@@ -105,35 +124,51 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", default="raw.csv")
     parser.add_argument("--output", default="socials.csv")
-    parser.add_argument("--delay", type=float, default=1.0)
     parser.add_argument("--fns-limit", type=int, default=100)
     parser.add_argument("--chrome-path", help="Path to Chrome executable")
     parser.add_argument("--skip-fns", action="store_true")
+    contact_cache.add_args(parser)
+    ratelimit.add_args(parser)
     args = parser.parse_args()
+    global LIMITER
+    LIMITER = ratelimit.from_args(args)
+    cache = contact_cache.from_args(args)
 
     rows = list(csv.DictReader(open(args.input, encoding="utf-8")))
     state_fns = 0
     for row in rows:
         sid = row.get("supplier_id")
-        inn = get_inn(sid, chrome_path=args.chrome_path)
+        inn = cache.get_inn(sid) if cache else None
+        if inn is None:
+            inn = get_inn(sid, chrome_path=args.chrome_path)
+            if cache: cache.put_inn(sid, inn)
         phone = email = ''
-        if inn:
+        hit = cache.get_contacts(inn) if cache and inn else None
+        if hit:
+            phone, email, _src = hit
+        elif inn:
+            asked_fns = False
             if not args.skip_fns and state_fns < args.fns_limit:
                 p,e = query_fns(inn)
                 phone = norm_phone(p)
                 email = e
                 state_fns += 1
-                time.sleep(0.3 + random.random()*0.3)
+                asked_fns = True
+                if cache and (phone or email): cache.put_contacts(inn, phone, email, 'fns')
             if not phone and not email:
                 phone, email = scrape_zcb(inn)
+                if cache and (phone or email or asked_fns): cache.put_contacts(inn, phone, email, 'zcb')
         row.update({'inn':inn, 'phone':phone, 'email':email})
-        time.sleep(args.delay)
 
     with open(args.output, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=rows[0].keys())
         writer.writeheader()
         writer.writerows(rows)
     print(f"\n✔️ saved → {args.output}  |  FNS req: {state_fns}")
+    if cache:
+        print(f"🗄️ cache  |  {cache.summary()}")
+        cache.close()
+    print(LIMITER.summary())
 
 if __name__ == "__main__":
     main()